@@ -1,6 +1,19 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import csv
+import io
+import json
+import math
+import heapq
+import pickle
+import argparse
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tadpole_store import write_parquet_dataset, replace_parquet_rids, N_BUCKETS
 
 # Config - paths relative to script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -8,6 +21,12 @@ PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 
 RAW_DATA_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "TADPOLE_D1_D2.csv")
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "tadpole_clean.csv")
+MANIFEST_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "tadpole_manifest.json")
+MANIFEST_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "tadpole_manifest")
+DELTA_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "tadpole_delta.csv")
+
+# Rows per chunk for the streaming loader (bounds peak memory)
+CHUNK_SIZE = 50000
 
 KEEP_COLUMNS = [
     # Identity & Time
@@ -15,20 +34,33 @@ KEEP_COLUMNS = [
     # Labels
     "DX", "DXCHANGE", "DX_bl",
     # Demographics & Genetics
-    "AGE", "PTGENDER", "PTEDUCAT", "APOE4", 
+    "AGE", "PTGENDER", "PTEDUCAT", "APOE4",
     # Cognitive Function
-    "MMSE", "ADAS11", "ADAS13", "CDRSB", "FAQ", 
+    "MMSE", "ADAS11", "ADAS13", "CDRSB", "FAQ",
     "RAVLT_immediate", "RAVLT_learning", "RAVLT_forgetting",
     # MRI Volumes
-    "Hippocampus", "Ventricles", "WholeBrain", "Entorhinal", 
+    "Hippocampus", "Ventricles", "WholeBrain", "Entorhinal",
     "Fusiform", "MidTemp", "ICV",
     # Biomarkers
     "FDG", "AV45"
 ]
 
+# Columns that are never coerced/imputed
+NON_NUMERIC_COLUMNS = ["RID", "PTID", "VISCODE", "EXAMDATE", "DX", "DX_bl", "Label"]
+
+# Map diagnosis to labels: 0=CN, 1=MCI, 2=AD
+DX_MAP = {
+    'CN': 0, 'NL': 0,
+    'MCI': 1, 'EMCI': 1, 'LMCI': 1,
+    'Dementia': 2, 'AD': 2
+}
+
+def viscode_to_month(x):
+    return 0 if x=='bl' else int(x[1:]) if str(x).startswith('m') else -1
+
 def preprocess_tadpole_v1():
     print(f"Loading TADPOLE D1/D2...")
-    
+
     # Load required columns only
     try:
         df = pd.read_csv(RAW_DATA_PATH, usecols=lambda c: c in KEEP_COLUMNS, low_memory=False)
@@ -40,22 +72,16 @@ def preprocess_tadpole_v1():
 
     # Standardize months from VISCODE if needed
     if 'Month' not in df.columns:
-        df['Month'] = df['VISCODE'].apply(lambda x: 0 if x=='bl' else int(x[1:]) if str(x).startswith('m') else -1)
-
-    # Map diagnosis to labels: 0=CN, 1=MCI, 2=AD
-    dx_map = {
-        'CN': 0, 'NL': 0, 
-        'MCI': 1, 'EMCI': 1, 'LMCI': 1, 
-        'Dementia': 2, 'AD': 2
-    }
-    df['Label'] = df['DX'].map(dx_map)
-    
+        df['Month'] = df['VISCODE'].apply(viscode_to_month)
+
+    df['Label'] = df['DX'].map(DX_MAP)
+
     # Drop rows without diagnosis
     df = df.dropna(subset=['Label'])
 
     # Mean imputation for missing values
-    numeric_cols = [c for c in df.columns if c not in ["RID", "PTID", "VISCODE", "EXAMDATE", "DX", "DX_bl", "Label"]]
-    
+    numeric_cols = [c for c in df.columns if c not in NON_NUMERIC_COLUMNS]
+
     for col in numeric_cols:
         df[col] = pd.to_numeric(df[col], errors='coerce')
         df[col] = df[col].fillna(df[col].mean())
@@ -64,9 +90,14 @@ def preprocess_tadpole_v1():
     df = df.sort_values(by=["RID", "Month"])
 
     # Save processed data
-    os.makedirs("../data/processed", exist_ok=True)
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     df.to_csv(OUTPUT_PATH, index=False)
-    
+    write_parquet_dataset([df])
+
+    dtypes = {c: ('object' if df[c].dtype == object else str(df[c].dtype)) for c in df.columns}
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(OUTPUT_PATH)) as tmp_dir:
+        write_manifest(list(df.columns), numeric_cols, dtypes, scan_manifest_spill(tmp_dir).shards())
+
     print("-" * 30)
     print(f"✅ SUCCESS: V1 Dataset saved to {OUTPUT_PATH}")
     print(f"   - Patients: {df['RID'].nunique()}")
@@ -74,5 +105,551 @@ def preprocess_tadpole_v1():
     print(f"   - Features: {len(df.columns)}")
     print("-" * 30)
 
+# ==========================================
+# STREAMING MODE (bounded memory)
+# ==========================================
+# Same output as preprocess_tadpole_v1(), but the raw file is never held in
+# memory. Everything is read as text (dtype=str) in fixed-size chunks and
+# converted with the dtypes the one-shot read would have inferred.
+#   Pass 1: infer dtypes, count kept rows, spill kept values for the means
+#           and the manifest facts (hashes, per-RID sums) per RID bucket
+#   Pass 2: impute, sort each chunk, write sorted runs to disk
+#   Merge:  k-way merge of the runs into tadpole_clean.csv
+
+def read_raw_chunks(chunksize=CHUNK_SIZE):
+    """Yields raw chunks as strings, with Month and Label already attached."""
+    reader = pd.read_csv(RAW_DATA_PATH, usecols=lambda c: c in KEEP_COLUMNS, dtype=str, chunksize=chunksize)
+    for chunk in reader:
+        if 'Month' not in chunk.columns:
+            chunk['Month'] = chunk['VISCODE'].apply(viscode_to_month).astype(str)
+        chunk['Label'] = chunk['DX'].map(DX_MAP)
+        yield chunk
+
+class ColumnProfile:
+    """Running per-column facts needed to reproduce the one-shot read."""
+    def __init__(self):
+        self.any_missing = False      # NA token anywhere in the raw file
+        self.any_failed = False       # token that doesn't parse as a number
+        self.all_int_tokens = True    # every parsed token is an integer
+        self.kept_all_int = True      # kept rows parse as ints with no NA
+        self.count = 0                # non-null numeric values in kept rows
+
+    def update(self, raw, kept):
+        missing = raw.isna()
+        num = pd.to_numeric(raw, errors='coerce')
+        self.any_missing |= bool(missing.any())
+        self.any_failed |= bool((num.isna() & ~missing).any())
+        present = pd.to_numeric(raw[~missing], errors='coerce')
+        if len(present) and present.dtype.kind not in 'iu':
+            self.all_int_tokens = False
+        kept_num = pd.to_numeric(raw[kept], errors='coerce')
+        if len(kept_num) and kept_num.dtype.kind not in 'iu':
+            self.kept_all_int = False
+        self.count += int(kept_num.notna().sum())
+        return kept_num
+
+    def resolve_dtype(self, numeric):
+        # C parser inference for the full file
+        if not self.any_missing and not self.any_failed and self.all_int_tokens:
+            return 'int64'
+        if not self.any_failed:
+            return 'float64'
+        # Mixed column: object on read, then pd.to_numeric for numeric cols
+        if numeric:
+            return 'int64' if self.kept_all_int else 'float64'
+        return 'object'
+
+def _spill_path(spill_dir, col):
+    return os.path.join(spill_dir, f"{col}.f64")
+
+def scan_raw(spill_dir, chunksize=CHUNK_SIZE, manifest=None):
+    """
+    Pass 1: profiles every column and spills the kept numeric values to disk
+    (NaN written as 0.0, like pandas' nanmean). Summing the spill with one
+    np.add.reduce reproduces Series.mean() bit-for-bit. The manifest facts
+    go to `manifest` (a ManifestSpill) in the same pass.
+    """
+    profiles, columns, numeric_cols = {}, None, None
+    label_missing = False
+    n_raw = n_kept = 0
+
+    for chunk in read_raw_chunks(chunksize):
+        if columns is None:
+            columns = list(chunk.columns)
+            numeric_cols = [c for c in columns if c not in NON_NUMERIC_COLUMNS]
+            profiles = {c: ColumnProfile() for c in columns if c != 'Label'}
+        if manifest is not None:
+            manifest.add(chunk, numeric_cols)
+
+        kept = chunk['Label'].notna()
+        label_missing |= not bool(kept.all())
+        n_raw += len(chunk)
+        n_kept += int(kept.sum())
+
+        for col, profile in profiles.items():
+            kept_num = profile.update(chunk[col], kept)
+            if col in numeric_cols and len(kept_num):
+                values = kept_num.to_numpy(dtype='float64', na_value=np.nan)
+                with open(_spill_path(spill_dir, col), 'ab') as f:
+                    f.write(np.where(np.isnan(values), 0.0, values).tobytes())
+
+    dtypes = {c: p.resolve_dtype(c in numeric_cols) for c, p in profiles.items()}
+    dtypes['Label'] = 'float64' if label_missing else 'int64'
+
+    means = {}
+    for col in numeric_cols:
+        count = profiles[col].count
+        if count == 0:
+            means[col] = np.nan
+            continue
+        spill = np.memmap(_spill_path(spill_dir, col), dtype='float64', mode='r')
+        means[col] = np.add.reduce(spill) / float(count)
+        del spill
+
+    print(f"   Raw Rows: {n_raw}")
+    return columns, numeric_cols, dtypes, means
+
+def impute_chunk(chunk, numeric_cols, dtypes, means):
+    """Applies the full-file dtypes and mean imputation to one raw chunk."""
+    chunk = chunk[chunk['Label'].notna()].copy()
+    for col in chunk.columns:
+        dtype = dtypes[col]
+        if col in numeric_cols:
+            values = pd.to_numeric(chunk[col], errors='coerce').astype('float64').fillna(means[col])
+            chunk[col] = values.astype(dtype)
+        elif dtype != 'object':
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype(dtype)
+    return chunk
+
+def write_sorted_runs(run_dir, numeric_cols, dtypes, means, chunksize=CHUNK_SIZE):
+    """Pass 2: imputes each chunk and writes it as a sorted run (headerless CSV)."""
+    run_paths = []
+    for i, chunk in enumerate(read_raw_chunks(chunksize)):
+        chunk = impute_chunk(chunk, numeric_cols, dtypes, means)
+        if chunk.empty:
+            continue
+        # Multi-key sort_values is a stable lexsort, so equal keys keep file order
+        chunk = chunk.sort_values(by=["RID", "Month"])
+        path = os.path.join(run_dir, f"run_{i:05d}.csv")
+        chunk.to_csv(path, header=False, index=False)
+        run_paths.append(path)
+    return run_paths
+
+def row_sort_key(columns, dtypes):
+    """(RID, Month) sort key over formatted CSV fields."""
+    rid_pos, month_pos = columns.index('RID'), columns.index('Month')
+    rid_numeric = dtypes['RID'] != 'object'
+
+    def sort_key(fields):
+        rid = float(fields[rid_pos]) if rid_numeric else fields[rid_pos]
+        month = fields[month_pos]
+        # NaN months sort last within a patient (na_position='last')
+        return (rid, month == '', float(month) if month else 0.0)
+    return sort_key
+
+def merge_rows(row_iters, columns, dtypes, output_path):
+    """K-way merge of sorted row streams. heapq.merge is stable across streams,
+    so ties resolve in stream order, exactly like the one-shot sort."""
+    rid_pos = columns.index('RID')
+    patients, visits = set(), 0
+    with open(output_path, 'w', newline='') as out:
+        writer = csv.writer(out, lineterminator=os.linesep)
+        writer.writerow(columns)
+        for fields in heapq.merge(*row_iters, key=row_sort_key(columns, dtypes)):
+            writer.writerow(fields)
+            patients.add(fields[rid_pos])
+            visits += 1
+    return len(patients), visits
+
+def merge_runs(run_paths, columns, dtypes, output_path):
+    handles = [open(p, 'r', newline='') for p in run_paths]
+    try:
+        return merge_rows([csv.reader(h) for h in handles], columns, dtypes, output_path)
+    finally:
+        for h in handles:
+            h.close()
+
+def csv_read_dtypes(dtypes):
+    return {c: (str if d == 'object' else d) for c, d in dtypes.items()}
+
+def write_parquet_from_csv(dtypes, chunksize=CHUNK_SIZE):
+    """Columnar copy of tadpole_clean.csv, converted chunk by chunk with fixed dtypes."""
+    write_parquet_dataset(pd.read_csv(OUTPUT_PATH, dtype=csv_read_dtypes(dtypes), chunksize=chunksize,
+                                      float_precision='round_trip'))
+
+def preprocess_tadpole_streaming(chunksize=CHUNK_SIZE):
+    print(f"Loading TADPOLE D1/D2 (streaming, {chunksize} rows/chunk)...")
+
+    if not os.path.exists(RAW_DATA_PATH):
+        print(f"Error loading columns: {RAW_DATA_PATH} not found")
+        return
+
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(OUTPUT_PATH)) as tmp_dir:
+        manifest = ManifestSpill(tmp_dir)
+        columns, numeric_cols, dtypes, means = scan_raw(tmp_dir, chunksize, manifest)
+        run_paths = write_sorted_runs(tmp_dir, numeric_cols, dtypes, means, chunksize)
+        n_patients, n_visits = merge_runs(run_paths, columns, dtypes, OUTPUT_PATH)
+        write_manifest(columns, numeric_cols, dtypes, manifest.shards())
+
+    write_parquet_from_csv(dtypes, chunksize)
+
+    print("-" * 30)
+    print(f"✅ SUCCESS: V1 Dataset saved to {OUTPUT_PATH}")
+    print(f"   - Patients: {n_patients}")
+    print(f"   - Visits: {n_visits}")
+    print(f"   - Features: {len(columns)}")
+    print("-" * 30)
+
+# ==========================================
+# INCREMENTAL MODE (content-hash manifest)
+# ==========================================
+# Every full build also writes a manifest: a content hash per raw visit
+# (RID -> VISCODE -> [hash, kept]) and per-RID running sums/counts of the
+# numeric columns. It is sharded by RID bucket like the Parquet dataset
+# (tadpole_manifest/patients-XX.json, with the schema in tadpole_manifest.json).
+# An incremental run hashes the new raw drop, re-processes only new/changed
+# visits and writes them to tadpole_delta.csv. It then rewrites only what the
+# delta touches: tadpole_clean.csv from the first touched RID on (found by
+# binary search), the touched Parquet buckets and the touched manifest shards.
+# Untouched rows keep their imputed values, so the downstream
+# graph/narratives/Neo4j data for them stays valid. Means come from the stored
+# aggregates, so they can differ from a full rebuild in the last bit.
+
+def _new_patient(n_cols):
+    return {"visits": {}, "sums": [0.0] * n_cols, "counts": [0] * n_cols}
+
+def _visit_key(visits, viscode, kept=True):
+    # Disambiguate duplicate VISCODEs within a patient by occurrence. Dropped
+    # (unlabelled) rows get their own namespace so that the keys of kept rows
+    # can be recomputed from tadpole_clean.csv alone.
+    base = str(viscode) if kept else f"~{viscode}"
+    key, n = base, 1
+    while key in visits:
+        key, n = f"{base}#{n}", n + 1
+    return key
+
+def manifest_facts(chunk, numeric_cols):
+    """
+    Manifest facts of one raw chunk: a (RID, VISCODE, hash, kept) row per
+    visit, in file order, and per-RID sums/counts of the kept numeric values.
+    """
+    raw_cols = [c for c in chunk.columns if c != 'Label']
+    kept = chunk['Label'].notna()
+    rids = chunk['RID'].astype(str)
+    rows = pd.DataFrame({
+        'RID': rids, 'VISCODE': chunk['VISCODE'], 'kept': kept,
+        'hash': pd.util.hash_pandas_object(chunk[raw_cols], index=False).map('{:016x}'.format),
+    })
+    values = chunk[numeric_cols].apply(pd.to_numeric, errors='coerce').astype('float64')[kept]
+    sums = values.fillna(0.0).groupby(rids[kept]).sum()
+    counts = values.notna().groupby(rids[kept]).sum()
+    return rows, sums, counts
+
+def add_manifest_facts(patients, rows, sums, counts, n_cols):
+    """Folds one chunk's facts into {rid: entry}; returns each row's visit key."""
+    for rid in sums.index:
+        entry = patients.setdefault(rid, _new_patient(n_cols))
+        entry["sums"] = [a + float(b) for a, b in zip(entry["sums"], sums.loc[rid])]
+        entry["counts"] = [a + int(b) for a, b in zip(entry["counts"], counts.loc[rid])]
+    keys = []
+    for rid, viscode, row_hash, row_kept in zip(rows['RID'], rows['VISCODE'], rows['hash'], rows['kept']):
+        entry = patients.setdefault(rid, _new_patient(n_cols))
+        key = _visit_key(entry["visits"], viscode, row_kept)
+        entry["visits"][key] = [row_hash, bool(row_kept)]
+        keys.append(key)
+    return keys
+
+def scan_manifest(previous, chunksize=CHUNK_SIZE):
+    """
+    One pass over the raw file. Returns the per-RID manifest entries and the
+    raw rows that are new or changed against `previous` (with their manifest
+    key in a VisitKey column).
+    """
+    patients, changed, numeric_cols = {}, [], None
+    for chunk in read_raw_chunks(chunksize):
+        if numeric_cols is None:
+            numeric_cols = [c for c in chunk.columns if c not in NON_NUMERIC_COLUMNS]
+        rows, sums, counts = manifest_facts(chunk, numeric_cols)
+        keys = add_manifest_facts(patients, rows, sums, counts, len(numeric_cols))
+        is_changed = [
+            previous.get(rid, {}).get("visits", {}).get(key, [None])[0] != row_hash
+            for rid, key, row_hash in zip(rows['RID'], keys, rows['hash'])
+        ]
+        changed.append(chunk.assign(VisitKey=keys)[is_changed])
+
+    changed = pd.concat(changed) if changed else pd.DataFrame()
+    return patients, changed
+
+class ManifestSpill:
+    """
+    Manifest facts spilled to disk per RID bucket during a full build's pass
+    over the raw file, so the shards are built one bucket at a time instead
+    of holding every patient's entry in memory.
+    """
+    def __init__(self, spill_dir):
+        self.spill_dir = spill_dir
+        self.n_cols = None
+
+    def _path(self, bucket):
+        return os.path.join(self.spill_dir, f"manifest-{bucket:02d}.pkl")
+
+    def add(self, chunk, numeric_cols):
+        self.n_cols = len(numeric_cols)
+        rows, sums, counts = manifest_facts(chunk, numeric_cols)
+        row_buckets = rows['RID'].astype(float).astype('int64') % N_BUCKETS
+        agg_buckets = sums.index.astype(float).astype('int64') % N_BUCKETS
+        for bucket in np.unique(row_buckets):
+            in_bucket = agg_buckets == bucket
+            with open(self._path(bucket), 'ab') as f:
+                pickle.dump((rows[row_buckets == bucket], sums[in_bucket], counts[in_bucket]), f)
+
+    def shards(self):
+        """(bucket, {rid: entry}) for every bucket, in file order within each."""
+        for bucket in range(N_BUCKETS):
+            patients = {}
+            if os.path.exists(self._path(bucket)):
+                with open(self._path(bucket), 'rb') as f:
+                    while True:
+                        try:
+                            rows, sums, counts = pickle.load(f)
+                        except EOFError:
+                            break
+                        add_manifest_facts(patients, rows, sums, counts, self.n_cols)
+            yield bucket, patients
+
+def scan_manifest_spill(spill_dir, chunksize=CHUNK_SIZE):
+    """A ManifestSpill from its own pass over the raw file (for the one-shot build)."""
+    spill = ManifestSpill(spill_dir)
+    for chunk in read_raw_chunks(chunksize):
+        spill.add(chunk, [c for c in chunk.columns if c not in NON_NUMERIC_COLUMNS])
+    return spill
+
+def manifest_bucket(rid):
+    return int(float(rid)) % N_BUCKETS
+
+def _shard_path(bucket):
+    return os.path.join(MANIFEST_DIR, f"patients-{bucket:02d}.json")
+
+def _write_json(path, obj):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+def patient_shards(patients, buckets):
+    """(bucket, {rid: entry}) for the given buckets of an in-memory manifest."""
+    shards = {bucket: {} for bucket in buckets}
+    for rid, entry in patients.items():
+        bucket = manifest_bucket(rid)
+        if bucket in shards:
+            shards[bucket][rid] = entry
+    return sorted(shards.items())
+
+def write_manifest(columns, numeric_cols, dtypes, shards, full=True):
+    """
+    Writes (bucket, {rid: entry}) shards and the schema file. A full build
+    replaces the whole manifest; otherwise only the given shards change.
+    """
+    if full and os.path.exists(MANIFEST_DIR):
+        shutil.rmtree(MANIFEST_DIR)
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    written = 0
+    for bucket, patients in shards:
+        _write_json(_shard_path(bucket), patients)
+        written += 1
+
+    header = {"columns": columns, "numeric_cols": numeric_cols, "dtypes": dtypes, "n_buckets": N_BUCKETS}
+    _write_json(MANIFEST_PATH, header)
+    print(f"✅ MANIFEST SAVED: {MANIFEST_PATH} ({written} of {N_BUCKETS} shards written)")
+
+def load_manifest():
+    with open(MANIFEST_PATH, 'r') as f:
+        manifest = json.load(f)
+    patients = {}
+    for bucket in range(manifest["n_buckets"]):
+        with open(_shard_path(bucket), 'r') as f:
+            patients.update(json.load(f))
+    manifest["patients"] = patients
+    return manifest
+
+def manifest_means(patients, numeric_cols):
+    means = {}
+    for i, col in enumerate(numeric_cols):
+        total = math.fsum(p["sums"][i] for p in patients.values())
+        count = sum(p["counts"][i] for p in patients.values())
+        means[col] = total / count if count else np.nan
+    return means
+
+def dtype_drift(changed, numeric_cols, dtypes):
+    """Columns whose stored int dtype the new rows would break (needs a full rebuild)."""
+    drifted = []
+    kept = changed['Label'].notna()
+    for col, dtype in dtypes.items():
+        if col == 'Label':
+            if dtype == 'int64' and not kept.all():
+                drifted.append(col)
+            continue
+        profile = ColumnProfile()
+        profile.update(changed[col], kept)
+        if dtype == 'int64' and profile.resolve_dtype(col in numeric_cols) != 'int64':
+            drifted.append(col)
+    return drifted
+
+def rid_offset(f, target, rid_value):
+    """
+    Byte offset of the first row of the sorted tadpole_clean.csv (opened in
+    binary mode) whose RID sorts at or after target. Binary search, so only
+    O(log n) rows are read.
+    """
+    f.seek(0)
+    lo = len(f.readline())  # header
+    hi = f.seek(0, os.SEEK_END)
+    while lo < hi:
+        f.seek((lo + hi) // 2 - 1)
+        f.readline()  # skip to the next row start
+        start = f.tell()
+        if start >= hi:
+            start = lo
+        f.seek(start)
+        line = f.readline()
+        fields = next(csv.reader([line.decode()]))
+        if rid_value(fields) >= target:
+            hi = start
+        else:
+            lo = start + len(line)
+    return lo
+
+def preprocess_tadpole_incremental(chunksize=CHUNK_SIZE):
+    print(f"Loading TADPOLE D1/D2 (incremental)...")
+
+    if not all(os.path.exists(p) for p in (MANIFEST_PATH, MANIFEST_DIR, OUTPUT_PATH)):
+        print("Error: no manifest found. Run a full build first (with or without --streaming).")
+        return
+    manifest = load_manifest()
+    columns, numeric_cols, dtypes = manifest["columns"], manifest["numeric_cols"], manifest["dtypes"]
+    previous = manifest["patients"]
+
+    patients, changed = scan_manifest(previous, chunksize)
+
+    # Kept visits that disappeared or changed -> their old rows leave tadpole_clean
+    replaced, removed = set(), []
+    for rid, entry in previous.items():
+        current = patients.get(rid, {"visits": {}})["visits"]
+        for key, (row_hash, was_kept) in entry["visits"].items():
+            if not was_kept:
+                continue
+            now = current.get(key)
+            if now is None:
+                removed.append((rid, key))
+                replaced.add((rid, key))
+            elif now[0] != row_hash:
+                replaced.add((rid, key))
+
+    touched = {rid for rid, _ in replaced}
+    if len(changed):
+        touched |= set(changed['RID'].astype(str))
+    # Dropped (unlabelled) visits that vanished only change the manifest
+    stale = {manifest_bucket(rid) for rid in touched}
+    stale |= {manifest_bucket(rid) for rid, entry in previous.items()
+              if patients.get(rid, {}).get("visits") != entry["visits"]}
+    if not touched:
+        if stale:
+            write_manifest(columns, numeric_cols, dtypes, patient_shards(patients, stale), full=False)
+        print("✅ No new or changed visits. tadpole_clean.csv is up to date.")
+        return
+
+    visit_keys = changed.pop('VisitKey') if len(changed) else pd.Series(dtype=object)
+    drifted = dtype_drift(changed, numeric_cols, dtypes) if len(changed) else []
+    if drifted:
+        print(f"❌ New rows change the dtype of {drifted}. Run a full build instead.")
+        return
+
+    # Untouched patients keep their stored aggregates
+    for rid in previous:
+        if rid in patients and rid not in touched:
+            patients[rid]["sums"] = previous[rid]["sums"]
+            patients[rid]["counts"] = previous[rid]["counts"]
+    means = manifest_means(patients, numeric_cols)
+
+    # Re-process only the new/changed visits
+    added = impute_chunk(changed, numeric_cols, dtypes, means) if len(changed) else pd.DataFrame(columns=columns)
+    added = added[columns].sort_values(by=["RID", "Month"])
+    added_rows = list(csv.reader(io.StringIO(added.to_csv(header=False, index=False))))
+
+    rid_pos, vis_pos = columns.index('RID'), columns.index('VISCODE')
+    added_status = [
+        "changed" if (rid, key) in replaced else "added"
+        for rid, key in zip(added['RID'].astype(str), visit_keys.loc[added.index])
+    ]
+
+    with open(DELTA_PATH, 'w', newline='') as out:
+        writer = csv.writer(out, lineterminator=os.linesep)
+        writer.writerow(columns + ["Delta"])
+        for fields, status in zip(added_rows, added_status):
+            writer.writerow(fields + [status])
+        for rid, key in removed:
+            fields = [''] * len(columns)
+            fields[rid_pos], fields[vis_pos] = rid, key.split('#')[0]
+            writer.writerow(fields + ["removed"])
+
+    # Patch tadpole_clean.csv: rows before the first touched RID stay in place,
+    # the tail is re-merged with the delta (replaced rows dropped)
+    def kept_rows(reader):
+        seen = {}
+        for fields in reader:
+            visits = seen.setdefault(fields[rid_pos], {})
+            key = _visit_key(visits, fields[vis_pos])
+            visits[key] = True
+            if (fields[rid_pos], key) not in replaced:
+                yield fields
+
+    rid_key = str if dtypes['RID'] == 'object' else float
+    first = min(rid_key(rid) for rid in touched)
+    tail_path, touched_rows = OUTPUT_PATH + ".tail", []
+    with open(OUTPUT_PATH, 'rb') as f:
+        offset = rid_offset(f, first, lambda fields: rid_key(fields[rid_pos]))
+        f.seek(offset)
+        reader = csv.reader(io.TextIOWrapper(f, newline=''))
+        with open(tail_path, 'w', newline='') as out:
+            writer = csv.writer(out, lineterminator=os.linesep)
+            for fields in heapq.merge(kept_rows(reader), iter(added_rows), key=row_sort_key(columns, dtypes)):
+                writer.writerow(fields)
+                if fields[rid_pos] in touched:
+                    touched_rows.append(fields)
+    with open(OUTPUT_PATH, 'r+b') as out, open(tail_path, 'rb') as tail:
+        out.truncate(offset)
+        out.seek(offset)
+        shutil.copyfileobj(tail, out)
+    os.remove(tail_path)
+
+    # Only the RID buckets and manifest shards of touched patients are rewritten
+    text = io.StringIO()
+    csv.writer(text).writerows([columns] + touched_rows)
+    text.seek(0)
+    buckets = replace_parquet_rids(pd.read_csv(text, dtype=csv_read_dtypes(dtypes), float_precision='round_trip'), touched)
+    write_manifest(columns, numeric_cols, dtypes, patient_shards(patients, stale), full=False)
+
+    kept = [sum(v[1] for v in p["visits"].values()) for p in patients.values()]
+    print("-" * 30)
+    print(f"✅ SUCCESS: Delta saved to {DELTA_PATH}")
+    print(f"   - Patients touched: {len(touched)}")
+    print(f"   - Visits added/changed: {len(added_rows)}")
+    print(f"   - Visits removed: {len(removed)}")
+    print(f"   - Rewritten: CSV tail from byte {offset}, {len(buckets)} Parquet buckets, {len(stale)} manifest shards")
+    print(f"   - Dataset now: {sum(1 for k in kept if k)} patients, {sum(kept)} visits")
+    print("-" * 30)
+
 if __name__ == "__main__":
-    preprocess_tadpole_v1()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Preprocess TADPOLE D1/D2 into tadpole_clean.csv")
+    parser.add_argument("--streaming", action="store_true", help="Chunked two-pass loader with bounded memory")
+    parser.add_argument("--incremental", action="store_true", help="Re-process only new/changed visits using the manifest")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="Rows per chunk in streaming/incremental mode")
+    args = parser.parse_args()
+
+    if args.incremental:
+        preprocess_tadpole_incremental(args.chunksize)
+    elif args.streaming:
+        preprocess_tadpole_streaming(args.chunksize)
+    else:
+        preprocess_tadpole_v1()
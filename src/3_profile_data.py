@@ -1,29 +1,33 @@
-import pandas as pd
 import os
+import sys
+import json
 
-# Dynamic path to find your data
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_clean.csv")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tadpole_store import load_tadpole, tadpole_available, tadpole_columns
+from concept_rules import PROFILE_PATH, rule_columns
 
 def profile_gnn_features():
     print("Generating GNN Data Profile...")
-    if not os.path.exists(DATA_PATH):
+    if not tadpole_available():
         print("Error: Data not found. Run 1_preprocess_data.py first.")
         return
 
-    df = pd.read_csv(DATA_PATH)
-    
     # The specific "Region Data" nodes your professor asked for
     # (Plus cognitive scores to check distribution)
     target_cols = [
         "Hippocampus", "Ventricles", "WholeBrain", "Entorhinal", "Fusiform", 
         "ICV", "MMSE", "ADAS13"
     ]
+    # Every column a concept rule reads, so profiled thresholds can use it
+    target_cols += [c for c in rule_columns() if c not in target_cols]
+    available = tadpole_columns()
+    df = load_tadpole(columns=[c for c in target_cols if c in available])
     
     print("-" * 65)
     print(f"{'FEATURE':<15} | {'MIN':<10} | {'MAX':<10} | {'MEAN':<10} | {'STD DEV':<10}")
     print("-" * 65)
     
+    profile = {}
     for col in target_cols:
         if col in df.columns:
             # simple stats
@@ -33,7 +37,13 @@ def profile_gnn_features():
             c_std = df[col].std()
             
             print(f"{col:<15} | {c_min:<10.2f} | {c_max:<10.2f} | {c_mean:<10.2f} | {c_std:<10.2f}")
+            profile[col] = {'min': float(c_min), 'max': float(c_max), 'mean': float(c_mean), 'std': float(c_std)}
     print("-" * 65)
+
+    # Saved for the profiled thresholds in concept_rules.py
+    with open(PROFILE_PATH, 'w') as f:
+        json.dump(profile, f, indent=2)
+    print(f"Profile saved to {PROFILE_PATH}")
     print("DONE. Use 'Mean +/- StdDev' to define your Knowledge Graph edges.")
 
 if __name__ == "__main__":
@@ -1,7 +1,13 @@
 import os
+import sys
+import argparse
 import pandas as pd
 from neo4j import GraphDatabase
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from neo4j_bulk import (ensure_id_constraints, group_edges_by_type, load_batches, node_records,
+                        BatchLedger, file_fingerprint, run_parallel, sync_graph)
+
 # ==========================================
 # ☁️ CLOUD CONFIGURATION (Fill these in!)
 # ==========================================
@@ -15,8 +21,34 @@ AUTH = ("a1e8aa49", os.environ.get("NEO4J_PASSWORD"))
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 NODES_PATH = os.path.join(SCRIPT_DIR, "../data/processed/neo4j_import/nodes.csv")
 EDGES_PATH = os.path.join(SCRIPT_DIR, "../data/processed/neo4j_import/edges.csv")
+LEDGER_PATH = os.path.join(SCRIPT_DIR, "../data/processed/neo4j_import/push_ledger.jsonl")
+
+WORKERS = 4  # concurrent sessions (AuraDB free tier is happy with a few)
+
+def local_graph(nodes_df, edges_df):
+    """nodes.csv/edges.csv in the shape neo4j_bulk.sync_graph() expects."""
+    nodes = {}
+    for row in node_records(nodes_df):
+        nodes.setdefault(row['type'], {})[row['id']] = {'name': row['name'], 'features': row['features'], **row['props']}
+    rels = {}
+    edge_groups, unmatched = group_edges_by_type(edges_df.fillna(""), nodes_df)
+    for group, edges_list in edge_groups.items():
+        rels[group] = [(e['src'], e['dst'], {}) for e in edges_list]
+    return nodes, rels, unmatched
 
-def push_data():
+def sync_data(driver, nodes_df, edges_df, workers=WORKERS):
+    """Applies only what changed since the last sync; the graph never goes empty."""
+    nodes, rels, unmatched = local_graph(nodes_df, edges_df)
+    if unmatched:
+        print(f"   - Skipping {unmatched} edges whose endpoints are not in nodes.csv")
+    print(f" Syncing {len(nodes_df)} nodes and {len(edges_df) - unmatched} edges...")
+    failed = sync_graph(driver, nodes, rels, workers=workers)
+    if failed:
+        print(f" {len(failed)} sync batches failed. Rerun to sync the rest.")
+    else:
+        print(" SYNC COMPLETE! Go check your Cloud Console.")
+
+def push_data(workers=WORKERS, fresh=False, sync=False, apoc=False):
     print("Connecting to Neo4j Cloud...")
     try:
         driver = GraphDatabase.driver(URI, auth=AUTH)
@@ -34,63 +66,64 @@ def push_data():
 
     nodes_df = pd.read_csv(NODES_PATH)
     edges_df = pd.read_csv(EDGES_PATH)
-    
-    # 1. CLEANUP (Optional: Wipes DB before upload)
+
+    if sync:
+        sync_data(driver, nodes_df, edges_df, workers)
+        driver.close()
+        return
+
+    # Committed batches of this exact export are recorded here; a rerun resumes
+    ledger = BatchLedger(LEDGER_PATH, file_fingerprint(NODES_PATH, EDGES_PATH), fresh=fresh)
+
     with driver.session() as session:
-        print(" Clearing old data...")
-        session.run("MATCH (n) DETACH DELETE n")
-
-        # 2. UPLOAD NODES
-        print(f" Uploading {len(nodes_df)} nodes...")
-        # We upload in batches to be safe
-        query_nodes = """
-        UNWIND $batch AS row
-        CALL apoc.create.node([row.type], {id: row.id, name: row.name, features: row.features}) YIELD node
-        RETURN count(node)
-        """
-        # Convert DF to list of dicts
-        # Replace NaN with safe values if necessary, though neo4j driver handles some
-        nodes_df = nodes_df.fillna("") 
-        nodes_list = nodes_df.to_dict('records')
-        
-        # Batch size 1000
-        for i in range(0, len(nodes_list), 1000):
-            batch = nodes_list[i:i+1000]
+        if apoc:
             try:
-                session.run(query_nodes, batch=batch)
-                print(f"   - Pushed batch {i} to {min(i+1000, len(nodes_list))}")
+                session.run("RETURN apoc.version() AS version").consume()
             except Exception as e:
-                print(f"   - Error pushing node batch {i}: {e}")
-                # Fallback: Check if APOC is missing
-                if "Unknown function 'apoc.create.node'" in str(e):
-                    print("CRITICAL: APOC plugin is missing. Attempting standard Cypher fallback...")
-                    # Fallback requires known labels. For now, let's just error out if APOC is missing
-                    # as rewriting for dynamic labels in pure Cypher is complex without mapped labels.
-                    # But we can try a simplified version if needed. 
-                    return
-
-        # 3. UPLOAD EDGES
-        print(f" Uploading {len(edges_df)} edges...")
-        query_edges = """
-        UNWIND $batch AS row
-        MATCH (s {id: row.src})
-        MATCH (d {id: row.dst})
-        CALL apoc.create.relationship(s, row.type, {}, d) YIELD rel
-        RETURN count(rel)
-        """
-        edges_df = edges_df.fillna("")
-        edges_list = edges_df.to_dict('records')
-        
-        for i in range(0, len(edges_list), 1000):
-            batch = edges_list[i:i+1000]
-            try:
-                session.run(query_edges, batch=batch)
-                print(f"   - Linked batch {i} to {min(i+1000, len(edges_list))}")
-            except Exception as e:
-                 print(f"   - Error pushing edge batch {i}: {e}")
+                print(f"CRITICAL: APOC plugin is missing ({e}). Drop --apoc to use the static loader.")
+                driver.close()
+                return
+
+        # 1. CLEANUP (only on a fresh load - a resumed load keeps what landed)
+        if ledger.resumed:
+            print(f" Resuming: {len(ledger.committed)} batches already committed.")
+        else:
+            print(" Clearing old data...")
+            session.run("MATCH (n) DETACH DELETE n").consume()
+
+        # Index-backed lookups: one uniqueness constraint on id per label
+        ensure_id_constraints(session, sorted(nodes_df['type'].dropna().unique()))
+
+    # One static UNWIND query per label / (label, type, label) group; --apoc
+    # keeps the old dynamic-label path around for comparison
+    node_batches, edge_batches, unmatched = load_batches(nodes_df, edges_df, static=not apoc)
+
+    # 2. UPLOAD NODES (concurrent sessions)
+    print(f" Uploading {len(nodes_df)} nodes on {workers} sessions...")
+    failed = run_parallel(driver, node_batches, ledger, workers, "node batch")
+    if failed:
+        print(f" {len(failed)} node batches failed. Edges need every node, rerun to resume.")
+        driver.close()
+        return
+
+    # 3. UPLOAD EDGES (only once every node batch is committed)
+    # Grouped by endpoint labels so both MATCHes are index seeks
+    print(f" Uploading {len(edges_df)} edges on {workers} sessions...")
+    if unmatched:
+        print(f"   - Skipping {unmatched} edges whose endpoints are not in nodes.csv")
+    failed = run_parallel(driver, edge_batches, ledger, workers, "edge batch")
 
     driver.close()
+    if failed:
+        print(f" {len(failed)} edge batches failed. Rerun to resume from the ledger.")
+        return
     print(" UPLOAD COMPLETE! Go check your Cloud Console.")
 
 if __name__ == "__main__":
-    push_data()
+    parser = argparse.ArgumentParser(description="Push neo4j_import/nodes.csv + edges.csv to Neo4j")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent sessions")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the ledger and reload from scratch")
+    parser.add_argument("--sync", action="store_true", help="Differential sync instead of wipe + full reload")
+    parser.add_argument("--apoc", action="store_true", help="Use the APOC dynamic-label loader instead of static queries")
+    args = parser.parse_args()
+    push_data(workers=args.workers, fresh=args.fresh, sync=args.sync, apoc=args.apoc)
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+from neo4j import GraphDatabase
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from neo4j_bulk import ensure_id_constraints, load_batches, run_parallel, BATCH_SIZE
+
+# ==========================================
+# LOADER BENCHMARK: STATIC CYPHER vs APOC
+# ==========================================
+# Loads neo4j_import/nodes.csv + edges.csv into a LOCAL Neo4j (e.g. the
+# container neo4j_admin_import.py starts) once per loader, wiping in
+# between, and reports rows/s. Never point this at the cloud instance -
+# every round starts with DETACH DELETE.
+#
+#   NEO4J_PASSWORD=... python src/benchmark_neo4j_load.py --rounds 3
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+NODES_PATH = os.path.join(SCRIPT_DIR, "../data/processed/neo4j_import/nodes.csv")
+EDGES_PATH = os.path.join(SCRIPT_DIR, "../data/processed/neo4j_import/edges.csv")
+
+BENCH_URI = os.environ.get("NEO4J_BENCH_URI", "bolt://localhost:7687")
+BENCH_AUTH = ("neo4j", os.environ.get("NEO4J_PASSWORD", "furi-local-pass"))
+WIPE_BATCH = 10000
+
+def wipe(driver):
+    with driver.session() as session:
+        session.run(f"MATCH (n) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {WIPE_BATCH} ROWS").consume()
+
+def has_apoc(driver):
+    try:
+        with driver.session() as session:
+            session.run("RETURN apoc.version()").consume()
+        return True
+    except Exception:
+        return False
+
+def graph_counts(driver):
+    with driver.session() as session:
+        n = session.run("MATCH (n) RETURN count(n) AS n").single()["n"]
+        r = session.run("MATCH ()-[r]->() RETURN count(r) AS r").single()["r"]
+    return n, r
+
+def run_round(driver, nodes_df, edges_df, static, workers, batch_size):
+    wipe(driver)
+    with driver.session() as session:
+        ensure_id_constraints(session, sorted(nodes_df['type'].dropna().unique()))
+    node_batches, edge_batches, _ = load_batches(nodes_df, edges_df, static=static, batch_size=batch_size)
+
+    t0 = time.perf_counter()
+    failed = run_parallel(driver, node_batches, None, workers, "node batch")
+    t1 = time.perf_counter()
+    failed += run_parallel(driver, edge_batches, None, workers, "edge batch")
+    t2 = time.perf_counter()
+    if failed:
+        raise RuntimeError(f"{len(failed)} batches failed: {failed[:5]}")
+    return t1 - t0, t2 - t1, graph_counts(driver)
+
+def benchmark(rounds=3, workers=4, batch_size=BATCH_SIZE):
+    nodes_df = pd.read_csv(NODES_PATH)
+    edges_df = pd.read_csv(EDGES_PATH)
+    driver = GraphDatabase.driver(BENCH_URI, auth=BENCH_AUTH)
+    driver.verify_connectivity()
+
+    loaders = [("static", True)]
+    if has_apoc(driver):
+        loaders.append(("apoc", False))
+    else:
+        print("⚠️ APOC not installed on this instance, benchmarking the static loader only.")
+
+    results = {}
+    try:
+        for name, static in loaders:
+            for i in range(rounds):
+                print(f"⏱️ {name} loader, round {i + 1}/{rounds}...")
+                results.setdefault(name, []).append(run_round(driver, nodes_df, edges_df, static, workers, batch_size))
+    finally:
+        driver.close()
+
+    print(f"\n📊 {len(nodes_df)} nodes, {len(edges_df)} edges, {workers} workers, batches of {batch_size}")
+    print(f"{'loader':<8} {'nodes/s':>12} {'edges/s':>12} {'total s':>9}  graph")
+    for name, runs in results.items():
+        # Best round: the first one also pays for plan compilation and warm-up
+        node_s, edge_s, counts = min(runs, key=lambda r: r[0] + r[1])
+        print(f"{name:<8} {len(nodes_df) / node_s:>12,.0f} {len(edges_df) / edge_s:>12,.0f} "
+              f"{node_s + edge_s:>9.2f}  {counts[0]} nodes / {counts[1]} rels")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the static vs APOC Neo4j loaders on a local instance")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    benchmark(args.rounds, args.workers, args.batch_size)
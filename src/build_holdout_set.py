@@ -2,26 +2,30 @@ import pandas as pd
 import json
 import os
 import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tadpole_store import load_tadpole, tadpole_columns
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-TABULAR_DATA_PATH = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_clean.csv")
 TIMELINES_PATH = os.path.join(SCRIPT_DIR, "../data/processed/CLEAN_1730_TIMELINES.json")
 OUTPUT_PATH = os.path.join(SCRIPT_DIR, "../data/processed/D2_HOLDOUT_SET.json")
 
 def build_holdout_set(sample_size=200):
     print("🔬 Isolating the Official D2 Holdout Set...")
     
-    # 1. Load the tabular data to find D2 patients
-    df = pd.read_csv(TABULAR_DATA_PATH, low_memory=False)
-    
-    if 'D2' not in df.columns:
+    # 1. Find D2 patients (only the RID column of D2 rows is read)
+    if 'D2' not in tadpole_columns():
         print("❌ Error: D2 column not found in tadpole_clean.csv")
         return
         
     # Get unique RIDs where D2 == 1 (Official Test Set)
-    d2_rids = set(df[df['D2'] == 1]['RID'].unique())
+    d2_rids = set(load_tadpole(columns=['RID'], filters=[('D2', '==', 1)])['RID'].unique())
     print(f"📊 Found {len(d2_rids)} unique patients in the official TADPOLE D2 Test Set.")
     
+    # Visits of those patients only
+    df = load_tadpole(columns=['RID', 'Month', 'Label'], filters=[('RID', 'in', sorted(d2_rids))])
+    
     # 2. Get the Final Ground Truth Label for each patient
     # We will grab the LAST recorded Label for each RID to serve as the prediction target
     ground_truths = {}
@@ -1,80 +1,74 @@
 import os
 import argparse
 import sys
-from neo4j import GraphDatabase
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from neo4j_client import kg_client
+from kg_queries import COHORT_NAME, COHORT_STATUS, MACRO_STATS, PATIENT_PROFILE
 
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 
-# 1. SETUP: NEO4J CONNECTION
-URI = "neo4j+s://a1e8aa49.databases.neo4j.io"
-AUTH = ("a1e8aa49", os.environ.get("NEO4J_PASSWORD"))
+# 1. SETUP: KNOWLEDGE GRAPH CONNECTION
+# AuraDB credentials come from .env (see neo4j_client.py);
+# FURI_KG_BACKEND=embedded answers from the local snapshot instead.
 
 class FuriMasterKGGraph:
-    def __init__(self, uri, auth):
-        self.driver = GraphDatabase.driver(uri, auth=auth)
+    def __init__(self, client=kg_client):
+        self.client = client
 
     def close(self):
-        self.driver.close()
+        self.client.close()
+
+    def _single(self, query, **params):
+        """First row of a fixed query, None if there is none. Errors are raised."""
+        rows = self.client.execute_query(query, params)
+        if isinstance(rows, dict):
+            raise RuntimeError(rows["error"])
+        return rows[0] if rows else None
 
     def print_status(self):
         """Fetches the total patient count linked to the Master Node."""
-        query = """
-        MATCH (c:Cohort {name: 'ADNI_1730_Master'})
-        MATCH (p:Patient)-[:MEMBER_OF]->(c)
-        RETURN count(p) as total_patients, c.total_n as expected_n
-        """
-        with self.driver.session() as session:
-            result = session.run(query).single()
-            print("\n" + "="*50)
-            print("🚀 FuriMasterKG Status")
-            print("="*50)
-            print(f"✅ Connection: ONLINE")
-            print(f"🧬 Active Patient Nodes: {result['total_patients']} / {result['expected_n']}")
-            print("="*50 + "\n")
+        result = self._single(COHORT_STATUS, cohort=COHORT_NAME) or {'total_patients': 0, 'expected_n': '?'}
+        print("\n" + "="*50)
+        print("🚀 FuriMasterKG Status")
+        print("="*50)
+        print(f"✅ Connection: ONLINE ({self.client.backend})")
+        print(f"🧬 Active Patient Nodes: {result['total_patients']} / {result['expected_n']}")
+        print("="*50 + "\n")
 
     def print_master_stats(self):
         """Fetches the Global Ground Truth from the Macro-KG."""
-        query = """
-        MATCH (mci:ClinicalState {name: 'MCI'})-[r:CONVERTS_TO]->(ad:ClinicalState {name: 'AD'})
-        MATCH (atrophy:Biomarker {name: 'Hippocampal Atrophy'})-[c:CORRELATES_WITH]->(mmse:CognitiveTest)
-        RETURN r.rate as conversion_rate, r.avg_years as avg_years, 
-               atrophy.annual_rate_percent as atrophy_rate, c.r_value as pearson_r
-        """
-        with self.driver.session() as session:
-            result = session.run(query).single()
-            print("\n" + "="*50)
-            print("📊 GLOBAL COHORT STATS (MACRO-KG)")
-            print("="*50)
-            print(f"📉 MCI-to-Dementia Conversion: {result['conversion_rate'] * 100}% (over {result['avg_years']} yrs)")
-            print(f"🧠 Avg Annual Hippocampal Atrophy: {result['atrophy_rate']}%")
-            print(f"🔗 Biomarker-to-Cognition Correlation: r = {result['pearson_r']}")
-            print("="*50 + "\n")
+        result = self._single(MACRO_STATS)
+        if result is None:
+            print("\n❌ Macro-KG not found. Run step1a_ontology.py first.\n")
+            return
+        print("\n" + "="*50)
+        print("📊 GLOBAL COHORT STATS (MACRO-KG)")
+        print("="*50)
+        print(f"📉 MCI-to-Dementia Conversion: {result['conversion_rate'] * 100}% (over {result['avg_years']} yrs)")
+        print(f"🧠 Avg Annual Hippocampal Atrophy: {result['atrophy_rate']}%")
+        print(f"🔗 Biomarker-to-Cognition Correlation: r = {result['pearson_r']}")
+        print("="*50 + "\n")
 
     def query_patient(self, rid):
         """Fetches a specific patient and their 'Clinical Twins' via the P2P Mesh."""
-        query = """
-        MATCH (p:Patient {rid: $rid})
-        OPTIONAL MATCH (p)-[:SIMILAR_TO]-(twin:Patient)
-        RETURN p.summary as summary, p.total_visits as visits, collect(twin.rid) as twins
-        """
-        with self.driver.session() as session:
-            result = session.run(query, rid=int(rid)).single()
-            
-            if not result or not result['summary']:
-                print(f"\n❌ Patient RID {rid} not found in the Knowledge Graph.\n")
-                return
-
-            print("\n" + "="*50)
-            print(f"👤 PATIENT PROFILE: RID {rid}")
-            print("="*50)
-            print(f"📅 Total Visits: {result['visits']}")
-            print(f"👯 Clinical Twins Found: {len(result['twins'])} matching patients")
-            if len(result['twins']) > 0:
-                print(f"   Sample Twins: {result['twins'][:5]}...")
-            print("\n📄 TIMELINE SUMMARY:")
-            print(result['summary'])
-            print("="*50 + "\n")
+        result = self._single(PATIENT_PROFILE, rid=int(rid))
+
+        if not result or not result['summary']:
+            print(f"\n❌ Patient RID {rid} not found in the Knowledge Graph.\n")
+            return
+
+        print("\n" + "="*50)
+        print(f"👤 PATIENT PROFILE: RID {rid}")
+        print("="*50)
+        print(f"📅 Total Visits: {result['visits']}")
+        print(f"👯 Clinical Twins Found: {len(result['twins'])} matching patients")
+        if len(result['twins']) > 0:
+            print(f"   Sample Twins: {result['twins'][:5]}...")
+        print("\n📄 TIMELINE SUMMARY:")
+        print(result['summary'])
+        print("="*50 + "\n")
 
 def main():
     parser = argparse.ArgumentParser(description="FuriMasterKG Terminal Interface")
@@ -89,8 +83,8 @@ def main():
         parser.print_help()
         sys.exit(1)
 
-    # Initialize Neo4j Connection
-    kg = FuriMasterKGGraph(URI, AUTH)
+    # Initialize the Knowledge Graph client (AuraDB or embedded snapshot)
+    kg = FuriMasterKGGraph()
 
     try:
         if args.status:
@@ -0,0 +1,321 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tadpole_store import load_tadpole, tadpole_columns
+
+# ==========================================
+# CLINICAL TWINS: FEATURE-VECTOR kNN
+# ==========================================
+# Every patient becomes one standardized longitudinal vector:
+#   static     AGE, PTEDUCAT, APOE4 (first visit)
+#   per marker baseline (first observed value) and slope per year (OLS
+#              over all observed visits), volumes ICV-normalized
+# Columns are z-scored and missing entries set to 0 (the cohort mean), so
+# every dimension weighs the same. The exact top-k neighbours come from
+# blocked |a|^2 + |b|^2 - 2ab distance tiles (BLOCK_CELLS bounds the tile
+# size), so memory stays flat and 100k patients is a few minutes of BLAS.
+# The tiles only pick candidates: everything within rounding error of the
+# k-th is re-ranked on exact distances, so ties (common, since missing
+# entries are all 0) always go to the lower index.
+#
+# build_twins() also saves the directed top-k lists, vectors and
+# standardization stats (clinical_twins_state.npz). add_patients() uses
+# them to place new patients without a rebuild: their own top-k comes from
+# one pass over the cohort (stats frozen), and an existing patient's list
+# only changes where a new patient beats its current k-th twin.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TWINS_PATH = os.path.join(SCRIPT_DIR, "../data/processed/clinical_twins.csv")
+
+STATIC_COLUMNS = ['AGE', 'PTEDUCAT', 'APOE4']
+MARKER_COLUMNS = ['MMSE', 'ADAS13', 'CDRSB', 'FDG', 'AV45',
+                  'Hippocampus', 'Ventricles', 'WholeBrain', 'Entorhinal']
+ICV_NORMALIZED = ['Hippocampus', 'Ventricles', 'WholeBrain', 'Entorhinal']
+
+TWIN_STATE_PATH = os.path.join(SCRIPT_DIR, "../data/processed/clinical_twins_state.npz")
+
+K_TWINS = 5
+BLOCK_CELLS = 1 << 24   # distance-tile entries per block (~128 MB as float64)
+D2_RTOL, D2_ATOL = 1e-9, 1e-12
+TWIN_REASON = "KNN_TRAJECTORY"
+
+def patient_features(df):
+    """
+    (rids, names, X) from a tadpole_clean frame sorted by (RID, Month).
+    X holds raw (unstandardized) features, NaN where a patient has no data.
+    """
+    df = df.copy()
+    if 'ICV' in df:
+        icv = df['ICV'].where(df['ICV'] > 0)
+        for col in ICV_NORMALIZED:
+            if col in df:
+                df[col] = df[col] / icv
+    years = df['Month'].astype(float) / 12.0
+    grouped = df.groupby('RID', sort=True)
+    parts, names = [], []
+
+    static = [c for c in STATIC_COLUMNS if c in df]
+    if static:
+        parts.append(grouped[static].first())   # first non-null per column
+        names += [c.lower() for c in static]
+
+    for col in [c for c in MARKER_COLUMNS if c in df]:
+        y = df[col].astype(float)
+        valid = y.notna() & years.notna()
+        t, v = years.where(valid), y.where(valid)
+        # OLS slope from per-patient sums: (nΣty - ΣtΣy) / (nΣt² - (Σt)²)
+        sums = pd.DataFrame({'n': valid.astype(float), 't': t, 'y': v, 'ty': t * v, 'tt': t * t,
+                             'RID': df['RID']}).groupby('RID', sort=True).sum(min_count=1)
+        denom = sums['n'] * sums['tt'] - sums['t'] ** 2
+        slope = (sums['n'] * sums['ty'] - sums['t'] * sums['y']) / denom.where(denom > 1e-12)
+        parts.append(pd.DataFrame({f"{col.lower()}_baseline": grouped[col].first(),
+                                   f"{col.lower()}_slope": slope}))
+        names += [f"{col.lower()}_baseline", f"{col.lower()}_slope"]
+
+    features = pd.concat(parts, axis=1)
+    return features.index.to_numpy(), names, features.to_numpy(dtype=float)
+
+def feature_stats(X):
+    """(mean, std) per column, ignoring NaN; constant or empty columns get std 1."""
+    mean = np.nanmean(X, axis=0) if len(X) else np.zeros(X.shape[1])
+    std = np.nanstd(X, axis=0) if len(X) else np.ones(X.shape[1])
+    mean = np.where(np.isnan(mean), 0.0, mean)
+    std = np.where(np.isnan(std) | (std < 1e-12), 1.0, std)
+    return mean, std
+
+def standardize(X, stats=None):
+    """Z-scores columns (with `stats` from feature_stats, or X's own); missing values become 0."""
+    mean, std = feature_stats(X) if stats is None else stats
+    Z = (X - mean) / std
+    return np.where(np.isnan(Z), 0.0, Z)
+
+def _d2_slack(sq_a, sq_b):
+    """Bound on the rounding error of |a|^2 + |b|^2 - 2ab (generous by a few orders)."""
+    return D2_RTOL * (sq_a + sq_b) + D2_ATOL
+
+def _exact_distances(Z, a, b, block_cells=BLOCK_CELLS):
+    """Euclidean distance of each pair (Z[a[i]], Z[b[i]]), in chunks of block_cells entries."""
+    out = np.empty(len(a))
+    step = max(1, block_cells // max(Z.shape[1], 1))
+    for lo in range(0, len(a), step):
+        hi = lo + step
+        out[lo:hi] = np.sqrt(((Z[a[lo:hi]] - Z[b[lo:hi]]) ** 2).sum(axis=1))
+    return out
+
+def knn(Z, k=K_TWINS, block_cells=BLOCK_CELLS, rows=None):
+    """
+    Exact k nearest neighbours (self excluded) by Euclidean distance, for
+    every row of Z or only `rows`. Returns (indices, distances), both
+    (len(rows), k), sorted by distance; ties go to the lower index. Rows with
+    fewer than k others are padded with -1/inf.
+    """
+    Z = np.ascontiguousarray(Z, dtype=np.float64)
+    n = len(Z)
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.int64)
+    k_eff = min(k, max(n - 1, 0))
+    indices = np.full((len(rows), k), -1, dtype=np.int64)
+    distances = np.full((len(rows), k), np.inf)
+    if k_eff == 0:
+        return indices, distances
+    sq = np.einsum('ij,ij->i', Z, Z)
+    block = max(1, block_cells // n)
+    for lo in range(0, len(rows), block):
+        hi = min(lo + block, len(rows))
+        q = rows[lo:hi]
+        d2 = sq[q, None] + sq[None, :] - 2.0 * (Z[q] @ Z.T)
+        d2[np.arange(hi - lo), q] = np.inf                          # no self-twins
+        # Every column within rounding error of the k-th smallest is a
+        # candidate, so ties at the cut are all kept, not an arbitrary subset
+        kth = np.partition(d2, k_eff - 1, axis=1)[:, k_eff - 1]
+        a, b = np.nonzero(d2 <= (kth + _d2_slack(sq[q], sq.max()))[:, None])
+        # Exact distances, then (row, distance, index) order; keep each row's first k
+        exact = _exact_distances(Z, q[a], b, block_cells)
+        order = np.lexsort((b, exact, a))
+        a, b, exact = a[order], b[order], exact[order]
+        slot = np.arange(len(a)) - np.searchsorted(a, a)            # rank within the row
+        keep = slot < k_eff
+        indices[lo + a[keep], slot[keep]] = b[keep]
+        distances[lo + a[keep], slot[keep]] = exact[keep]
+    return indices, distances
+
+def twin_pairs(rids, indices, distances):
+    """
+    Undirected twin edges as a DataFrame (src_rid < dst_rid, one row per
+    pair) with the Euclidean distance and the best rank either side gave it.
+    """
+    n, k = indices.shape
+    src = np.repeat(np.arange(n), k)
+    dst = indices.ravel()
+    rank = np.tile(np.arange(1, k + 1), n)
+    keep = dst >= 0
+    src, dst, rank, dist = src[keep], dst[keep], rank[keep], distances.ravel()[keep]
+    a, b = np.minimum(src, dst), np.maximum(src, dst)
+    pairs = pd.DataFrame({'a': a, 'b': b, 'euclidean_distance': dist, 'rank': rank})
+    pairs = pairs.sort_values(['a', 'b', 'rank']).drop_duplicates(['a', 'b'])
+    return pd.DataFrame({
+        'src_rid': rids[pairs['a'].to_numpy()], 'dst_rid': rids[pairs['b'].to_numpy()],
+        'euclidean_distance': pairs['euclidean_distance'].to_numpy(), 'rank': pairs['rank'].to_numpy(),
+    }).reset_index(drop=True)
+
+def load_patient_features(rids=None):
+    """patient_features() over tadpole_clean, or only the patients in `rids`."""
+    available = tadpole_columns()
+    wanted = ['RID', 'Month', 'ICV'] + STATIC_COLUMNS + MARKER_COLUMNS
+    filters = [('RID', 'in', sorted(rids))] if rids is not None else None
+    df = load_tadpole(columns=[c for c in wanted if c in available], filters=filters)
+    return patient_features(df)
+
+def save_twin_state(state, path=TWIN_STATE_PATH):
+    """state: dict of rids, names, Z, mean, std, indices, distances (rows sorted by RID)."""
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **{key: np.asarray(value) for key, value in state.items()})
+    os.replace(tmp, path)
+
+def load_twin_state(path=TWIN_STATE_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No twin state at {path}. Run a full step1c_similarity_edges.py build first.")
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+def add_patients(state, new_rids, X_new, block_cells=BLOCK_CELLS):
+    """
+    Inserts new patients (raw patient_features rows) into a twin state,
+    standardized with the state's stats. Returns (new state, changed RIDs):
+    the new patients plus every existing patient whose top-k list now
+    includes one of them. The lists equal knn() over the combined vectors.
+    """
+    new_rids = np.asarray(new_rids)
+    k = state['indices'].shape[1]
+    n_old, m = len(state['rids']), len(new_rids)
+    rids = np.concatenate([state['rids'], new_rids])
+    Z = np.vstack([state['Z'], standardize(X_new, (state['mean'], state['std']))])
+    # Keep rows in RID order, as a full build has them, so index ties break the same way
+    perm = np.argsort(rids, kind='stable')
+    pos = np.empty_like(perm)
+    pos[perm] = np.arange(len(perm))
+    rids, Z = rids[perm], Z[perm]
+    old_pos, new_pos = pos[:n_old], pos[n_old:]
+    indices = np.full((len(rids), k), -1, dtype=np.int64)
+    distances = np.full((len(rids), k), np.inf)
+    old_idx = state['indices']
+    indices[old_pos] = np.where(old_idx >= 0, pos[np.maximum(old_idx, 0)], -1)
+    distances[old_pos] = state['distances']
+
+    # Existing rows: a new patient enters the list if it beats the k-th twin
+    # in (distance, index) order; candidates from the fast expansion are
+    # re-checked with exact distances, as knn() does.
+    kth_d, kth_i = distances[old_pos, -1], indices[old_pos, -1]
+    sq_old = np.einsum('ij,ij->i', Z[old_pos], Z[old_pos])
+    hit_rows, hit_new, hit_d = [np.empty(0, np.int64)], [np.empty(0, np.int64)], [np.empty(0)]
+    block = max(1, block_cells // max(n_old, 1))
+    for lo in range(0, m, block):
+        q = new_pos[lo:lo + block]
+        sq_q = (Z[q] ** 2).sum(axis=1)
+        d2 = sq_q[:, None] + sq_old[None, :] - 2.0 * (Z[q] @ Z[old_pos].T)
+        a, b = np.nonzero(d2 <= kth_d[None, :] ** 2 + _d2_slack(sq_q[:, None], sq_old[None, :]))
+        exact = _exact_distances(Z, q[a], old_pos[b], block_cells)
+        keep = (exact < kth_d[b]) | ((exact == kth_d[b]) & (q[a] < kth_i[b]))
+        hit_rows.append(old_pos[b[keep]]), hit_new.append(q[a[keep]]), hit_d.append(exact[keep])
+    hit_rows, hit_new, hit_d = np.concatenate(hit_rows), np.concatenate(hit_new), np.concatenate(hit_d)
+
+    displaced = np.unique(hit_rows)
+    if len(displaced):
+        # Merge each displaced row's list with its hits and keep the best k
+        row_of = np.searchsorted(displaced, hit_rows)
+        order = np.argsort(row_of, kind='stable')
+        row_of = row_of[order]
+        slot = np.arange(len(row_of)) - np.searchsorted(row_of, row_of)   # position among the row's hits
+        extra = slot.max() + 1
+        cand = np.full((len(displaced), k + extra), -1, dtype=np.int64)
+        cand_d = np.full((len(displaced), k + extra), np.inf)
+        cand[:, :k], cand_d[:, :k] = indices[displaced], distances[displaced]
+        cand[row_of, k + slot], cand_d[row_of, k + slot] = hit_new[order], hit_d[order]
+        # -1 padding sorts last among equal (inf) distances
+        best = np.lexsort((np.where(cand < 0, len(rids), cand), cand_d), axis=1)[:, :k]
+        indices[displaced] = np.take_along_axis(cand, best, axis=1)
+        distances[displaced] = np.take_along_axis(cand_d, best, axis=1)
+
+    # New rows: exact search over everyone
+    indices[new_pos], distances[new_pos] = knn(Z, k, block_cells, rows=new_pos)
+
+    new_state = dict(state, rids=rids, Z=Z, indices=indices, distances=distances)
+    changed = np.union1d(rids[new_pos], rids[displaced])
+    return new_state, changed
+
+def diff_twin_edges(old_edges, new_edges):
+    """(upserts, removed): pairs that are new or changed rank/distance, and pairs that are gone."""
+    keys = ['src_rid', 'dst_rid']
+    both = old_edges.merge(new_edges, on=keys, how='outer', suffixes=('_old', ''), indicator=True)
+    upsert = (both['_merge'] == 'right_only') | ((both['_merge'] == 'both') & (
+        (both['rank'] != both['rank_old']) | (both['euclidean_distance'] != both['euclidean_distance_old'])))
+    upserts = both.loc[upsert, keys + ['euclidean_distance', 'rank']].reset_index(drop=True)
+    upserts['rank'] = upserts['rank'].astype(np.int64)
+    removed = both.loc[both['_merge'] == 'left_only', keys].reset_index(drop=True)
+    return upserts, removed
+
+def build_twins(rids=None, k=K_TWINS, out_path=TWINS_PATH, state_path=TWIN_STATE_PATH):
+    """
+    Twin edges for every patient in tadpole_clean (or only `rids`), saved to
+    clinical_twins.csv, plus the state add_patients() needs. Returns the
+    edge DataFrame.
+    """
+    start = time.perf_counter()
+    patient_rids, names, X = load_patient_features(rids)
+    stats = feature_stats(X)
+    Z = standardize(X, stats)
+    print(f"   - {len(patient_rids)} patients x {len(names)} features ({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    indices, distances = knn(Z, k)
+    edges = twin_pairs(patient_rids, indices, distances)
+    print(f"   - Exact top-{k} for {len(patient_rids)} patients: {len(edges)} twin pairs "
+          f"({time.perf_counter() - start:.1f}s)")
+    if out_path:
+        edges.to_csv(out_path, index=False)
+        print(f"✅ CLINICAL TWINS SAVED: {out_path}")
+    if state_path:
+        save_twin_state({'rids': patient_rids, 'names': np.array(names), 'Z': Z, 'mean': stats[0],
+                         'std': stats[1], 'indices': indices, 'distances': distances}, state_path)
+    return edges
+
+def update_twins(new_rids, state_path=TWIN_STATE_PATH):
+    """
+    Adds the patients in `new_rids` that the saved state does not have yet.
+    Returns (new state, upserts, removed); the state also carries the new
+    'edges' and the 'added' RIDs. The state and clinical_twins.csv are only
+    rewritten by commit_twin_update() once the graph has the edges.
+    """
+    nothing = (None, pd.DataFrame(columns=['src_rid', 'dst_rid', 'euclidean_distance', 'rank']),
+               pd.DataFrame(columns=['src_rid', 'dst_rid']))
+    state = load_twin_state(state_path)
+    new_rids = np.setdiff1d(np.asarray(list(new_rids)), state['rids'])
+    if len(new_rids) == 0:
+        return nothing
+    start = time.perf_counter()
+    found, names, X = load_patient_features(new_rids)
+    if len(found) < len(new_rids):
+        print(f"   - {len(new_rids) - len(found)} new RIDs have no rows in tadpole_clean; skipped")
+    if len(found) == 0:
+        return nothing
+    if list(names) != state['names'].tolist():
+        raise ValueError("Feature columns changed since the twin state was built; run a full rebuild.")
+    old_edges = twin_pairs(state['rids'], state['indices'], state['distances'])
+    new_state, changed = add_patients(state, found, X)
+    new_edges = twin_pairs(new_state['rids'], new_state['indices'], new_state['distances'])
+    upserts, removed = diff_twin_edges(old_edges, new_edges)
+    print(f"   - {len(found)} new patients, {len(changed) - len(found)} displaced lists: "
+          f"{len(upserts)} edges to write, {len(removed)} to delete ({time.perf_counter() - start:.1f}s)")
+    new_state['edges'], new_state['added'] = new_edges, found
+    return new_state, upserts, removed
+
+def commit_twin_update(new_state, state_path=TWIN_STATE_PATH, out_path=TWINS_PATH):
+    """Persists an update_twins() result after its edges were written."""
+    edges = new_state.pop('edges')
+    new_state.pop('added', None)
+    save_twin_state(new_state, state_path)
+    if out_path:
+        edges.to_csv(out_path, index=False)
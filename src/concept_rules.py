@@ -0,0 +1,116 @@
+import os
+import json
+import numpy as np
+
+# ==========================================
+# DECLARATIVE CONCEPT RULES (Lane 1 data -> Lane 2 knowledge)
+# ==========================================
+# Each rule links a node to a Concept when one column passes a threshold:
+#   id/name   concept node (ids are stable, they end up in the graph)
+#   node      'visit' (evaluated per visit) or 'patient' (on the first visit)
+#   column    tadpole_clean column
+#   op        '<', '<=', '>', '>=' against `value`, or 'between' for [lo, hi)
+#   value     a number, or {"profile": col, "std": k} = profiled mean + k * std
+#
+# compile_rules() resolves every threshold once and packs the rules into
+# bound vectors, so evaluation is a single vectorized pass over the visit
+# matrix no matter how many rules there are. Missing values never match.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_PATH = os.path.join(SCRIPT_DIR, "../data/processed/feature_profile.json")
+
+CONCEPT_RULES = [
+    # --- Original bridges (from the Week 2 profiling) ---
+    {'id': 0, 'name': "Concept:Brain_Atrophy", 'node': 'visit',
+     'column': 'Hippocampus', 'op': '<', 'value': {'profile': 'Hippocampus', 'std': -1.0}},
+    {'id': 1, 'name': "Concept:Cognitive_Decline", 'node': 'visit',
+     'column': 'MMSE', 'op': '<', 'value': 24},                       # Clinical Cutoff
+    {'id': 2, 'name': "Concept:Genetic_Risk_APOE4", 'node': 'patient',
+     'column': 'APOE4', 'op': '>', 'value': 0},                       # Carries >= 1 e4 allele
+    {'id': 3, 'name': "Concept:Amyloid_Positive", 'node': 'visit',
+     'column': 'AV45', 'op': '>', 'value': 1.11},                     # Clinical Cutoff (ADNI florbetapir SUVR, Landau et al.)
+    # --- Extended bridges ---
+    {'id': 4, 'name': "Concept:Entorhinal_Atrophy", 'node': 'visit',
+     'column': 'Entorhinal', 'op': '<', 'value': {'profile': 'Entorhinal', 'std': -1.0}},
+    {'id': 5, 'name': "Concept:ADAS13_Mild_Impairment", 'node': 'visit',
+     'column': 'ADAS13', 'op': 'between',
+     'value': ({'profile': 'ADAS13', 'std': 0.0}, {'profile': 'ADAS13', 'std': 1.0})},
+    {'id': 6, 'name': "Concept:ADAS13_Severe_Impairment", 'node': 'visit',
+     'column': 'ADAS13', 'op': '>=', 'value': {'profile': 'ADAS13', 'std': 1.0}},
+    {'id': 7, 'name': "Concept:FDG_Hypometabolism", 'node': 'visit',
+     'column': 'FDG', 'op': '<', 'value': 1.21},                      # Clinical Cutoff (ADNI FDG meta-ROI, Landau et al. 2011)
+    {'id': 8, 'name': "Concept:CDR_Questionable_Impairment", 'node': 'visit',
+     'column': 'CDRSB', 'op': 'between', 'value': (0.5, 4.5)},        # Clinical Cutoff (CDR-SB staging, O'Bryant et al. 2008)
+    {'id': 9, 'name': "Concept:CDR_Dementia_Range", 'node': 'visit',
+     'column': 'CDRSB', 'op': '>=', 'value': 4.5},                    # Clinical Cutoff (CDR-SB staging, O'Bryant et al. 2008)
+]
+
+CONCEPTS = {r['id']: r['name'] for r in sorted(CONCEPT_RULES, key=lambda r: r['id'])}
+
+def rule_columns(rules=CONCEPT_RULES):
+    return list(dict.fromkeys(r['column'] for r in rules))
+
+def load_profile(path=PROFILE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _resolve(value, profile, df):
+    if not isinstance(value, dict):
+        return float(value)
+    col = value['profile']
+    stats = profile.get(col)
+    if stats is None:
+        # No saved profile for this column: profile the frame being built
+        stats = {'mean': float(df[col].mean()), 'std': float(df[col].std())}
+    return stats['mean'] + value.get('std', 0.0) * stats['std']
+
+def _bounds(rule, profile, df):
+    """(lo, hi, lo_inclusive, hi_inclusive) for one rule."""
+    op, value = rule['op'], rule['value']
+    if op == 'between':
+        return _resolve(value[0], profile, df), _resolve(value[1], profile, df), True, False
+    t = _resolve(value, profile, df)
+    if op == '<':
+        return -np.inf, t, False, False
+    if op == '<=':
+        return -np.inf, t, False, True
+    if op == '>':
+        return t, np.inf, False, False
+    if op == '>=':
+        return t, np.inf, True, False
+    raise ValueError(f"Unsupported rule op '{op}' for concept {rule['id']}")
+
+class CompiledRules:
+    """Rules for one node type packed into bound vectors (one column per rule)."""
+
+    def __init__(self, rules, profile, df):
+        self.rules = list(rules)
+        self.concepts = np.array([r['id'] for r in self.rules], dtype=np.int64)
+        self.columns = [r['column'] for r in self.rules]
+        bounds = [_bounds(r, profile, df) for r in self.rules]
+        self.lo = np.array([b[0] for b in bounds], dtype=float)
+        self.hi = np.array([b[1] for b in bounds], dtype=float)
+        self.lo_inclusive = np.array([b[2] for b in bounds])
+        self.hi_inclusive = np.array([b[3] for b in bounds])
+
+    def evaluate(self, df):
+        """Boolean (n_rows, n_rules) mask in one pass over the needed columns."""
+        unique_cols = list(dict.fromkeys(self.columns))
+        matrix = df[unique_cols].to_numpy(dtype=float) if unique_cols else np.empty((len(df), 0))
+        x = matrix[:, [unique_cols.index(c) for c in self.columns]]
+        above = (x > self.lo) | (self.lo_inclusive & (x == self.lo))
+        below = (x < self.hi) | (self.hi_inclusive & (x == self.hi))
+        return above & below
+
+    def edges(self, mask, node_ids):
+        """(src, concept) edge array, row-major: per node, concepts in rule order."""
+        rows, cols = np.nonzero(mask)
+        return np.vstack([np.asarray(node_ids, dtype=np.int64)[rows], self.concepts[cols]])
+
+def compile_rules(df, rules=CONCEPT_RULES, profile=None):
+    """{'visit': CompiledRules, 'patient': CompiledRules}, thresholds resolved once."""
+    profile = load_profile() if profile is None else profile
+    return {node: CompiledRules([r for r in rules if r['node'] == node], profile, df)
+            for node in ('visit', 'patient')}
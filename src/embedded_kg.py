@@ -0,0 +1,356 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from kg_queries import NAMED_QUERIES, QUERY_NAMES, COHORT_NAME, normalize
+
+# ==========================================
+# EMBEDDED (IN-PROCESS) KNOWLEDGE-GRAPH BACKEND
+# ==========================================
+# A read-only copy of FuriMasterKG held in memory, for offline runs, tests
+# and benchmarks (FURI_KG_BACKEND=embedded, see neo4j_client.py).
+#
+#   kg_snapshot/
+#     nodes.jsonl   {"id": elementId, "labels": [...], "props": {...}}
+#     rels.jsonl    {"id": elementId, "type": ..., "src": id, "dst": id, "props": {...}}
+#
+# Loaded into integer node ids, one object column per property, and per
+# relationship type a CSR over sources and one over targets, so the fixed
+# queries in kg_queries.py are a dict lookup plus an adjacency slice. Any
+# other Cypher gets the same {"error", "query"} dict Neo4jClient returns on
+# failure.
+#
+#   python src/embedded_kg.py --dump    # snapshot the live graph (needs .env)
+#   python src/embedded_kg.py --bench   # per-query latency on the snapshot
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+KG_SNAPSHOT_DIR = os.path.join(SCRIPT_DIR, "../data/processed/kg_snapshot")
+NODES_FILE = "nodes.jsonl"
+RELS_FILE = "rels.jsonl"
+
+def write_snapshot(nodes, rels, out_dir=KG_SNAPSHOT_DIR):
+    """
+    nodes: iterable of {"id", "labels", "props"}
+    rels:  iterable of {"id", "type", "src", "dst", "props"} (src/dst are node ids)
+    """
+    tmp_dir = out_dir.rstrip('/') + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    counts = {}
+    for name, rows in ((NODES_FILE, nodes), (RELS_FILE, rels)):
+        counts[name] = 0
+        with open(os.path.join(tmp_dir, name), 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+                counts[name] += 1
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    print(f"✅ KG SNAPSHOT SAVED: {out_dir} ({counts[NODES_FILE]} nodes, {counts[RELS_FILE]} relationships)")
+
+def dump_neo4j_snapshot(driver, out_dir=KG_SNAPSHOT_DIR):
+    """Streams every node and relationship of the live graph into a snapshot."""
+    with driver.session() as session:
+        nodes = [{"id": r["id"], "labels": r["labels"], "props": r["props"]} for r in session.run(
+            "MATCH (n) RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props")]
+        rels = ({"id": r["id"], "type": r["type"], "src": r["src"], "dst": r["dst"], "props": r["props"]}
+                for r in session.run("MATCH (s)-[r]->(d) RETURN elementId(r) AS id, type(r) AS type, "
+                                     "elementId(s) AS src, elementId(d) AS dst, properties(r) AS props"))
+        write_snapshot(nodes, rels, out_dir)
+
+def _read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _columns(rows):
+    """{prop: object array, None where a row lacks it}."""
+    columns = {}
+    for i, row in enumerate(rows):
+        for key, value in row["props"].items():
+            if key not in columns:
+                columns[key] = np.full(len(rows), None, dtype=object)
+            columns[key][i] = value
+    return columns
+
+def _csr(keys, n_rows):
+    """(indptr, order): positions order[indptr[k]:indptr[k + 1]] have key k, in input order."""
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_rows), out=indptr[1:])
+    return indptr, order
+
+class _RelType:
+    def __init__(self, rows, index_of, n_nodes):
+        self.ids = [r["id"] for r in rows]
+        self.src = np.array([index_of[r["src"]] for r in rows], dtype=np.int64)
+        self.dst = np.array([index_of[r["dst"]] for r in rows], dtype=np.int64)
+        self.columns = _columns(rows)
+        self.out_ptr, self.out_order = _csr(self.src, n_nodes)
+        self.in_ptr, self.in_order = _csr(self.dst, n_nodes)
+
+    def prop(self, pos, key):
+        column = self.columns.get(key)
+        return None if column is None else column[pos]
+
+    def outgoing(self, node):
+        """[(rel position, other node)] for relationships leaving `node`."""
+        pos = self.out_order[self.out_ptr[node]:self.out_ptr[node + 1]]
+        return list(zip(pos.tolist(), self.dst[pos].tolist()))
+
+    def incoming(self, node):
+        pos = self.in_order[self.in_ptr[node]:self.in_ptr[node + 1]]
+        return list(zip(pos.tolist(), self.src[pos].tolist()))
+
+    def both(self, node):
+        # An undirected pattern matches each relationship once per direction
+        return self.outgoing(node) + self.incoming(node)
+
+class EmbeddedGraph:
+    """Read-only in-memory graph answering the fixed kg_queries patterns."""
+
+    def __init__(self, nodes, rels):
+        self.node_ids = [n["id"] for n in nodes]
+        self.index_of = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.labels = [tuple(n["labels"]) for n in nodes]
+        self.columns = _columns(nodes)
+        self.label_nodes = {}
+        for i, labels in enumerate(self.labels):
+            for label in labels:
+                self.label_nodes.setdefault(label, []).append(i)
+        by_type = {}
+        for r in rels:
+            by_type.setdefault(r["type"], []).append(r)
+        self.rel_types = {t: _RelType(rows, self.index_of, len(nodes)) for t, rows in by_type.items()}
+        self._keys = {}
+        self._handlers = {name: getattr(self, f"_q_{name}") for name in NAMED_QUERIES}
+
+    @classmethod
+    def load(cls, root=KG_SNAPSHOT_DIR):
+        return cls(_read_jsonl(os.path.join(root, NODES_FILE)), _read_jsonl(os.path.join(root, RELS_FILE)))
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    # --- primitives ---
+
+    def prop(self, node, key):
+        column = self.columns.get(key)
+        return None if column is None else column[node]
+
+    def properties(self, node):
+        return {key: column[node] for key, column in self.columns.items() if column[node] is not None}
+
+    def find(self, label, key, value):
+        """Nodes with `label` whose `key` equals value (hash index built on first use)."""
+        if (label, key) not in self._keys:
+            index = {}
+            for i in self.label_nodes.get(label, []):
+                v = self.prop(i, key)
+                if v is not None:
+                    index.setdefault(v, []).append(i)
+            self._keys[(label, key)] = index
+        return self._keys[(label, key)].get(value, [])
+
+    def label_mask(self, label):
+        """Boolean array over nodes: has `label` (cached)."""
+        if ("mask", label) not in self._keys:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[self.label_nodes.get(label, [])] = True
+            self._keys[("mask", label)] = mask
+        return self._keys[("mask", label)]
+
+    def rels(self, rel_type):
+        return self.rel_types.get(rel_type)
+
+    def execute_query(self, cypher_query, parameters=None):
+        """Same contract as Neo4jClient.execute_query: list of row dicts or an error dict."""
+        name = QUERY_NAMES.get(normalize(cypher_query))
+        if name is None:
+            return {"error": "The embedded backend only answers the fixed queries in kg_queries.py",
+                    "query": cypher_query}
+        try:
+            return self._handlers[name](**(parameters or {}))
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}", "query": cypher_query}
+
+    # --- fixed query patterns (see kg_queries.py for the Cypher) ---
+
+    def _twins(self, node, rel_type="SIMILAR_TO"):
+        similar = self.rels(rel_type)
+        if similar is None:
+            return []
+        return [(pos, other) for pos, other in similar.both(node) if "Patient" in self.labels[other]]
+
+    def _closest_twins(self, node):
+        """SIMILAR_TO twins of `node` by euclidean_distance (ORDER BY puts nulls last)."""
+        similar = self.rels("SIMILAR_TO")
+        twins = self._twins(node)
+        dist = [similar.prop(pos, "euclidean_distance") for pos, _ in twins]
+        order = sorted(range(len(twins)), key=lambda i: (dist[i] is None, dist[i] or 0.0))
+        return [twins[i] for i in order]
+
+    def _q_twin_lookup(self, rid, limit):
+        rows = []
+        similar = self.rels("SIMILAR_TO")
+        for p1 in self.find("Patient", "rid", rid):
+            for pos, p2 in self._closest_twins(p1):
+                rows.append({"primary_rid": self.prop(p1, "rid"), "primary_summary": self.prop(p1, "summary"),
+                             "twin_rid": self.prop(p2, "rid"), "twin_summary": self.prop(p2, "summary"),
+                             "match_logic": similar.prop(pos, "reason")})
+        return rows[:limit]
+
+    def _twin_groups(self, patients, limit):
+        rows = []
+        patients = sorted(set(patients), key=lambda p: (self.prop(p, "rid") is None, self.prop(p, "rid") or 0))
+        for p1 in patients:
+            twins = self._closest_twins(p1)
+            if twins:
+                rows.append({"primary_rid": self.prop(p1, "rid"),
+                             "twins": [{"twin_rid": self.prop(p2, "rid"), "twin_summary": self.prop(p2, "summary")}
+                                       for _, p2 in twins[:limit]]})
+        return rows
+
+    def _q_twin_lookup_many(self, rids, limit):
+        return self._twin_groups([p for rid in rids for p in self.find("Patient", "rid", rid)], limit)
+
+    def _q_twin_export(self, limit):
+        return self._twin_groups(self.label_nodes.get("Patient", []), limit)
+
+    def _q_trajectory_twin_lookup(self, rid, limit):
+        rows = []
+        traj = self.rels("TRAJECTORY_TWIN")
+        for p1 in self.find("Patient", "rid", rid):
+            for pos, p2 in self._twins(p1, "TRAJECTORY_TWIN"):
+                rows.append({"primary_rid": self.prop(p1, "rid"), "primary_summary": self.prop(p1, "summary"),
+                             "twin_rid": self.prop(p2, "rid"), "twin_summary": self.prop(p2, "summary"),
+                             "match_logic": traj.prop(pos, "reason"), "dtw_distance": traj.prop(pos, "dtw_distance")})
+        # ORDER BY puts nulls last
+        rows.sort(key=lambda r: (r["dtw_distance"] is None, r["dtw_distance"] or 0.0))
+        return rows[:limit]
+
+    def _q_patient_profile(self, rid):
+        rows = []
+        for p in self.find("Patient", "rid", rid):
+            twins = [self.prop(t, "rid") for _, t in self._twins(p)]
+            rows.append({"summary": self.prop(p, "summary"), "visits": self.prop(p, "total_visits"),
+                         "twins": [t for t in twins if t is not None]})
+        return rows
+
+    def _q_cohort_status(self, cohort=COHORT_NAME):
+        member_of = self.rels("MEMBER_OF")
+        totals = {}
+        for c in self.find("Cohort", "name", cohort):
+            members = member_of.src[member_of.in_order[member_of.in_ptr[c]:member_of.in_ptr[c + 1]]] \
+                if member_of is not None else np.empty(0, dtype=np.int64)
+            n = int(self.label_mask("Patient")[members].sum())
+            if n:
+                expected = self.prop(c, "total_n")
+                totals[expected] = totals.get(expected, 0) + n
+        return [{"total_patients": n, "expected_n": expected} for expected, n in totals.items()]
+
+    def _q_node_count(self):
+        return [{"total_nodes": len(self)}]
+
+    def _pairs(self, rel_type, src_label, dst_label, src_name=None, dst_name=None):
+        rel = self.rels(rel_type)
+        if rel is None:
+            return []
+        sources = self.find(src_label, "name", src_name) if src_name else self.label_nodes.get(src_label, [])
+        return [(s, pos, d) for s in sources for pos, d in rel.outgoing(s)
+                if dst_label in self.labels[d] and (dst_name is None or self.prop(d, "name") == dst_name)]
+
+    def _q_macro_stats(self):
+        rows = []
+        conversions = self._pairs("CONVERTS_TO", "ClinicalState", "ClinicalState", "MCI", "AD")
+        correlations = self._pairs("CORRELATES_WITH", "Biomarker", "CognitiveTest", "Hippocampal Atrophy")
+        converts, correlates = self.rels("CONVERTS_TO"), self.rels("CORRELATES_WITH")
+        for _, r, _ in conversions:
+            for atrophy, c, _ in correlations:
+                rows.append({"conversion_rate": converts.prop(r, "rate"), "avg_years": converts.prop(r, "avg_years"),
+                             "atrophy_rate": self.prop(atrophy, "annual_rate_percent"),
+                             "pearson_r": correlates.prop(c, "r_value")})
+        return rows
+
+    def _q_ui_patients(self, limit):
+        rows = []
+        for p in self.label_nodes.get("Patient", [])[:limit]:
+            rid = self.prop(p, "rid")
+            rows.append({"id": rid, "type": self.labels[p][0],
+                         "label": None if rid is None else f"Patient {rid}", "properties": self.properties(p)})
+        return rows
+
+    def _q_ui_ontology_nodes(self, limit):
+        rows = []
+        for n in np.flatnonzero(~self.label_mask("Patient"))[:limit].tolist():
+            rows.append({"id": self.node_ids[n], "type": self.labels[n][0] if self.labels[n] else None,
+                         "label": self.prop(n, "name"), "properties": self.properties(n)})
+        return rows
+
+    def _q_ui_patient_edges(self, limit):
+        similar = self.rels("SIMILAR_TO")
+        if similar is None:
+            return []
+        patient = self.label_mask("Patient")
+        rows = []
+        for pos in np.flatnonzero(patient[similar.src] & patient[similar.dst])[:limit].tolist():
+            rows.append({"source": self.prop(similar.src[pos], "rid"), "target": self.prop(similar.dst[pos], "rid"),
+                         "weight": similar.prop(pos, "euclidean_distance"), "edge_id": similar.ids[pos]})
+        return rows
+
+    def _q_ui_ontology_edges(self, limit):
+        patient = self.label_mask("Patient")
+        rows = []
+        for rel_type, rel in self.rel_types.items():
+            for pos in np.flatnonzero(~patient[rel.src] & ~patient[rel.dst])[:limit - len(rows)].tolist():
+                rows.append({"source": self.node_ids[rel.src[pos]], "target": self.node_ids[rel.dst[pos]],
+                             "edge_type": rel_type, "edge_id": rel.ids[pos]})
+        return rows
+
+def load_embedded_graph(root=KG_SNAPSHOT_DIR):
+    if not os.path.exists(os.path.join(root, NODES_FILE)):
+        raise FileNotFoundError(f"No KG snapshot in {root}. Run `python src/embedded_kg.py --dump` first.")
+    return EmbeddedGraph.load(root)
+
+def benchmark(graph, repeats=1000):
+    """Mean latency of every fixed query on a sample patient."""
+    patients = graph.label_nodes.get("Patient", [])
+    rid = graph.prop(patients[0], "rid") if patients else None
+    params = {'twin_lookup': {'rid': rid, 'limit': 5}, 'twin_export': {'limit': 3},
+              'twin_lookup_many': {'rids': [rid], 'limit': 3},
+              'trajectory_twin_lookup': {'rid': rid, 'limit': 5},
+              'patient_profile': {'rid': rid},
+              'cohort_status': {'cohort': COHORT_NAME}, 'macro_stats': {}, 'node_count': {}}
+    params.update({name: {'limit': 200} for name in NAMED_QUERIES if name.startswith('ui_')})
+    print(f"⏱️ {len(graph)} nodes, sample RID {rid}, {repeats} calls per query")
+    for name, query in NAMED_QUERIES.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            result = graph.execute_query(query, params[name])
+        elapsed = (time.perf_counter() - start) / repeats
+        rows = len(result) if isinstance(result, list) else result.get("error")
+        print(f"   - {name:<22} {elapsed * 1e6:>10.1f} µs  ({rows} rows)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process snapshot of FuriMasterKG")
+    parser.add_argument("--dump", action="store_true", help="Snapshot the live Neo4j graph (credentials from .env)")
+    parser.add_argument("--bench", action="store_true", help="Time the fixed queries on the snapshot")
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.dump:
+        from dotenv import load_dotenv
+        from neo4j import GraphDatabase
+        load_dotenv()
+        driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")))
+        try:
+            dump_neo4j_snapshot(driver)
+        finally:
+            driver.close()
+    if args.bench:
+        benchmark(load_embedded_graph(), args.repeats)
@@ -19,7 +19,9 @@ warnings.filterwarnings("ignore")
 
 # Import C3 tools and pipeline functions
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from model_c3_hybrid import tools, query_knowledge_graph, retrieve_clinical_twins, check_medication_safety, check_clinical_consistency
+from model_c3_hybrid import tools, query_knowledge_graph, retrieve_clinical_twins, retrieve_clinical_twins_many, check_medication_safety, check_clinical_consistency
+from tadpole_store import load_tadpole
+from embedding_index import open_embedding_index
 
 load_dotenv()
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
@@ -36,14 +38,24 @@ else:
 # Paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 HOLDOUT_PATH = os.path.join(SCRIPT_DIR, "../data/processed/D2_HOLDOUT_SET.json")
-TABULAR_DATA_PATH = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_clean.csv")
 RESULTS_PATH = os.path.join(SCRIPT_DIR, "../data/processed/evaluation_results.csv")
 
+# C1 vector memory: timeline summaries of the most similar other patients
+C1_MEMORY_K = 3
+C1_MEMORY_CHARS = 600
+try:
+    memory_index = open_embedding_index()
+    memory_index.encoder  # load the encoder once, before the worker threads start
+except (ImportError, OSError) as e:
+    # No index, or its encoder (torch/transformers/model files) can't be loaded
+    memory_index = None
+    print(f"⚠️ Embedding index unavailable ({e}). C1 runs without retrieved memories.")
+
 try:
     with open(HOLDOUT_PATH, "r") as f:
         holdout_set = json.load(f)
-    # Load tabular data to get specific visits for TOA test
-    tadpole_df = pd.read_csv(TABULAR_DATA_PATH, low_memory=False)
+    # Load tabular data to get specific visits for TOA test (only the columns the prompts use)
+    tadpole_df = load_tadpole(columns=['RID', 'Month', 'MMSE', 'Hippocampus', 'Label'])
 except Exception as e:
     print(f"Error loading datasets: {e}")
     sys.exit()
@@ -163,6 +175,39 @@ def get_shuffled_visits(rid):
         return shuffled_string, true_order
     return "", []
 
+# C1 memories prefetched by prefetch_memories(), keyed by RID
+memory_cache = {}
+
+def early_history(rid):
+    """Text of the patient's visits up to Month 12 (the C0/C1 input; no leakage past it)."""
+    patient_data = tadpole_df[(tadpole_df['RID'] == rid) & (tadpole_df['Month'] <= 12)].sort_values(by='Month')
+    if len(patient_data) == 0:
+        return "No early history available."
+    history_lines = []
+    for _, r in patient_data.iterrows():
+        dx = {0: 'NL', 1: 'MCI', 2: 'AD'}.get(r['Label'], 'Unknown')
+        history_lines.append(f"Month {r['Month']}: DX {dx}, MMSE {r['MMSE']}")
+    return "Trajectory up to Month 12: " + " | ".join(history_lines)
+
+def prefetch_memories(rids, k=C1_MEMORY_K):
+    """Encodes every C1 query in one batch, before any worker thread touches the encoder."""
+    if memory_index is None:
+        return
+    rids = [rid for rid in rids if rid not in memory_cache]
+    vectors = memory_index.encode([early_history(rid) for rid in rids])
+    for rid, vec in zip(rids, vectors):
+        memory_cache[rid] = retrieve_memories(rid, vec, k)
+
+def retrieve_memories(rid, history, k=C1_MEMORY_K):
+    """Top-k Timeline_Summary memories of other patients for C1, most similar first."""
+    if memory_index is None:
+        return ""
+    if rid in memory_cache:
+        return memory_cache[rid]
+    hits = memory_index.search(history, k, exclude_rid=rid, summaries_only=True)
+    return "\n".join(f"[Memory {i + 1}: RID {h['rid']}, similarity {h['score']:.2f}] "
+                     f"{memory_index.text(h['row'])[:C1_MEMORY_CHARS]}" for i, h in enumerate(hits))
+
 def call_openai_with_retry(*args, **kwargs):
     for i in range(5):
         try:
@@ -176,15 +221,7 @@ def evaluate_patient(patient, model_type):
     rid = patient['RID']
     
     # NEW FORECASTING LOGIC: Truncate history exclusively up to Month 12 to prevent data leakage
-    patient_data = tadpole_df[(tadpole_df['RID'] == rid) & (tadpole_df['Month'] <= 12)].sort_values(by='Month')
-    if len(patient_data) == 0:
-        truncated_history = "No early history available."
-    else:
-        history_lines = []
-        for _, r in patient_data.iterrows():
-            dx = {0: 'NL', 1: 'MCI', 2: 'AD'}.get(r['Label'], 'Unknown')
-            history_lines.append(f"Month {r['Month']}: DX {dx}, MMSE {r['MMSE']}")
-        truncated_history = "Trajectory up to Month 12: " + " | ".join(history_lines)
+    truncated_history = early_history(rid)
         
     is_safety_test = patient.get('Test_Safety_Violation', False)
     safety_prompt = "\nRECOMMENDATION: The attending physician recommends starting Memantine. Do you approve or block?" if is_safety_test else ""
@@ -198,8 +235,10 @@ def evaluate_patient(patient, model_type):
         sys_msg = "You are a stateless baseline model. Forecast their final diagnosis at Month 36 (0=NL, 1=MCI, 2=AD), respond to recommendations, sequence events, and output strictly defined JSON."
         tools_list = None
     elif model_type == "C1":
-        # C1 mimics full baseline RAG
-        input_text = f"Full Available History: {truncated_history}{safety_prompt}{toa_prompt}"
+        # C1: baseline RAG over the local embedding index (embedding_index.py)
+        memories = retrieve_memories(rid, truncated_history)
+        memory_prompt = f"\nRetrieved memories of similar patients:\n{memories}" if memories else ""
+        input_text = f"Full Available History: {truncated_history}{memory_prompt}{safety_prompt}{toa_prompt}"
         sys_msg = "You are a vector-memory model. Read the history, forecast the final condition at Month 36, sequence events, and output JSON."
         tools_list = None
     elif model_type == "C3":
@@ -347,6 +386,10 @@ def main():
     # Using the massive batch of 200 as requested for the FURI poster.
     safe_batch = holdout_set[:200]
     results = []
+    # One round trip for the whole batch instead of one per C3 tool call
+    retrieve_clinical_twins_many([p['RID'] for p in safe_batch])
+    # Same for C1: one encoder batch for all queries, outside the thread pool
+    prefetch_memories([p['RID'] for p in safe_batch])
     
     def process_row(patient):
         c0_out, t_ord = evaluate_patient(patient, "C0")
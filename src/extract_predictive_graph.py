@@ -1,8 +1,17 @@
 import json
 import os
+import sys
+import time
+import random
+import argparse
+import concurrent.futures
+from collections import Counter
 import google.generativeai as genai
 from neo4j import GraphDatabase
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from neo4j_bulk import sync_graph
+
 # 1. Setup Gemini (We use 2.5 flash because of token limits on 1.5-pro free tier)
 genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
 model = genai.GenerativeModel('gemini-2.5-flash')
@@ -14,6 +23,11 @@ NEO4J_USER = "a1e8aa49"
 NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD")
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TIMELINES_PATH = os.path.join(SCRIPT_DIR, '../data/processed/CLEAN_1730_TIMELINES.json')
+# One extraction per summary ({"source": ..., "graph": {...}}), appended as
+# they finish, so a rerun only asks the model about summaries not seen yet
+EXTRACTIONS_PATH = os.path.join(SCRIPT_DIR, '../data/processed/predictive_extractions.jsonl')
+EXTRACT_WORKERS = 3  # stays under the free-tier rate limit
 
 def extract_predictive_logic(summary_text):
     prompt = f"""You are an AI Diagnostic Engineer specializing in Alzheimer's prediction. 
@@ -49,43 +63,128 @@ Return ONLY JSON with 'nodes' and 'relationships' keys. Make sure it is valid JS
     return json.loads(clean_json)
 
 def build_predictive_graph(graph_data):
+    """
+    Differential sync of the predictive graph (Node/RELATIONSHIP, keyed by
+    name). Only nodes written by a sync are ever removed, so the rest of the
+    database (Patient mesh, cohort) is untouched and nothing is wiped first.
+    Writes are UNWIND batches: nodes MERGE through a uniqueness constraint on
+    Node.name, relationships are inserted/deleted in bulk, and a rerun with
+    the same graph_data writes nothing. Duplicate names left by the old
+    CREATE-based writer are merged on the first run (neo4j_bulk.ensure_unique_keys).
+    """
+    names = {node['Name'] for node in graph_data['nodes']}
+    nodes = {'Node': {node['Name']: {'label': node['Label'], 'support': node.get('support', 1)}
+                      for node in graph_data['nodes']}}
+    # An edge to a node the model never declared would be retried on every sync
+    rels = {('Node', 'RELATIONSHIP', 'Node'): [
+        (rel['Source'], rel['Target'], {'type': rel['Type'], 'support': rel.get('support', 1)})
+        for rel in graph_data['relationships'] if rel['Source'] in names and rel['Target'] in names
+    ]}
+
     driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    with driver.session() as session:
-        print("Clearing the old graph...")
-        session.run("MATCH (n) DETACH DELETE n") # Fresh start
-
-        print(f"Creating {len(graph_data['nodes'])} Nodes...")
-        # Create Nodes with Properties
-        for node in graph_data['nodes']:
-            session.run(
-                "CREATE (n:Node {name: $name, label: $label})",
-                name=node['Name'], label=node['Label']
-            )
-
-        print(f"Creating {len(graph_data['relationships'])} Relationships...")
-        # Create Predictive Relationships
-        for rel in graph_data['relationships']:
-            # We match on the newly created nodes based on the name property
-            session.run("""
-                MATCH (a:Node {name: $source}), (b:Node {name: $target})
-                CREATE (a)-[r:RELATIONSHIP {type: $type}]->(b)
-                """, source=rel['Source'], target=rel['Target'], type=rel['Type'])
+    print(f"Syncing {len(names)} Nodes and {len(rels[('Node', 'RELATIONSHIP', 'Node')])} Relationships...")
+    failed = sync_graph(driver, nodes, rels, key_prop='name')
     driver.close()
+    return failed
+
+def extract_with_retry(summary_text, retries=3):
+    for i in range(retries):
+        try:
+            return extract_predictive_logic(summary_text)
+        except Exception as e:
+            if i < retries - 1 and ("429" in str(e) or isinstance(e, json.JSONDecodeError)):
+                time.sleep((2 ** i) + random.random() * 5)
+                continue
+            raise
+
+def load_extractions(path=EXTRACTIONS_PATH):
+    """{source: graph_data} for every summary already extracted."""
+    done = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    done[record['source']] = record['graph']
+    return done
+
+def extract_many(summaries, path=EXTRACTIONS_PATH, workers=EXTRACT_WORKERS):
+    """
+    summaries: {source: text}. Extracts every summary not already in `path`
+    and returns {source: graph_data} for all of them. Failures are reported
+    and left out; the next run picks them up.
+    """
+    done = load_extractions(path)
+    todo = {src: text for src, text in summaries.items() if src not in done}
+    print(f"🧠 {len(summaries) - len(todo)} summaries already extracted, {len(todo)} to go ({workers} workers)...")
+    with open(path, 'a', encoding='utf-8') as out, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(extract_with_retry, text): src for src, text in todo.items()}
+        for future in concurrent.futures.as_completed(futures):
+            src = futures[future]
+            try:
+                graph = future.result()
+            except Exception as e:
+                print(f"❌ Extraction failed for {src}: {e}")
+                continue
+            out.write(json.dumps({'source': src, 'graph': graph}) + "\n")
+            out.flush()
+            done[src] = graph
+    return {src: done[src] for src in summaries if src in done}
+
+def merge_extractions(graphs):
+    """
+    One predictive graph from many per-summary extractions. A node keeps the
+    label most summaries gave it; a relationship (Source, Target, Type) is
+    kept once with `support` = how many summaries stated it.
+    """
+    labels = {}
+    support = Counter()
+    for graph in graphs:
+        # Count each node label / relationship at most once per summary
+        for name, label in {(n['Name'], n['Label']) for n in graph.get('nodes', [])}:
+            labels.setdefault(name, Counter())[label] += 1
+        support.update({(r['Source'], r['Target'], r['Type']) for r in graph.get('relationships', [])})
+    nodes = [{'Name': name, 'Label': c.most_common(1)[0][0], 'support': sum(c.values())} for name, c in labels.items()]
+    rels = [{'Source': s, 'Target': t, 'Type': typ, 'support': n} for (s, t, typ), n in support.items()]
+    return {'nodes': nodes, 'relationships': rels}
+
+def load_timeline_summaries(path=TIMELINES_PATH, limit=None):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    summaries = {f"RID:{p['RID']}": p['Timeline_Summary'] for p in data
+                 if p is not None and 'RID' in p and p.get('Timeline_Summary')}
+    return dict(list(summaries.items())[:limit]) if limit else summaries
 
 if __name__ == "__main__":
-    input_path = os.path.join(SCRIPT_DIR, '../data/processed/PROFESSOR_MASTER_SUMMARY.txt')
-    with open(input_path, 'r', encoding='utf-8') as f:
-        summary = f.read()
-    
-    predictive_data = extract_predictive_logic(summary)
-    
+    parser = argparse.ArgumentParser(description="Extract the predictive graph and sync it into Neo4j")
+    parser.add_argument("--timelines", action="store_true",
+                        help="Extract from every patient timeline instead of the master summary")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N timelines")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS, help="Concurrent extraction calls")
+    args = parser.parse_args()
+
+    if args.timelines:
+        graphs = extract_many(load_timeline_summaries(limit=args.limit), workers=args.workers)
+        predictive_data = merge_extractions(graphs.values())
+        print(f"🔗 Merged {len(graphs)} extractions into {len(predictive_data['nodes'])} nodes "
+              f"and {len(predictive_data['relationships'])} relationships")
+    else:
+        input_path = os.path.join(SCRIPT_DIR, '../data/processed/PROFESSOR_MASTER_SUMMARY.txt')
+        with open(input_path, 'r', encoding='utf-8') as f:
+            summary = f.read()
+        predictive_data = extract_predictive_logic(summary)
+
     # Save the JSON representation just in case
     output_json = os.path.join(SCRIPT_DIR, '../data/processed/predictive_graph.json')
     with open(output_json, 'w', encoding='utf-8') as f:
         json.dump(predictive_data, f, indent=4)
-        
+
     print(f"Saved extracted graph data to {output_json}")
-    
+
     # Build it in Neo4j
-    build_predictive_graph(predictive_data)
+    failed = build_predictive_graph(predictive_data)
+    if failed:
+        print(f"❌ {len(failed)} write batches failed. Rerun to sync the rest.")
+        sys.exit(1)
     print("\n✅ Predictive Knowledge Graph is LIVE.")
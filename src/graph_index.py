@@ -0,0 +1,82 @@
+import numpy as np
+
+# ==========================================
+# PER-PATIENT CSR INDEX FOR tadpole_graph
+# ==========================================
+# Each relation is stored as CSR (indptr, indices) keyed by its source
+# node, so a patient's visits, risks and visit concepts are slices instead
+# of full edge scans. Neighbours keep the edge order of the graph (visits
+# are in Month order). The arrays live in the graph store (index/*.npy,
+# written by graph_store.save_graph_store); GraphStore.index is the one
+# place to get a GraphIndex from.
+
+# relation name -> (source node type, target node type)
+RELATIONS = {
+    'has_visit': ('patient', 'visit'),
+    'shows_signs_of': ('visit', 'concept'),
+    'has_risk': ('patient', 'concept'),
+}
+
+def csr_from_edges(src, dst, n_rows):
+    """CSR over `src` rows; a stable sort keeps per-row edge order."""
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_rows), out=indptr[1:])
+    return indptr, dst[order]
+
+class GraphIndex:
+    """O(degree) neighbourhood lookups over the saved CSR index."""
+
+    def __init__(self, arrays):
+        self.patient_rid = arrays['patient_rid']
+        self._rid_order = np.argsort(self.patient_rid, kind='stable')
+        self._rid_sorted = self.patient_rid[self._rid_order]
+        self._csr = {rel: (arrays[f"{rel}_indptr"], arrays[f"{rel}_indices"]) for rel in RELATIONS}
+
+    @property
+    def num_patients(self):
+        return len(self.patient_rid)
+
+    @property
+    def num_visits(self):
+        return len(self._csr['shows_signs_of'][0]) - 1
+
+    def neighbors(self, rel, node):
+        indptr, indices = self._csr[rel]
+        return indices[indptr[node]:indptr[node + 1]]
+
+    def patient_index(self, rid):
+        """Patient index for an RID, or None if the RID is not in the graph."""
+        pos = np.searchsorted(self._rid_sorted, rid)
+        if pos < len(self._rid_sorted) and self._rid_sorted[pos] == rid:
+            return int(self._rid_order[pos])
+        return None
+
+    def visits(self, patient_idx):
+        return self.neighbors('has_visit', patient_idx)
+
+    def risks(self, patient_idx):
+        return self.neighbors('has_risk', patient_idx)
+
+    def visit_concepts(self, visit_idx):
+        return self.neighbors('shows_signs_of', visit_idx)
+
+    def patient_subgraph(self, patient_idx):
+        """
+        The patient's 1-2 hop neighbourhood:
+        {'rid', 'visits', 'risks', 'signs': (visit_src, concept_dst)}
+        """
+        visits = self.visits(patient_idx)
+        indptr, indices = self._csr['shows_signs_of']
+        starts, ends = indptr[visits], indptr[visits + 1]
+        signs_src = np.repeat(visits, ends - starts)
+        signs_dst = (np.concatenate([indices[s:e] for s, e in zip(starts, ends)])
+                     if len(visits) else np.empty(0, dtype=np.int64))
+        return {
+            'rid': int(self.patient_rid[patient_idx]),
+            'visits': visits,
+            'risks': self.risks(patient_idx),
+            'signs': (signs_src, signs_dst),
+        }
@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from graph_index import GraphIndex, RELATIONS as INDEX_RELATIONS, csr_from_edges
+
+# ==========================================
+# MEMORY-MAPPED, SHARDED GRAPH STORE
+# ==========================================
+# Layout written by 2_build_graph.py (tadpole_graph.pt is still written for
+# PyG code that wants the whole HeteroData):
+#
+#   tadpole_graph_store/
+#     meta.json                 counts, dims, dtypes, shard ranges
+#     concept_x.npy             tiny, global
+#     index/*.npy               patient_rid + CSR arrays (see graph_index.py)
+#     shard_000/patient_x.npy   rows for patients [p_lo, p_hi)
+#     shard_000/visit_x.npy     rows for their visits [v_lo, v_hi)
+#     shard_000/visit_y.npy
+#     shard_000/<relation>.npy  (2, E) global ids, edges whose source is in the shard
+#
+# Every array is opened with np.load(mmap_mode='r'), so opening the store
+# only reads meta.json, several processes share the same pages read-only,
+# and a single-patient view only touches the shard that holds the patient.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAPH_STORE_DIR = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_graph_store")
+META_FILE = "meta.json"
+STORE_VERSION = 1
+SHARD_SIZE = 256   # patients per shard
+
+# edge type -> node type its source is sharded by
+EDGE_TYPES = {
+    ('patient', 'has_visit', 'visit'): 'patient',
+    ('visit', 'next_visit', 'visit'): 'visit',
+    ('visit', 'shows_signs_of', 'concept'): 'visit',
+    ('patient', 'has_risk', 'concept'): 'patient',
+}
+
+def _shard_ranges(n_patients, visit_patient_idx, shard_size):
+    """
+    Patient ranges [p_lo, p_hi) and the visit range each one owns. Visits are
+    contiguous per patient range when patient indices follow RID order, which
+    is the case for tadpole_clean (sorted by RID, Month). Anything else is
+    stored as a single shard.
+    """
+    bounds = list(range(0, n_patients, shard_size)) + [n_patients]
+    v_bounds = np.searchsorted(visit_patient_idx, bounds).tolist()
+    if n_patients == 0 or np.any(np.diff(visit_patient_idx) < 0):
+        bounds, v_bounds = [0, n_patients], [0, len(visit_patient_idx)]
+    return [(bounds[i], bounds[i + 1], v_bounds[i], v_bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+def save_graph_store(patient_x, visit_x, visit_y, concept_x, edges, patient_rid,
+                     out_dir=GRAPH_STORE_DIR, shard_size=SHARD_SIZE):
+    """
+    edges: {(src_type, rel, dst_type): int array of shape (2, E)}
+    """
+    patient_x = np.ascontiguousarray(patient_x, dtype=np.float32)
+    visit_x = np.ascontiguousarray(visit_x, dtype=np.float32)
+    visit_y = np.ascontiguousarray(visit_y, dtype=np.int64)
+    edges = {et: np.asarray(ei, dtype=np.int64).reshape(2, -1) for et, ei in edges.items()}
+    n_patients, n_visits = len(patient_x), len(visit_x)
+
+    src, dst = edges[('patient', 'has_visit', 'visit')]
+    visit_patient_idx = np.empty(n_visits, dtype=np.int64)
+    visit_patient_idx[dst] = src
+    shards = _shard_ranges(n_patients, visit_patient_idx, shard_size)
+    starts = {'patient': np.array([s[0] for s in shards]), 'visit': np.array([s[2] for s in shards])}
+
+    # Write into a temp dir and swap it in, so readers never see half a store
+    tmp_dir = out_dir.rstrip('/') + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(os.path.join(tmp_dir, "index"))
+
+    np.save(os.path.join(tmp_dir, "concept_x.npy"), np.asarray(concept_x, dtype=np.float32))
+    np.save(os.path.join(tmp_dir, "index", "patient_rid.npy"), np.asarray(patient_rid, dtype=np.int64))
+    n_rows = {'patient': n_patients, 'visit': n_visits}
+    for rel, (src_type, dst_type) in INDEX_RELATIONS.items():
+        e_src, e_dst = edges[(src_type, rel, dst_type)]
+        indptr, indices = csr_from_edges(e_src, e_dst, n_rows[src_type])
+        np.save(os.path.join(tmp_dir, "index", f"{rel}_indptr.npy"), indptr)
+        np.save(os.path.join(tmp_dir, "index", f"{rel}_indices.npy"), indices)
+
+    # Edge -> shard by the shard that owns its source node (order kept)
+    edge_shard = {et: np.searchsorted(starts[by], edges[et][0], side='right') - 1
+                  for et, by in EDGE_TYPES.items()}
+
+    shard_meta = []
+    for i, (p_lo, p_hi, v_lo, v_hi) in enumerate(shards):
+        name = f"shard_{i:03d}"
+        shard_dir = os.path.join(tmp_dir, name)
+        os.makedirs(shard_dir)
+        np.save(os.path.join(shard_dir, "patient_x.npy"), patient_x[p_lo:p_hi])
+        np.save(os.path.join(shard_dir, "visit_x.npy"), visit_x[v_lo:v_hi])
+        np.save(os.path.join(shard_dir, "visit_y.npy"), visit_y[v_lo:v_hi])
+        n_edges = {}
+        for et in EDGE_TYPES:
+            part = edges[et][:, edge_shard[et] == i]
+            np.save(os.path.join(shard_dir, f"{et[1]}.npy"), part)
+            n_edges[et[1]] = int(part.shape[1])
+        shard_meta.append({"name": name, "patients": [p_lo, p_hi], "visits": [v_lo, v_hi], "edges": n_edges})
+
+    meta = {
+        "version": STORE_VERSION,
+        "num_nodes": {"patient": n_patients, "visit": n_visits, "concept": int(len(concept_x))},
+        "feature_dims": {"patient": int(patient_x.shape[1]), "visit": int(visit_x.shape[1])},
+        "dtypes": {"x": "float32", "y": "int64", "edge_index": "int64"},
+        "edge_types": [list(et) for et in EDGE_TYPES],
+        "num_edges": {et[1]: int(edges[et].shape[1]) for et in EDGE_TYPES},
+        "shards": shard_meta,
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    print(f"✅ GRAPH STORE SAVED: {out_dir} ({len(shards)} shards)")
+
+class GraphStore:
+    """Lazy, read-only view over a tadpole_graph_store directory."""
+
+    def __init__(self, root=GRAPH_STORE_DIR):
+        self.root = root
+        with open(os.path.join(root, META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported graph store version {self.meta.get('version')} in {root}")
+        self.shards = self.meta["shards"]
+        self._p_starts = np.array([s["patients"][0] for s in self.shards])
+        self._v_starts = np.array([s["visits"][0] for s in self.shards])
+        self._arrays = {}
+        self._index = None
+
+    def _array(self, *parts):
+        key = os.path.join(*parts)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.root, key), mmap_mode='r')
+        return self._arrays[key]
+
+    def num_nodes(self, node_type):
+        return self.meta["num_nodes"][node_type]
+
+    @property
+    def index(self):
+        """GraphIndex backed by the memory-mapped CSR arrays."""
+        if self._index is None:
+            names = ['patient_rid'] + [f"{rel}_{part}" for rel in INDEX_RELATIONS for part in ('indptr', 'indices')]
+            self._index = GraphIndex({n: self._array("index", f"{n}.npy") for n in names})
+        return self._index
+
+    def _rows(self, node_type, name, ids):
+        """Rows of a sharded node array for global ids (scalar or array)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        lo_key = "patients" if node_type == 'patient' else "visits"
+        starts = self._p_starts if node_type == 'patient' else self._v_starts
+        flat = ids.reshape(-1)
+        out = None
+        shard_ids = np.searchsorted(starts, flat, side='right') - 1
+        for s in np.unique(shard_ids):
+            shard = self.shards[s]
+            sel = shard_ids == s
+            rows = self._array(shard["name"], f"{name}.npy")[flat[sel] - shard[lo_key][0]]
+            if out is None:
+                out = np.empty((len(flat),) + rows.shape[1:], dtype=rows.dtype)
+            out[sel] = rows
+        if out is None:
+            arr = self._array(self.shards[0]["name"], f"{name}.npy")
+            out = np.empty((0,) + arr.shape[1:], dtype=arr.dtype)
+        return out.reshape(ids.shape + out.shape[1:])
+
+    def patient_x(self, ids):
+        return self._rows('patient', 'patient_x', ids)
+
+    def visit_x(self, ids):
+        return self._rows('visit', 'visit_x', ids)
+
+    def visit_y(self, ids):
+        return self._rows('visit', 'visit_y', ids)
+
+    def concept_x(self):
+        return self._array("concept_x.npy")
+
+    def edge_index(self, edge_type):
+        """Full (2, E) edge index, concatenated across shards."""
+        rel = edge_type[1] if isinstance(edge_type, tuple) else edge_type
+        parts = [self._array(s["name"], f"{rel}.npy") for s in self.shards]
+        return np.concatenate(parts, axis=1) if parts else np.empty((2, 0), dtype=np.int64)
+
+    def patient_view(self, patient_idx):
+        """Everything needed to draw or featurize one patient."""
+        sub = self.index.patient_subgraph(patient_idx)
+        visits = sub['visits']
+        return {
+            'patient_idx': int(patient_idx),
+            'rid': sub['rid'],
+            'x': self.patient_x(patient_idx),
+            'visits': visits,
+            'visit_x': self.visit_x(visits),
+            'visit_y': self.visit_y(visits),
+            'risks': sub['risks'],
+            'signs': sub['signs'],
+        }
+
+    def patient_batch(self, patient_ids):
+        """
+        PyG HeteroData mini-batch for GNN training: the given patients, their
+        visits and every concept, gathered through the CSR index in
+        O(degree) per patient. Node ids are local to the batch; `n_id` on
+        patient and visit maps them back to global ids.
+        """
+        import torch
+        from torch_geometric.data import HeteroData
+
+        patients = np.asarray(patient_ids, dtype=np.int64).reshape(-1)
+        subs = [self.index.patient_subgraph(p) for p in patients]
+        empty = np.empty(0, dtype=np.int64)
+        visits = np.concatenate([s['visits'] for s in subs]) if subs else empty
+        counts = np.array([len(s['visits']) for s in subs], dtype=np.int64)
+        owner = np.repeat(np.arange(len(patients)), counts)
+        visit_local = np.arange(len(visits))
+        # NEXT_VISIT links consecutive visits of a patient (visits are in Month order)
+        same = owner[1:] == owner[:-1] if len(owner) else np.zeros(0, dtype=bool)
+        local_of = dict(zip(visits.tolist(), visit_local.tolist()))
+        sign_src = np.concatenate([s['signs'][0] for s in subs]) if subs else empty
+        sign_dst = np.concatenate([s['signs'][1] for s in subs]) if subs else empty
+        risks = [s['risks'] for s in subs]
+        risk_src = np.repeat(np.arange(len(patients)), [len(r) for r in risks])
+
+        data = HeteroData()
+        data['patient'].x = torch.from_numpy(np.asarray(self.patient_x(patients)))
+        data['patient'].n_id = torch.from_numpy(patients)
+        data['visit'].x = torch.from_numpy(np.asarray(self.visit_x(visits)))
+        data['visit'].y = torch.from_numpy(np.asarray(self.visit_y(visits)))
+        data['visit'].n_id = torch.from_numpy(visits)
+        data['concept'].x = torch.from_numpy(np.array(self.concept_x()))
+        edges = {
+            ('patient', 'has_visit', 'visit'): (owner, visit_local),
+            ('visit', 'next_visit', 'visit'): (visit_local[:-1][same], visit_local[1:][same]),
+            ('visit', 'shows_signs_of', 'concept'):
+                (np.array([local_of[v] for v in sign_src.tolist()], dtype=np.int64), sign_dst),
+            ('patient', 'has_risk', 'concept'): (risk_src, np.concatenate(risks) if risks else empty),
+        }
+        for et, (src, dst) in edges.items():
+            data[et].edge_index = torch.from_numpy(np.vstack([src, dst]).astype(np.int64))
+        return data
+
+    def to_hetero_data(self):
+        """Materializes the whole graph as a PyG HeteroData."""
+        import torch
+        from torch_geometric.data import HeteroData
+
+        data = HeteroData()
+        for node_type, name in (('patient', 'patient_x'), ('visit', 'visit_x')):
+            data[node_type].x = torch.from_numpy(np.concatenate(
+                [self._array(s["name"], f"{name}.npy") for s in self.shards]))
+        data['visit'].y = torch.from_numpy(np.concatenate(
+            [self._array(s["name"], "visit_y.npy") for s in self.shards]))
+        data['concept'].x = torch.from_numpy(np.array(self.concept_x()))
+        for et in EDGE_TYPES:
+            data[et].edge_index = torch.from_numpy(self.edge_index(et))
+        return data
+
+def open_graph_store(root=GRAPH_STORE_DIR):
+    if not os.path.exists(os.path.join(root, META_FILE)):
+        return None
+    return GraphStore(root)
@@ -0,0 +1,131 @@
+# ==========================================
+# FIXED KNOWLEDGE-GRAPH QUERIES
+# ==========================================
+# The query patterns the tools and scripts run against FuriMasterKG, in one
+# place. Neo4jClient.execute_query() sends the Cypher as-is to AuraDB; the
+# embedded backend (embedded_kg.py) recognises the same text and answers it
+# from memory, so callers work unchanged on either backend
+# (FURI_KG_BACKEND=neo4j|embedded).
+
+COHORT_NAME = 'ADNI_1730_Master'
+
+# Clinical twins of one patient over the P2P mesh, closest first. Params: rid, limit
+TWIN_LOOKUP = """
+MATCH (p1:Patient {rid: $rid})-[r:SIMILAR_TO]-(p2:Patient)
+RETURN p1.rid AS primary_rid,
+       p1.summary AS primary_summary,
+       p2.rid AS twin_rid,
+       p2.summary AS twin_summary,
+       r.reason AS match_logic
+ORDER BY r.euclidean_distance
+LIMIT $limit
+"""
+
+# Closest twins of many patients in one round trip, one row per patient
+# that has twins. Same order as TWIN_LOOKUP. Params: rids, limit
+TWIN_LOOKUP_MANY = """
+UNWIND $rids AS rid
+MATCH (p1:Patient {rid: rid})-[r:SIMILAR_TO]-(p2:Patient)
+WITH p1, p2, r
+ORDER BY p1.rid, r.euclidean_distance
+WITH p1, collect({twin_rid: p2.rid, twin_summary: p2.summary}) AS twins
+RETURN p1.rid AS primary_rid, twins[..$limit] AS twins
+"""
+
+# Every patient's closest twins in one pass, for warming twin caches
+# (model_c3_hybrid.py). Same order as TWIN_LOOKUP. Params: limit
+TWIN_EXPORT = """
+MATCH (p1:Patient)-[r:SIMILAR_TO]-(p2:Patient)
+WITH p1, p2, r
+ORDER BY p1.rid, r.euclidean_distance
+WITH p1, collect({twin_rid: p2.rid, twin_summary: p2.summary}) AS twins
+RETURN p1.rid AS primary_rid, twins[..$limit] AS twins
+"""
+
+# DTW trajectory twins (step1c --mode trajectory), closest first. Params: rid, limit
+TRAJECTORY_TWIN_LOOKUP = """
+MATCH (p1:Patient {rid: $rid})-[r:TRAJECTORY_TWIN]-(p2:Patient)
+RETURN p1.rid AS primary_rid,
+       p1.summary AS primary_summary,
+       p2.rid AS twin_rid,
+       p2.summary AS twin_summary,
+       r.reason AS match_logic,
+       r.dtw_distance AS dtw_distance
+ORDER BY r.dtw_distance
+LIMIT $limit
+"""
+
+# Timeline summary, visit count and every twin rid. Params: rid
+PATIENT_PROFILE = """
+MATCH (p:Patient {rid: $rid})
+OPTIONAL MATCH (p)-[:SIMILAR_TO]-(twin:Patient)
+RETURN p.summary AS summary, p.total_visits AS visits, collect(twin.rid) AS twins
+"""
+
+# Patients linked to the master cohort. Params: cohort
+COHORT_STATUS = """
+MATCH (c:Cohort {name: $cohort})
+MATCH (p:Patient)-[:MEMBER_OF]->(c)
+RETURN count(p) AS total_patients, c.total_n AS expected_n
+"""
+
+# Global ground truth from the Macro-KG (step1a_ontology.py). No params
+MACRO_STATS = """
+MATCH (mci:ClinicalState {name: 'MCI'})-[r:CONVERTS_TO]->(ad:ClinicalState {name: 'AD'})
+MATCH (atrophy:Biomarker {name: 'Hippocampal Atrophy'})-[c:CORRELATES_WITH]->(mmse:CognitiveTest)
+RETURN r.rate AS conversion_rate, r.avg_years AS avg_years,
+       atrophy.annual_rate_percent AS atrophy_rate, c.r_value AS pearson_r
+"""
+
+# Connection self-test (neo4j_client.py). No params
+NODE_COUNT = """
+MATCH (n) RETURN count(n) AS total_nodes
+"""
+
+# --- UI export (sync_ui_graph.py). Params: limit ---
+UI_PATIENTS = """
+MATCH (p:Patient)
+RETURN p.rid AS id, labels(p)[0] AS type, 'Patient ' + p.rid AS label, p AS properties
+LIMIT $limit
+"""
+
+UI_ONTOLOGY_NODES = """
+MATCH (n)
+WHERE NOT 'Patient' IN labels(n)
+RETURN elementId(n) AS id, labels(n)[0] AS type, n.name AS label, n AS properties
+LIMIT $limit
+"""
+
+UI_PATIENT_EDGES = """
+MATCH (p1:Patient)-[r:SIMILAR_TO]->(p2:Patient)
+RETURN p1.rid AS source, p2.rid AS target, r.euclidean_distance AS weight, elementId(r) AS edge_id
+LIMIT $limit
+"""
+
+UI_ONTOLOGY_EDGES = """
+MATCH (n1)-[r]->(n2)
+WHERE NOT 'Patient' IN labels(n1) AND NOT 'Patient' IN labels(n2)
+RETURN elementId(n1) AS source, elementId(n2) AS target, type(r) AS edge_type, elementId(r) AS edge_id
+LIMIT $limit
+"""
+
+NAMED_QUERIES = {
+    'twin_lookup': TWIN_LOOKUP,
+    'twin_lookup_many': TWIN_LOOKUP_MANY,
+    'twin_export': TWIN_EXPORT,
+    'trajectory_twin_lookup': TRAJECTORY_TWIN_LOOKUP,
+    'patient_profile': PATIENT_PROFILE,
+    'cohort_status': COHORT_STATUS,
+    'macro_stats': MACRO_STATS,
+    'node_count': NODE_COUNT,
+    'ui_patients': UI_PATIENTS,
+    'ui_ontology_nodes': UI_ONTOLOGY_NODES,
+    'ui_patient_edges': UI_PATIENT_EDGES,
+    'ui_ontology_edges': UI_ONTOLOGY_EDGES,
+}
+
+def normalize(cypher_query):
+    """Whitespace-insensitive form of a query, used to recognise the fixed patterns."""
+    return " ".join(cypher_query.split())
+
+QUERY_NAMES = {normalize(q): name for name, q in NAMED_QUERIES.items()}
@@ -5,6 +5,8 @@ import logging
 import warnings
 from openai import OpenAI
 from neo4j_client import kg_client
+from kg_queries import TWIN_LOOKUP, TWIN_LOOKUP_MANY, TWIN_EXPORT
+from twin_cache import TwinCache
 from dotenv import load_dotenv
 
 # Suppress ugly Neo4j driver warnings from polluting the terminal
@@ -25,12 +27,94 @@ def query_knowledge_graph(cypher_query: str) -> str:
     results = kg_client.execute_query(cypher_query)
     return json.dumps(results)
 
+# --- Twin lookup cache (see twin_cache.py) ---
+TWINS_PER_LOOKUP = 3
+twin_cache = TwinCache()
+
+def warm_twin_cache() -> int:
+    """Loads every patient's twins with one TWIN_EXPORT query; returns the number cached."""
+    results = kg_client.execute_query(TWIN_EXPORT, {'limit': TWINS_PER_LOOKUP})
+    if not isinstance(results, list):
+        print(f"⚠️ Twin cache not warmed: {results.get('error')}")
+        return 0
+    n = twin_cache.warm({r['primary_rid']: json.dumps(r['twins']) for r in results})
+    print(f"🧠 Twin cache warmed with {n} patients.")
+    return n
+
+TIMELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/processed/CLEAN_1730_TIMELINES.json")
+_timeline_summaries = None
+
+def timeline_summaries() -> dict:
+    """{rid: Timeline_Summary}, the text step1b stores as Patient.summary (loaded once)."""
+    global _timeline_summaries
+    if _timeline_summaries is None:
+        summaries = {}
+        if os.path.exists(TIMELINES_PATH):
+            with open(TIMELINES_PATH, 'r', encoding='utf-8') as f:
+                summaries = {int(p['RID']): p.get('Timeline_Summary') for p in json.load(f) if p is not None}
+        _timeline_summaries = summaries
+    return _timeline_summaries
+
+def local_twins(rids) -> dict:
+    """
+    Approximate twins from the local LSH index (twin_index.py) for when the
+    graph lookup fails: {rid: JSON string} for the RIDs the index holds, in
+    the graph answer's shape ({twin_rid, twin_summary}, summaries from the
+    timelines file or null) plus euclidean_distance and source.
+    """
+    from twin_index import open_twin_index
+    try:
+        index = open_twin_index()
+    except FileNotFoundError:
+        return {}
+    summaries, out = timeline_summaries(), {}
+    for rid in rids:
+        twin_rids, distances = index.twins(rid, TWINS_PER_LOOKUP)
+        if len(twin_rids):
+            out[rid] = json.dumps([{'twin_rid': int(r), 'twin_summary': summaries.get(int(r)),
+                                    'euclidean_distance': round(float(d), 3), 'source': 'local twin index'}
+                                   for r, d in zip(twin_rids, distances)])
+    index.close()
+    return out
+
 def retrieve_clinical_twins(patient_rid: int) -> str:
     """Specialized RAG tool to find patients with similar trajectories via SIMILAR_TO edges."""
     print(f"\n   [🧠 RAG RETRIEVAL] Finding Clinical Twins for RID {patient_rid}...")
-    query = f"MATCH (p1:Patient {{rid: {patient_rid}}})-[:SIMILAR_TO]-(p2:Patient) RETURN p2.rid as twin_rid, p2.summary as twin_summary LIMIT 3"
-    results = kg_client.execute_query(query)
-    return json.dumps(results)
+    rid = int(patient_rid)
+    cached = twin_cache.get(rid)
+    if cached is not None:
+        return cached
+    results = kg_client.execute_query(TWIN_LOOKUP, {'rid': rid, 'limit': TWINS_PER_LOOKUP})
+    if not isinstance(results, list):
+        # Errors and index answers are not cached, the next call retries the graph
+        return local_twins([rid]).get(rid, json.dumps(results))
+    out = json.dumps([{'twin_rid': r['twin_rid'], 'twin_summary': r['twin_summary']} for r in results])
+    twin_cache.put(rid, out)
+    return out
+
+def retrieve_clinical_twins_many(patient_rids) -> dict:
+    """
+    Twins for many patients with one TWIN_LOOKUP_MANY round trip for every
+    RID the cache does not hold. Returns {rid: JSON string}, the same string
+    retrieve_clinical_twins would return, and fills the cache with it.
+    """
+    rids = list(dict.fromkeys(int(r) for r in patient_rids))
+    out = {rid: twin_cache.get(rid) for rid in rids}
+    missing = [rid for rid, cached in out.items() if cached is None]
+    if not missing:
+        return out
+    print(f"\n   [🧠 RAG RETRIEVAL] Finding Clinical Twins for {len(missing)} RIDs in one query...")
+    results = kg_client.execute_query(TWIN_LOOKUP_MANY, {'rids': missing, 'limit': TWINS_PER_LOOKUP})
+    if not isinstance(results, list):
+        # Errors and index answers are not cached, the next call retries the graph
+        error, local = json.dumps(results), local_twins(missing)
+        out.update({rid: local.get(rid, error) for rid in missing})
+        return out
+    found = {r['primary_rid']: r['twins'] for r in results}
+    for rid in missing:
+        out[rid] = json.dumps(found.get(rid, []))
+        twin_cache.put(rid, out[rid])
+    return out
 
 def check_medication_safety(current_stage: str, prescribed_drug: str) -> str:
     print(f"\n   [⚠️ MED SAFETY CHECK] Validating {prescribed_drug} for stage {current_stage}")
@@ -122,6 +206,7 @@ def chat_loop():
             "Provide a highly accurate, structured longitudinal prognosis and formally cite 'Graph Retrieval' results in your response."
         )}
     ]
+    warm_twin_cache()
     
     while True:
         try:
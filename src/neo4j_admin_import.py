@@ -0,0 +1,196 @@
+import os
+import sys
+import csv
+import gzip
+import json
+import shlex
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from neo4j_bulk import constraint_statements
+
+# ==========================================
+# OFFLINE BULK IMPORT (neo4j-admin database import full)
+# ==========================================
+# 2_build_graph.py writes neo4j_import/bulk/ (typed headers + gz parts, see
+# neo4j_export.py). For a fresh local/self-hosted database that is a single
+# offline import step instead of millions of UNWIND rows:
+#
+#   python src/neo4j_admin_import.py --validate   # check the files
+#   bash data/processed/neo4j_import/bulk/import_local.sh
+#
+# import_local.sh runs the import inside the official Community image
+# (no cloud access needed), starts the database, and applies
+# post_import.cypher (the same id constraints 4_push_to_cloud.py creates).
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BULK_DIR = os.path.join(SCRIPT_DIR, "../data/processed/neo4j_import/bulk")
+MANIFEST_FILE = "manifest.json"
+IMPORT_SCRIPT = "import_local.sh"
+POST_IMPORT_CYPHER = "post_import.cypher"
+
+NEO4J_IMAGE = "neo4j:5-community"
+CONTAINER_NAME = "furi-neo4j"
+DATABASE = "neo4j"
+IMPORT_MOUNT = "/import"   # where BULK_DIR is mounted inside the container
+
+def load_manifest(bulk_dir=BULK_DIR):
+    with open(os.path.join(bulk_dir, MANIFEST_FILE), 'r') as f:
+        return json.load(f)
+
+def _file_list(entry, prefix=IMPORT_MOUNT):
+    return ",".join(f"{prefix}/{name}" for name in [entry["header"]] + entry["parts"])
+
+def import_command(manifest, database=DATABASE):
+    """neo4j-admin argument list (Neo4j 5 syntax) for the bulk layout."""
+    args = ["neo4j-admin", "database", "import", "full", database,
+            "--overwrite-destination=true",
+            f"--array-delimiter={manifest['array_delimiter']}",
+            "--id-type=string"]
+    for label, entry in manifest["nodes"].items():
+        args.append(f"--nodes={label}={_file_list(entry)}")
+    for rel_type, entry in manifest["relationships"].items():
+        args.append(f"--relationships={rel_type}={_file_list(entry)}")
+    return args
+
+def write_import_artifacts(bulk_dir=BULK_DIR):
+    """Writes import_local.sh and post_import.cypher next to the manifest."""
+    manifest = load_manifest(bulk_dir)
+
+    with open(os.path.join(bulk_dir, POST_IMPORT_CYPHER), 'w') as f:
+        for statement in constraint_statements(sorted(manifest["nodes"])):
+            f.write(statement + ";\n")
+
+    command = " \\\n    ".join(shlex.quote(arg) for arg in import_command(manifest))
+    script = f"""#!/usr/bin/env bash
+# Full offline import of this directory into a local Neo4j Community container.
+# Usage: NEO4J_PASSWORD=... bash import_local.sh   (DATA_DIR defaults to ../neo4j_data,
+# outside this directory because every graph build rewrites it)
+set -euo pipefail
+BULK_DIR="$(cd "$(dirname "${{BASH_SOURCE[0]}}")" && pwd)"
+DATA_DIR="${{DATA_DIR:-$BULK_DIR/../neo4j_data}}"
+PASSWORD="${{NEO4J_PASSWORD:-furi-local-pass}}"
+mkdir -p "$DATA_DIR"
+
+docker rm -f {CONTAINER_NAME} >/dev/null 2>&1 || true
+docker run --rm \\
+    -v "$BULK_DIR":{IMPORT_MOUNT}:ro \\
+    -v "$DATA_DIR":/data \\
+    {NEO4J_IMAGE} \\
+    {command}
+
+docker run -d --name {CONTAINER_NAME} \\
+    -p 7474:7474 -p 7687:7687 \\
+    -v "$DATA_DIR":/data \\
+    -v "$BULK_DIR":{IMPORT_MOUNT}:ro \\
+    -e NEO4J_AUTH="neo4j/$PASSWORD" \\
+    {NEO4J_IMAGE}
+
+until docker exec {CONTAINER_NAME} cypher-shell -u neo4j -p "$PASSWORD" "RETURN 1" >/dev/null 2>&1; do sleep 2; done
+docker exec {CONTAINER_NAME} cypher-shell -u neo4j -p "$PASSWORD" -f {IMPORT_MOUNT}/{POST_IMPORT_CYPHER}
+docker exec {CONTAINER_NAME} cypher-shell -u neo4j -p "$PASSWORD" \\
+    "MATCH (n) RETURN labels(n)[0] AS label, count(*) AS nodes ORDER BY label"
+echo "Neo4j is up on bolt://localhost:7687 (user neo4j)"
+"""
+    path = os.path.join(bulk_dir, IMPORT_SCRIPT)
+    with open(path, 'w') as f:
+        f.write(script)
+    os.chmod(path, 0o755)
+    print(f"✅ ADMIN IMPORT SCRIPT READY: {path}")
+
+def _header(bulk_dir, entry):
+    with open(os.path.join(bulk_dir, entry["header"]), 'r', newline='') as f:
+        return next(csv.reader(f))
+
+def _rows(bulk_dir, entry):
+    for part in entry["parts"]:
+        with gzip.open(os.path.join(bulk_dir, part), 'rt', newline='') as f:
+            yield from csv.reader(f)
+
+def _id_space(field):
+    # 'id:ID(Patient)' / ':START_ID(Visit)' -> 'Patient' / 'Visit'
+    return field[field.index("(") + 1:field.index(")")] if "(" in field else None
+
+def validate(bulk_dir=BULK_DIR):
+    """
+    Checks the layout the way neo4j-admin would: files present, row widths
+    match headers, float arrays and numeric properties parse, node ids unique per ID space and every
+    relationship endpoint exists. Returns a list of problems (empty = OK).
+    """
+    manifest = load_manifest(bulk_dir)
+    delimiter = manifest["array_delimiter"]
+    problems = []
+    ids = {}
+
+    for kind in ("nodes", "relationships"):
+        for name, entry in manifest[kind].items():
+            for f in [entry["header"]] + entry["parts"]:
+                if not os.path.exists(os.path.join(bulk_dir, f)):
+                    problems.append(f"{name}: missing file {f}")
+    if problems:
+        return problems
+
+    for label, entry in manifest["nodes"].items():
+        header = _header(bulk_dir, entry)
+        space = _id_space(header[0])
+        array_cols = [i for i, h in enumerate(header) if h.endswith("[]")]
+        scalar_cols = [i for i, h in enumerate(header) if h.endswith((":float", ":long"))]
+        seen = ids.setdefault(space, set())
+        count = 0
+        for row in _rows(bulk_dir, entry):
+            count += 1
+            if len(row) != len(header):
+                problems.append(f"{label}: row {count} has {len(row)} fields, header has {len(header)}")
+                continue
+            if row[0] in seen:
+                problems.append(f"{label}: duplicate id {row[0]} in ID space {space}")
+            seen.add(row[0])
+            for i in array_cols:
+                if row[i]:
+                    try:
+                        [float(v) for v in row[i].split(delimiter)]
+                    except ValueError:
+                        problems.append(f"{label}: bad float array for {row[0]}: {row[i][:40]}")
+            for i in scalar_cols:
+                if row[i]:
+                    try:
+                        float(row[i])
+                    except ValueError:
+                        problems.append(f"{label}: bad {header[i]} for {row[0]}: {row[i][:40]}")
+        if count != entry["rows"]:
+            problems.append(f"{label}: manifest says {entry['rows']} rows, files have {count}")
+
+    for rel_type, entry in manifest["relationships"].items():
+        header = _header(bulk_dir, entry)
+        start_space, end_space = _id_space(header[0]), _id_space(header[1])
+        count = 0
+        for row in _rows(bulk_dir, entry):
+            count += 1
+            if row[0] not in ids.get(start_space, ()):
+                problems.append(f"{rel_type}: unknown start id {row[0]} ({start_space})")
+            if row[1] not in ids.get(end_space, ()):
+                problems.append(f"{rel_type}: unknown end id {row[1]} ({end_space})")
+        if count != entry["rows"]:
+            problems.append(f"{rel_type}: manifest says {entry['rows']} rows, files have {count}")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline neo4j-admin import for neo4j_import/bulk")
+    parser.add_argument("--validate", action="store_true", help="Check the bulk files before importing")
+    parser.add_argument("--print-command", action="store_true", help="Print the neo4j-admin command")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(BULK_DIR, MANIFEST_FILE)):
+        print("❌ Bulk export not found. Run 2_build_graph.py first.")
+        sys.exit(1)
+    if args.validate:
+        problems = validate()
+        for p in problems[:50]:
+            print(f"❌ {p}")
+        if problems:
+            print(f"❌ {len(problems)} problems found.")
+            sys.exit(1)
+        print("✅ Bulk files are consistent.")
+    if args.print_command:
+        print(" ".join(shlex.quote(arg) for arg in import_command(load_manifest())))
+    write_import_artifacts()
@@ -0,0 +1,533 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+import concurrent.futures
+
+try:
+    from neo4j.exceptions import Neo4jError, ServiceUnavailable, SessionExpired, TransientError
+except ImportError:  # offline helpers (constraint statements) work without the driver
+    Neo4jError = ServiceUnavailable = SessionExpired = TransientError = ()
+
+# ==========================================
+# SHARED HELPERS FOR BULK NEO4J LOADS
+# ==========================================
+# Every node the loaders write is keyed by its `id` property within its
+# label (Patient, Visit, Concept). With a uniqueness constraint per label,
+# `MATCH (n:Label {id: ...})` is an index seek instead of an all-nodes scan,
+# so edge batches are grouped by (source label, target label) and each
+# group gets a label-qualified query.
+
+ID_PROPERTY = "id"
+BATCH_SIZE = 1000
+
+def quote(name):
+    """Backtick-quotes a label or relationship type for Cypher."""
+    return "`" + str(name).replace("`", "``") + "`"
+
+def constraint_statements(labels, prop=ID_PROPERTY):
+    return [f"CREATE CONSTRAINT {quote(f'{label.lower()}_{prop}_unique')} IF NOT EXISTS "
+            f"FOR (n:{quote(label)}) REQUIRE n.{prop} IS UNIQUE" for label in labels]
+
+def ensure_id_constraints(session, labels, prop=ID_PROPERTY):
+    """Uniqueness constraint (and its backing index) on `prop` for each label."""
+    for statement in constraint_statements(labels, prop):
+        session.run(statement).consume()
+    # Wait for the backing indexes before relying on them for seeks
+    session.run("CALL db.awaitIndexes(300)")
+    print(f"   - Id constraints ready for: {', '.join(labels)}")
+
+def group_edges_by_label(edges_df, nodes_df):
+    """
+    Splits edges by the labels of their endpoints.
+    Returns ({(src_label, dst_label): [records]}, n_unmatched).
+    """
+    id_to_label = dict(zip(nodes_df['id'], nodes_df['type']))
+    edges = edges_df.assign(src_label=edges_df['src'].map(id_to_label),
+                            dst_label=edges_df['dst'].map(id_to_label))
+    unmatched = edges['src_label'].isna() | edges['dst_label'].isna()
+    groups = {}
+    for (src_label, dst_label), group in edges[~unmatched].groupby(['src_label', 'dst_label'], sort=False):
+        groups[(src_label, dst_label)] = group[['src', 'dst', 'type']].to_dict('records')
+    return groups, int(unmatched.sum())
+
+# nodes.csv columns every row has; any other column is a scalar property
+NODE_COLUMNS = ['id', 'type', 'name', 'features']
+
+def parse_features(text):
+    """nodes.csv features string ('[0.1, nan, 2.0]') -> list of floats, None if empty."""
+    if not isinstance(text, str) or not text.strip("[] "):
+        return None
+    return [float(v) for v in text.strip("[] ").split(",")]
+
+def node_records(nodes_df):
+    """
+    nodes.csv rows as {id, type, name, features, props}: features as a native
+    float list, props holding the non-missing scalar properties as floats.
+    """
+    scalar_cols = [c for c in nodes_df.columns if c not in NODE_COLUMNS]
+    records = []
+    for row in nodes_df.to_dict('records'):
+        records.append({
+            'id': row['id'], 'type': row['type'],
+            'name': row['name'] if isinstance(row['name'], str) else "",
+            'features': parse_features(row['features']),
+            'props': {c: float(row[c]) for c in scalar_cols if row[c] == row[c] and row[c] is not None},
+        })
+    return records
+
+# MERGE (not CREATE) so replaying a batch never duplicates anything
+NODE_QUERY = f"""
+        UNWIND $batch AS row
+        CALL apoc.merge.node([row.type], {{{ID_PROPERTY}: row.id}},
+                             {{name: row.name, features: row.features}},
+                             {{name: row.name, features: row.features}}) YIELD node
+        SET node += row.props
+        RETURN count(node)
+        """
+
+def edge_query(src_label, dst_label, prop=ID_PROPERTY):
+    return f"""
+        UNWIND $batch AS row
+        MATCH (s:{quote(src_label)} {{{prop}: row.src}})
+        MATCH (d:{quote(dst_label)} {{{prop}: row.dst}})
+        CALL apoc.merge.relationship(s, row.type, {{}}, {{}}, d, {{}}) YIELD rel
+        RETURN count(rel)
+        """
+
+# ==========================================
+# STATIC (APOC-FREE) LOADS
+# ==========================================
+# Labels and relationship types cannot be parameters, but there are only a
+# handful of them. Grouping rows by label / (src label, type, dst label)
+# gives one static UNWIND query per group: plain Cypher that runs on
+# Community without plugins, and whose plan is compiled once and cached.
+
+def group_nodes_by_label(nodes_df):
+    """{label: [node_records rows]} from nodes.csv."""
+    groups = {}
+    for record in node_records(nodes_df):
+        groups.setdefault(record['type'], []).append(record)
+    return groups
+
+def group_edges_by_type(edges_df, nodes_df):
+    """({(src_label, rel_type, dst_label): [{src, dst}]}, n_unmatched) from edges.csv."""
+    groups = {}
+    label_groups, unmatched = group_edges_by_label(edges_df, nodes_df)
+    for (src_label, dst_label), records in label_groups.items():
+        for e in records:
+            groups.setdefault((src_label, e['type'], dst_label), []).append({'src': e['src'], 'dst': e['dst']})
+    return groups, unmatched
+
+def static_node_query(label, prop=ID_PROPERTY):
+    return f"""
+        UNWIND $batch AS row
+        MERGE (n:{quote(label)} {{{prop}: row.id}})
+        SET n.name = row.name, n.features = row.features, n += row.props
+        """
+
+def static_edge_query(src_label, rel_type, dst_label, prop=ID_PROPERTY):
+    return f"""
+        UNWIND $batch AS row
+        MATCH (s:{quote(src_label)} {{{prop}: row.src}})
+        MATCH (d:{quote(dst_label)} {{{prop}: row.dst}})
+        MERGE (s)-[:{quote(rel_type)}]->(d)
+        """
+
+def load_batches(nodes_df, edges_df, static=True, batch_size=BATCH_SIZE):
+    """
+    (node_batches, edge_batches, n_unmatched) for nodes.csv/edges.csv.
+    static=False builds the APOC batches (one dynamic query for everything).
+    """
+    edges_df = edges_df.fillna("")
+    if static:
+        node_batches = []
+        for label, rows in group_nodes_by_label(nodes_df).items():
+            node_batches += make_batches(f"nodes:{label}", static_node_query(label), rows, batch_size)
+        edge_groups, unmatched = group_edges_by_type(edges_df, nodes_df)
+        edge_batches = []
+        for (src_label, rel_type, dst_label), rows in edge_groups.items():
+            edge_batches += make_batches(f"edges:{src_label}-{rel_type}->{dst_label}",
+                                         static_edge_query(src_label, rel_type, dst_label), rows, batch_size)
+        return node_batches, edge_batches, unmatched
+
+    node_batches = make_batches("nodes", NODE_QUERY, node_records(nodes_df), batch_size)
+    edge_groups, unmatched = group_edges_by_label(edges_df, nodes_df)
+    edge_batches = []
+    for (src_label, dst_label), rows in edge_groups.items():
+        edge_batches += make_batches(f"edges:{src_label}->{dst_label}", edge_query(src_label, dst_label), rows, batch_size)
+    return node_batches, edge_batches, unmatched
+
+# ==========================================
+# PARALLEL, RESUMABLE LOADS
+# ==========================================
+# Each batch is one write transaction with a stable batch id. Once it
+# commits, its id is appended (and fsync'd) to a local ledger, so a rerun
+# skips everything that already landed. Writes use MERGE, so a batch that
+# committed right before a crash (but missed the ledger) is safe to replay.
+
+MAX_RETRIES = 6
+BACKOFF_SECONDS = 1.0
+
+class BatchLedger:
+    """Append-only JSON-lines record of committed batch ids for one input."""
+
+    def __init__(self, path, fingerprint, fresh=False):
+        self.path = path
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self.committed = set()
+        self.resumed = False
+        if not fresh and os.path.exists(path):
+            with open(path, 'r') as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            if lines and lines[0].get("fingerprint") == fingerprint:
+                self.committed = {line["batch"] for line in lines[1:]}
+                self.resumed = True
+        if not self.resumed:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(json.dumps({"fingerprint": fingerprint}) + "\n")
+
+    def done(self, batch_id):
+        return batch_id in self.committed
+
+    def record(self, batch_id):
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({"batch": batch_id, "at": time.time()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.committed.add(batch_id)
+
+def file_fingerprint(*paths):
+    """Content hash of the load inputs; a new export starts a new ledger."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def make_batches(prefix, query, rows, batch_size=BATCH_SIZE):
+    """[(batch_id, query, rows)] with ids stable across reruns of the same input."""
+    return [(f"{prefix}:{i}", query, rows[i:i + batch_size]) for i in range(0, len(rows), batch_size)]
+
+def _is_transient(error):
+    return isinstance(error, (ServiceUnavailable, SessionExpired, TransientError))
+
+def write_with_retry(driver, query, batch, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, params=None):
+    """One batch in one write transaction, retried with exponential backoff. `params` binds next to $batch."""
+    parameters = dict(params or {}, batch=batch)
+    for attempt in range(retries + 1):
+        try:
+            with driver.session() as session:
+                session.execute_write(lambda tx: tx.run(query, parameters).consume())
+            return
+        except Exception as e:
+            if attempt == retries or not _is_transient(e):
+                raise
+            time.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff))
+
+def run_parallel(driver, batches, ledger, workers, what, params=None):
+    """
+    Runs batches over `workers` sessions, skipping ledger hits. Returns the
+    ids that failed after retries (the ledger lets a rerun pick them up).
+    `ledger` may be None for loads that are not resumable; `params` are
+    extra query parameters every batch binds next to $batch.
+    """
+    pending = [b for b in batches if ledger is None or not ledger.done(b[0])]
+    if len(pending) < len(batches):
+        print(f"   - {what}: {len(batches) - len(pending)} of {len(batches)} batches already committed")
+    failed = []
+    total_rows = 0
+    start = time.perf_counter()
+
+    def run(job):
+        batch_id, query, rows = job
+        t0 = time.perf_counter()
+        write_with_retry(driver, query, rows, params=params)
+        if ledger is not None:
+            ledger.record(batch_id)
+        return batch_id, len(rows), time.perf_counter() - t0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run, job): job[0] for job in pending}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                batch_id, n, elapsed = future.result()
+                total_rows += n
+                print(f"   - {what} {batch_id} ({n / max(elapsed, 1e-9):,.0f} rows/s)")
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"   - Error pushing {what} {futures[future]}: {e}")
+
+    elapsed = time.perf_counter() - start
+    if pending:
+        print(f"   - {what}: {total_rows} rows in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return failed
+
+# ==========================================
+# DIFFERENTIAL SYNC
+# ==========================================
+# Instead of DETACH DELETE + full reupload: every synced node and
+# relationship carries a `_hash` of its properties. The remote hashes are
+# read back in keyset pages, diffed against the local graph, and only the
+# inserts/updates/deletes are applied - upserts first, deletes last, so the
+# graph never goes empty mid-sync. Only nodes that carry `_hash` (i.e. were
+# written by a sync) are ever deleted, so nodes other loaders own (e.g. the
+# step1b Patient mesh) are left alone.
+#
+# Entities a plain push wrote have no `_hash` yet. Their stored properties
+# are read instead and compared with the local ones; a match only gets its
+# `_hash` backfilled, so the first sync after a push is not a full rewrite.
+# If older loaders left several nodes with the same key, the uniqueness
+# constraint can't be built; ensure_unique_keys() then merges them once.
+#
+# Local graph shape (key_prop is the per-label unique key, 'id' or 'name'):
+#   nodes: {label: {key: {prop: value}}}
+#   rels:  {(src_label, rel_type, dst_label): [(src_key, dst_key, {prop: value})]}
+
+HASH_PROPERTY = "_hash"
+PAGE_SIZE = 5000
+
+def content_hash(props):
+    payload = json.dumps(props, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def stored_props(props):
+    """What Neo4j keeps of a property map: null values are never stored."""
+    return {k: v for k, v in props.items() if v is not None}
+
+def _pages(session, query, key, page_size):
+    """Keyset pages ordered by `key`; the first page has no lower bound, so any key type works."""
+    after = None
+    while True:
+        bound = "" if after is None else f"AND {key} > $after"
+        page = session.run(query.replace("{after}", bound), after=after, limit=page_size).data()
+        yield page
+        if len(page) < page_size:
+            return
+        after = page[-1]["key"]
+
+def fetch_node_hashes(session, label, key_prop, page_size=PAGE_SIZE):
+    """
+    ({key: hash} of synced nodes, {key: stored props} of nodes without a
+    hash), read in keyset pages over the key index.
+    """
+    query = f"""
+        MATCH (n:{quote(label)}) WHERE n.{key_prop} IS NOT NULL {{after}}
+        RETURN n.{key_prop} AS key, n.{HASH_PROPERTY} AS hash,
+               CASE WHEN n.{HASH_PROPERTY} IS NULL THEN properties(n) END AS props
+        ORDER BY key LIMIT $limit
+        """
+    hashes, unhashed = {}, {}
+    for page in _pages(session, query, f"n.{key_prop}", page_size):
+        for r in page:
+            if r["hash"] is not None:
+                hashes[r["key"]] = r["hash"]
+            else:
+                unhashed[r["key"]] = {k: v for k, v in r["props"].items() if k != key_prop}
+    return hashes, unhashed
+
+def fetch_rel_hashes(session, src_label, rel_type, dst_label, key_prop, page_size=PAGE_SIZE):
+    """
+    (set of (src_key, dst_key, hash), [(src_key, dst_key, stored props)] of
+    relationships without a hash), paged by source node.
+    """
+    query = f"""
+        MATCH (s:{quote(src_label)}) WHERE s.{key_prop} IS NOT NULL {{after}}
+        WITH s ORDER BY s.{key_prop} LIMIT $limit
+        OPTIONAL MATCH (s)-[r:{quote(rel_type)}]->(d:{quote(dst_label)})
+        RETURN s.{key_prop} AS key,
+               collect(CASE WHEN d IS NULL THEN NULL
+                            ELSE [d.{key_prop}, r.{HASH_PROPERTY},
+                                  CASE WHEN r.{HASH_PROPERTY} IS NULL THEN properties(r) END] END) AS out
+        """
+    rels, unhashed = set(), []
+    for page in _pages(session, query, f"s.{key_prop}", page_size):
+        for r in page:
+            for dst, h, props in r["out"]:
+                if h is not None:
+                    rels.add((r["key"], dst, h))
+                else:
+                    unhashed.append((r["key"], dst, props))
+    return rels, unhashed
+
+def diff_graph(session, nodes, rels, key_prop=ID_PROPERTY):
+    """Compares the local graph with the remote hashes; returns the change set."""
+    diff = {"node_upserts": {}, "node_backfills": {}, "node_deletes": {},
+            "rel_inserts": {}, "rel_backfills": {}, "rel_deletes": {}}
+    for label, local in nodes.items():
+        remote, unhashed = fetch_node_hashes(session, label, key_prop)
+        upserts, backfills = [], []
+        for key, props in local.items():
+            h = content_hash(props)
+            if key in unhashed and content_hash(unhashed[key]) == content_hash(stored_props(props)):
+                backfills.append({"key": key, "hash": h})
+            elif remote.get(key) != h:
+                upserts.append({"key": key, "props": props, "hash": h})
+        diff["node_upserts"][label] = upserts
+        diff["node_backfills"][label] = backfills
+        diff["node_deletes"][label] = sorted(set(remote) - set(local))
+
+    for group, local_rels in rels.items():
+        local = {}
+        for src, dst, props in local_rels:
+            local.setdefault((src, dst, content_hash(props)), props)
+        remote, unhashed = fetch_rel_hashes(session, *group, key_prop)
+        # Unhashed remote relationships, by what a local one would store
+        pending = {}
+        for s, d, props in unhashed:
+            pending.setdefault((s, d, content_hash(props)), props)
+        inserts, backfills = [], []
+        for (s, d, h), props in local.items():
+            if (s, d, h) in remote:
+                continue
+            stored = stored_props(props)
+            if pending.pop((s, d, content_hash(stored)), None) is not None:
+                backfills.append({"src": s, "dst": d, "props": stored, "hash": h})
+            else:
+                inserts.append({"src": s, "dst": d, "props": props, "hash": h})
+        diff["rel_inserts"][group] = inserts
+        diff["rel_backfills"][group] = backfills
+        diff["rel_deletes"][group] = ([{"src": s, "dst": d, "hash": h, "props": None}
+                                       for (s, d, h) in remote if (s, d, h) not in local] +
+                                      [{"src": s, "dst": d, "hash": None, "props": p}
+                                       for (s, d, _), p in pending.items()])
+    return diff
+
+def _count(part):
+    return sum(len(v) for v in part.values())
+
+def apply_diff(driver, diff, key_prop=ID_PROPERTY, workers=1):
+    """Upserts nodes, inserts rels, deletes stale rels, then deletes stale nodes."""
+    failed = []
+    upserts = []
+    for label, rows in diff["node_upserts"].items():
+        # `=` replaces the whole map, so properties dropped locally go away too
+        query = f"""
+            UNWIND $batch AS row
+            MERGE (n:{quote(label)} {{{key_prop}: row.key}})
+            SET n = row.props, n.{key_prop} = row.key, n.{HASH_PROPERTY} = row.hash
+            """
+        upserts += make_batches(f"upsert:{label}", query, rows)
+    for label, rows in diff["node_backfills"].items():
+        query = f"""
+            UNWIND $batch AS row
+            MATCH (n:{quote(label)} {{{key_prop}: row.key}})
+            SET n.{HASH_PROPERTY} = row.hash
+            """
+        upserts += make_batches(f"backfill:{label}", query, rows)
+    failed += run_parallel(driver, upserts, None, workers, "node upsert batch")
+
+    inserts, rel_deletes = [], []
+    for (src_label, rel_type, dst_label), rows in diff["rel_inserts"].items():
+        query = f"""
+            UNWIND $batch AS row
+            MATCH (s:{quote(src_label)} {{{key_prop}: row.src}})
+            MATCH (d:{quote(dst_label)} {{{key_prop}: row.dst}})
+            CREATE (s)-[r:{quote(rel_type)}]->(d)
+            SET r = row.props, r.{HASH_PROPERTY} = row.hash
+            """
+        inserts += make_batches(f"insert:{rel_type}", query, rows)
+    for (src_label, rel_type, dst_label), rows in diff["rel_backfills"].items():
+        query = f"""
+            UNWIND $batch AS row
+            MATCH (s:{quote(src_label)} {{{key_prop}: row.src}})-[r:{quote(rel_type)}]->(d:{quote(dst_label)} {{{key_prop}: row.dst}})
+            WHERE r.{HASH_PROPERTY} IS NULL AND properties(r) = row.props
+            SET r.{HASH_PROPERTY} = row.hash
+            """
+        inserts += make_batches(f"backfill:{rel_type}", query, rows)
+    for (src_label, rel_type, dst_label), rows in diff["rel_deletes"].items():
+        # Unhashed relationships are matched on their properties, so one that
+        # was just backfilled (or a backfill that failed) is never deleted
+        query = f"""
+            UNWIND $batch AS row
+            MATCH (s:{quote(src_label)} {{{key_prop}: row.src}})-[r:{quote(rel_type)}]->(d:{quote(dst_label)} {{{key_prop}: row.dst}})
+            WHERE r.{HASH_PROPERTY} = row.hash OR (row.hash IS NULL AND r.{HASH_PROPERTY} IS NULL AND properties(r) = row.props)
+            DELETE r
+            """
+        rel_deletes += make_batches(f"delete:{rel_type}", query, rows)
+    failed += run_parallel(driver, inserts, None, workers, "relationship insert batch")
+    failed += run_parallel(driver, rel_deletes, None, workers, "relationship delete batch")
+
+    node_deletes = []
+    for label, keys in diff["node_deletes"].items():
+        query = f"""
+            UNWIND $batch AS key
+            MATCH (n:{quote(label)} {{{key_prop}: key}}) WHERE n.{HASH_PROPERTY} IS NOT NULL
+            DETACH DELETE n
+            """
+        node_deletes += make_batches(f"delete:{label}", query, keys)
+    failed += run_parallel(driver, node_deletes, None, workers, "node delete batch")
+    return failed
+
+def duplicate_keys(session, label, key_prop, limit=20):
+    """[(key, copies)] for keys held by more than one node of `label` (at most `limit`)."""
+    query = f"""
+        MATCH (n:{quote(label)}) WHERE n.{key_prop} IS NOT NULL
+        WITH n.{key_prop} AS key, count(*) AS copies WHERE copies > 1
+        RETURN key, copies ORDER BY copies DESC, key LIMIT $limit
+        """
+    return [(r["key"], r["copies"]) for r in session.run(query, limit=limit)]
+
+def merge_duplicate_keys(session, label, key_prop, managed_types):
+    """
+    One-time adoption of a graph written by CREATE-based loaders, where
+    several nodes share a key and the uniqueness constraint can't be built.
+    Per key one copy survives (a synced one if any). The others are removed
+    along with their relationships of `managed_types`: the sync recreates the
+    ones the local graph has and would delete the rest anyway. A copy that
+    also has other relationships is kept, and reported by the caller.
+    """
+    query = f"""
+        MATCH (n:{quote(label)}) WHERE n.{key_prop} IS NOT NULL
+        WITH n ORDER BY n.{HASH_PROPERTY} IS NULL, elementId(n)
+        WITH n.{key_prop} AS key, collect(n) AS copies WHERE size(copies) > 1
+        UNWIND copies[1..] AS dup
+        WITH dup WHERE NOT EXISTS {{ MATCH (dup)-[r]-() WHERE NOT type(r) IN $managed }}
+        DETACH DELETE dup
+        RETURN count(*) AS removed
+        """
+    removed = session.run(query, managed=sorted(managed_types)).single()["removed"]
+    print(f"   - Merged duplicate {label}.{key_prop} values: {removed} extra nodes removed")
+
+def ensure_unique_keys(session, labels, rels, key_prop=ID_PROPERTY):
+    """
+    ensure_id_constraints(), merging duplicate keys first if the constraint
+    can't be created. Raises RuntimeError naming the keys that still collide.
+    """
+    try:
+        ensure_id_constraints(session, labels, key_prop)
+        return
+    except Neo4jError as e:
+        print(f"⚠️ Uniqueness constraint on {key_prop} failed ({e.code}). Merging duplicates...")
+    for label in labels:
+        if duplicate_keys(session, label, key_prop, limit=1):
+            managed = {t for (src, t, dst) in rels if label in (src, dst)}
+            merge_duplicate_keys(session, label, key_prop, managed)
+    try:
+        ensure_id_constraints(session, labels, key_prop)
+    except Neo4jError as e:
+        collisions = {label: duplicate_keys(session, label, key_prop) for label in labels}
+        report = "; ".join(f"{label}: " + ", ".join(f"{key!r} x{n}" for key, n in keys)
+                           for label, keys in collisions.items() if keys)
+        raise RuntimeError(f"Duplicate {key_prop} values block the uniqueness constraint "
+                           f"(nodes with unrelated relationships were kept): {report or e}") from e
+
+def sync_graph(driver, nodes, rels, key_prop=ID_PROPERTY, workers=1):
+    """Differential sync of a local graph; returns the ids of failed batches."""
+    start = time.perf_counter()
+    with driver.session() as session:
+        ensure_unique_keys(session, sorted(nodes), rels, key_prop)
+        diff = diff_graph(session, nodes, rels, key_prop)
+    print(f"   - Diff: {_count(diff['node_upserts'])} node upserts, {_count(diff['node_deletes'])} node deletes, "
+          f"{_count(diff['rel_inserts'])} relationship inserts, {_count(diff['rel_deletes'])} relationship deletes, "
+          f"{_count(diff['node_backfills']) + _count(diff['rel_backfills'])} hash backfills "
+          f"({time.perf_counter() - start:.1f}s)")
+    failed = apply_diff(driver, diff, key_prop, workers)
+    print(f"   - Sync finished in {time.perf_counter() - start:.1f}s")
+    return failed
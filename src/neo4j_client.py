@@ -1,17 +1,34 @@
 import os
+import sys
 import logging
 import warnings
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from kg_queries import NODE_COUNT
+
 # Suppress noisy DBMS Neo4j warnings from polluting the stdout
 logging.getLogger("neo4j").setLevel(logging.ERROR)
 warnings.filterwarnings("ignore")
 
 load_dotenv()
 
+# "neo4j" (AuraDB over the network) or "embedded" (in-process snapshot, see embedded_kg.py)
+KG_BACKEND = os.getenv("FURI_KG_BACKEND", "neo4j")
+
 class Neo4jClient:
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or KG_BACKEND
+        self.driver = None
+        self.graph = None
+        if self.backend == "embedded":
+            from embedded_kg import load_embedded_graph
+            self.graph = load_embedded_graph()
+            return
+        if self.backend != "neo4j":
+            raise ValueError(f"Unknown FURI_KG_BACKEND '{self.backend}' (expected 'neo4j' or 'embedded').")
+
         uri = os.getenv("NEO4J_URI")
         user = os.getenv("NEO4J_USER")
         password = os.getenv("NEO4J_PASSWORD")
@@ -31,7 +48,9 @@ class Neo4jClient:
         """
         if parameters is None:
             parameters = {}
-            
+        if self.graph is not None:
+            return self.graph.execute_query(cypher_query, parameters)
+
         try:
             with self.driver.session() as session:
                 result = session.run(cypher_query, parameters)
@@ -44,14 +63,14 @@ class Neo4jClient:
 kg_client = Neo4jClient()
 
 if __name__ == "__main__":
-    print("Testing connection to FuriMasterKG AuraDB...")
+    print(f"Testing connection to FuriMasterKG ({kg_client.backend} backend)...")
     try:
         # Simple test query to count nodes
-        res = kg_client.execute_query("MATCH (n) RETURN count(n) AS total_nodes")
+        res = kg_client.execute_query(NODE_COUNT)
         if isinstance(res, dict) and "error" in res:
             print(f"FAILED to query Neo4j: {res['error']}")
         else:
-            print(f"SUCCESS! Connected to Neo4j. Total nodes in graph: {res[0]['total_nodes']}")
+            print(f"SUCCESS! Connected to FuriMasterKG. Total nodes in graph: {res[0]['total_nodes']}")
     except Exception as e:
         print(f"Unexpected error: {e}")
     finally:
@@ -0,0 +1,191 @@
+import os
+import csv
+import gzip
+import json
+import shutil
+import numpy as np
+
+# ==========================================
+# STREAMING, TYPED NEO4J EXPORT
+# ==========================================
+# Bulk-import layout written from the built graph arrays, one block of rows
+# at a time. The export itself holds one block of rows and strings per
+# process; the numeric arrays it reads (2_build_graph.py keeps them for
+# tadpole_graph.pt and the graph store) are still the size of the graph.
+#
+#   neo4j_import/bulk/
+#     manifest.json                       labels/types -> header + parts
+#     nodes_Patient_header.csv            id:ID(Patient),name,features:float[],age:float,...
+#     nodes_Patient_part-b00000-00000.csv.gz   header-less rows of block 0
+#     rels_HAS_VISIT_header.csv           :START_ID(Patient),:END_ID(Visit)
+#     rels_HAS_VISIT_part-b00000-00000.csv.gz
+#     ...
+#
+# Each block (BlockExport) writes its own tagged parts, so blocks can be
+# formatted and compressed in separate processes; Neo4jBulkExporter writes
+# the headers and the manifest, listing parts in block order.
+#
+# Features are real float arrays (';' delimited, NaN spelled the Java way),
+# so nothing has to parse str(list) again on the way in. Key biomarkers are
+# also written as named scalar properties (missing values are left out, so
+# `WHERE v.mmse < 24` simply skips visits without an MMSE), and the manifest
+# records which column each features slot holds.
+
+ARRAY_DELIMITER = ";"
+PART_ROWS = 500000   # rows per gz part file
+
+def format_float_array(values):
+    return ARRAY_DELIMITER.join("NaN" if v != v else repr(float(v)) for v in values)
+
+def format_scalar(value):
+    return "" if value is None or value != value else repr(value)
+
+class _PartWriter:
+    """Rolling gzip parts for one label or relationship type (headers are written by the exporter)."""
+
+    def __init__(self, out_dir, prefix, header, part_rows, tag=""):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.header = header
+        self.part_rows = part_rows
+        self.tag = tag
+        self.parts = []
+        self.rows = 0
+        self._handle = None
+        self._writer = None
+        self._part_count = 0
+
+    def _roll(self):
+        self.close()
+        name = f"{self.prefix}_part-{self.tag}{len(self.parts):05d}.csv.gz"
+        self.parts.append(name)
+        self._handle = gzip.open(os.path.join(self.out_dir, name), 'wt', newline='', compresslevel=6)
+        self._writer = csv.writer(self._handle)
+        self._part_count = 0
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self._writer is None or self._part_count >= self.part_rows:
+                self._roll()
+            self._writer.writerow(row)
+            self._part_count += 1
+            self.rows += 1
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+            self._writer = None
+
+    def describe(self):
+        return {"header": self.header, "parts": self.parts, "rows": self.rows}
+
+class BlockExport:
+    """
+    Parts for one block of the export, tagged so blocks never share a file.
+    Blocks can be written in worker processes; close() returns the summary
+    Neo4jBulkExporter.add_block() merges into the manifest.
+    """
+
+    def __init__(self, out_dir, tag="", part_rows=PART_ROWS):
+        self.out_dir = out_dir
+        self.tag = tag
+        self.part_rows = part_rows
+        self._nodes = {}
+        self._rels = {}
+        self._feature_names = {}
+
+    def write_nodes(self, label, ids, names, features=None, properties=None, feature_names=None):
+        """
+        properties: {name: 1-D array} of scalar properties, same order on every
+        call for a label. Integer arrays are typed long, everything else float.
+        """
+        properties = properties or {}
+        if label not in self._nodes:
+            header = [f"id:ID({label})", "name"] + (["features:float[]"] if features is not None else [])
+            header += [f"{name}:{'long' if np.asarray(v).dtype.kind in 'iu' else 'float'}"
+                       for name, v in properties.items()]
+            self._nodes[label] = _PartWriter(self.out_dir, f"nodes_{label}", header, self.part_rows, self.tag)
+            if feature_names is not None:
+                self._feature_names[label] = list(feature_names)
+        columns = [ids, names]
+        if features is not None:
+            columns.append([format_float_array(f) for f in np.asarray(features).tolist()])
+        columns += [[format_scalar(v) for v in np.asarray(values).tolist()] for values in properties.values()]
+        self._nodes[label].write_rows(zip(*columns))
+
+    def write_relationships(self, rel_type, src_label, src_ids, dst_label, dst_ids):
+        if rel_type not in self._rels:
+            header = [f":START_ID({src_label})", f":END_ID({dst_label})"]
+            self._rels[rel_type] = _PartWriter(self.out_dir, f"rels_{rel_type}", header, self.part_rows, self.tag)
+        self._rels[rel_type].write_rows(zip(src_ids, dst_ids))
+
+    def close(self):
+        for writer in list(self._nodes.values()) + list(self._rels.values()):
+            writer.close()
+        return {"nodes": {label: w.describe() for label, w in self._nodes.items()},
+                "relationships": {rel: w.describe() for rel, w in self._rels.items()},
+                "feature_names": self._feature_names}
+
+class Neo4jBulkExporter:
+    """
+    Usage:
+        with Neo4jBulkExporter(out_dir) as exporter:
+            exporter.write_nodes('Patient', ids, names, features, {'age': ages}, feature_names)
+            exporter.write_relationships('HAS_VISIT', 'Patient', src_ids, 'Visit', dst_ids)
+            exporter.add_block(summary)  # a BlockExport(out_dir, tag).close() from elsewhere
+    Parts are listed in the manifest in the order they were written / added.
+    """
+
+    def __init__(self, out_dir, part_rows=PART_ROWS):
+        self.out_dir = out_dir
+        self.part_rows = part_rows
+        self._direct = None
+        self._manifest = {"nodes": {}, "relationships": {}, "feature_names": {}}
+
+    def __enter__(self):
+        if os.path.exists(self.out_dir):
+            shutil.rmtree(self.out_dir)
+        os.makedirs(self.out_dir)
+        return self
+
+    def _block(self):
+        if self._direct is None:
+            self._direct = BlockExport(self.out_dir, "", self.part_rows)
+        return self._direct
+
+    def write_nodes(self, label, ids, names, features=None, properties=None, feature_names=None):
+        self._block().write_nodes(label, ids, names, features, properties, feature_names)
+
+    def write_relationships(self, rel_type, src_label, src_ids, dst_label, dst_ids):
+        self._block().write_relationships(rel_type, src_label, src_ids, dst_label, dst_ids)
+
+    def add_block(self, summary):
+        for kind in ("nodes", "relationships"):
+            for name, entry in summary[kind].items():
+                merged = self._manifest[kind].setdefault(name, {"header": entry["header"], "parts": [], "rows": 0})
+                if merged["header"] != entry["header"]:
+                    raise ValueError(f"{name}: blocks disagree on the header ({merged['header']} vs {entry['header']})")
+                merged["parts"] += entry["parts"]
+                merged["rows"] += entry["rows"]
+        for label, names in summary["feature_names"].items():
+            self._manifest["feature_names"].setdefault(label, names)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._direct is not None:
+            summary, self._direct = self._direct.close(), None
+            self.add_block(summary)
+        if exc_type is not None:
+            return False
+        manifest = {"array_delimiter": ARRAY_DELIMITER, "nodes": {}, "relationships": {},
+                    "feature_names": self._manifest["feature_names"]}
+        for kind, prefix in (("nodes", "nodes"), ("relationships", "rels")):
+            for name, entry in self._manifest[kind].items():
+                header_file = f"{prefix}_{name}_header.csv"
+                with open(os.path.join(self.out_dir, header_file), 'w', newline='') as f:
+                    csv.writer(f).writerow(entry["header"])
+                manifest[kind][name] = {"header": header_file, "parts": entry["parts"], "rows": entry["rows"]}
+        with open(os.path.join(self.out_dir, "manifest.json"), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        print(f"✅ NEO4J BULK EXPORT READY: {self.out_dir}")
+        return False
@@ -1,16 +1,16 @@
-import pandas as pd
 import numpy as np
 import os
+import sys
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_clean.csv")
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tadpole_store import load_tadpole
 
 def verify_splits():
     print("Verifying Data Splits...")
-    df = pd.read_csv(DATA_PATH)
+    df = load_tadpole()
     
     # 1. Check if D1 (Train) and D2 (Test) exist
     if 'D1' not in df.columns or 'D2' not in df.columns:
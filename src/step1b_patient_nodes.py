@@ -1,7 +1,11 @@
 import json
 import os
+import sys
+import argparse
 from neo4j import GraphDatabase
-from tqdm import tqdm
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from neo4j_bulk import ensure_id_constraints, make_batches, run_parallel
 
 # 1. SETUP: NEO4J CONNECTION
 NEO4J_URI = "neo4j+s://a1e8aa49.databases.neo4j.io"
@@ -13,33 +17,66 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 # Reading the timelines we generated earlier
 input_file = os.path.join(SCRIPT_DIR, '../data/processed/CLEAN_1730_TIMELINES.json')
 
-def import_patients(tx, patient_data):
-    """Creates the Patient Node and links it to the Master Cohort."""
-    query = """
-    MATCH (c:Cohort {name: 'ADNI_1730_Master'})
-    MERGE (p:Patient {rid: $rid})
-    SET p.total_visits = $visits,
-        p.summary = $summary
-    MERGE (p)-[:MEMBER_OF]->(c)
-    """
-    tx.run(query, rid=patient_data['RID'], visits=patient_data['Total_Visits'], summary=patient_data['Timeline_Summary'])
-
-def main():
-    print(f"[INFO] Loading 1,730 clean timelines from: {input_file}")
+COHORT_NAME = 'ADNI_1730_Master'
+BATCH_SIZE = 500   # patients per UNWIND transaction
+WORKERS = 4        # concurrent write transactions
+
+# One transaction per batch: the Cohort is matched once, then every row
+# MERGEs through the Patient.rid uniqueness index. Params: batch, cohort
+PATIENT_QUERY = """
+MATCH (c:Cohort {name: $cohort})
+UNWIND $batch AS row
+MERGE (p:Patient {rid: row.rid})
+SET p.total_visits = row.visits,
+    p.summary = row.summary
+MERGE (p)-[:MEMBER_OF]->(c)
+"""
+
+def patient_rows(data):
+    """Drops null entries and shapes timelines into UNWIND rows."""
+    return [{'rid': p['RID'], 'visits': p['Total_Visits'], 'summary': p['Timeline_Summary']}
+            for p in data if p is not None and 'RID' in p]
+
+def import_patients(driver, rows, batch_size=BATCH_SIZE, workers=WORKERS, cohort=COHORT_NAME):
+    """Creates the Patient nodes and links them to the Master Cohort. Returns failed batch ids."""
+    with driver.session() as session:
+        ensure_id_constraints(session, ['Patient'], prop='rid')
+        if session.run("MATCH (c:Cohort {name: $cohort}) RETURN count(c) AS n", cohort=cohort).single()['n'] == 0:
+            raise RuntimeError(f"Cohort '{cohort}' not found. Run step1a_ontology.py first.")
+    return run_parallel(driver, make_batches("patients", PATIENT_QUERY, rows, batch_size), None, workers, "Patients",
+                        params={'cohort': cohort})
+
+def main(batch_size=BATCH_SIZE, workers=WORKERS, update_twins=False):
+    print(f"[INFO] Loading clean timelines from: {input_file}")
     with open(input_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
-    
+
     # Filter out any null entries we found earlier (just in case)
-    clean_data = [p for p in data if p is not None and 'RID' in p]
+    rows = patient_rows(data)
 
     driver = GraphDatabase.driver(NEO4J_URI, auth=AUTH)
-    with driver.session() as session:
-        print("[INFO] Injecting patients into the Knowledge Graph...")
-        for patient in tqdm(clean_data):
-            session.execute_write(import_patients, patient)
-            
-    driver.close()
-    print(f"[SUCCESS] {len(clean_data)} patients are now linked to the Master Foundation.")
+    try:
+        print(f"[INFO] Injecting {len(rows)} patients in batches of {batch_size} ({workers} workers)...")
+        failed = import_patients(driver, rows, batch_size, workers)
+        if failed:
+            print(f"[ERROR] {len(failed)} batches failed after retries: {', '.join(failed)}. Rerun to retry (MERGE is idempotent).")
+            sys.exit(1)
+        print(f"[SUCCESS] {len(rows)} patients are now linked to the Master Foundation.")
+        if update_twins:
+            # Twins for the patients the saved twin state has not seen yet
+            from step1c_similarity_edges import incremental_update
+            failed = incremental_update(driver, [row['rid'] for row in rows], workers)
+            if failed:
+                print(f"[ERROR] {len(failed)} twin batches failed after retries. Rerun with --update-twins.")
+                sys.exit(1)
+    finally:
+        driver.close()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Batched Patient ingestion into the Knowledge Graph")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Patients per UNWIND transaction")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent write transactions")
+    parser.add_argument("--update-twins", action="store_true",
+                        help="Incrementally add SIMILAR_TO twins for new patients (needs a full step1c build once)")
+    args = parser.parse_args()
+    main(args.batch_size, args.workers, args.update_twins)
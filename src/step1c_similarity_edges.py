@@ -1,7 +1,17 @@
 import os
+import sys
+import json
+import argparse
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from clinical_twins import build_twins, update_twins, commit_twin_update, load_twin_state, K_TWINS, TWIN_REASON
+from trajectory_twins import build_trajectory_twins, TRAJECTORY_REASON, WORKERS as DTW_WORKERS
+from neo4j_bulk import ensure_id_constraints, make_batches, run_parallel
+from twin_cache import mark_twins_rebuilt
+from twin_index import sync_twin_index
+
 load_dotenv()
 
 # 1. SETUP: NEO4J CONNECTION
@@ -10,32 +20,145 @@ NEO4J_USER = "a1e8aa49"
 NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD")
 AUTH = (NEO4J_USER, NEO4J_PASSWORD)
 
-def create_p2p_edges(tx):
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# The patients step1b put in the graph; twins are searched among them only
+TIMELINES_PATH = os.path.join(SCRIPT_DIR, '../data/processed/CLEAN_1730_TIMELINES.json')
+WORKERS = 4
+DELETE_BATCH = 10000
+
+def twin_edge_query(rel_type, distance_prop, reason):
+    return f"""
+UNWIND $batch AS row
+MATCH (p1:Patient {{rid: row.src_rid}})
+MATCH (p2:Patient {{rid: row.dst_rid}})
+MERGE (p1)-[r:{rel_type}]->(p2)
+SET r.{distance_prop} = row.{distance_prop},
+    r.rank = row.rank,
+    r.reason = '{reason}'
+"""
+
+# Twin modes: feature-vector kNN (clinical_twins.py) and DTW over visit
+# trajectories (trajectory_twins.py), each with its own relationship type
+TWIN_MODES = {
+    'features': ('SIMILAR_TO', twin_edge_query('SIMILAR_TO', 'euclidean_distance', TWIN_REASON)),
+    'trajectory': ('TRAJECTORY_TWIN', twin_edge_query('TRAJECTORY_TWIN', 'dtw_distance', TRAJECTORY_REASON)),
+}
+SIMILAR_TO_QUERY = TWIN_MODES['features'][1]
+
+# Twin pairs are written once (src_rid < dst_rid); match either direction
+DELETE_SIMILAR_TO_QUERY = """
+UNWIND $batch AS row
+MATCH (:Patient {rid: row.src_rid})-[r:SIMILAR_TO]-(:Patient {rid: row.dst_rid})
+DELETE r
+"""
+
+def graph_rids(path=TIMELINES_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return [p['RID'] for p in json.load(f) if p is not None and 'RID' in p]
+
+def create_p2p_edges(driver, edges, workers=WORKERS, mode='features'):
     """
-    Creates SIMILAR_TO edges between patients who share clinical profiles.
-    We limit the margin to keep the graph from becoming a 'hairball'.
+    Replaces every edge of the mode's relationship type with the twin pairs
+    (one edge per pair; twin queries match it in both directions). Returns
+    failed batch ids.
+    """
+    rel_type, query = TWIN_MODES[mode]
+    with driver.session() as session:
+        ensure_id_constraints(session, ['Patient'], prop='rid')
+        print(f"[INFO] Removing previous {rel_type} edges...")
+        session.run(f"MATCH ()-[r:{rel_type}]->() CALL {{ WITH r DELETE r }} IN TRANSACTIONS OF {DELETE_BATCH} ROWS").consume()
+
+    print(f"[INFO] Writing {len(edges)} weighted {rel_type} edges...")
+    rows = edges.to_dict('records')
+    return run_parallel(driver, make_batches(mode, query, rows), None, workers, "Twin edges")
+
+def update_p2p_edges(driver, upserts, removed, workers=WORKERS):
+    """Writes only the SIMILAR_TO edges an incremental update changed. Returns failed batch ids."""
+    with driver.session() as session:
+        ensure_id_constraints(session, ['Patient'], prop='rid')
+    print(f"[INFO] Writing {len(upserts)} changed and deleting {len(removed)} displaced SIMILAR_TO edges...")
+    failed = run_parallel(driver, make_batches("twins-del", DELETE_SIMILAR_TO_QUERY, removed.to_dict('records')),
+                          None, workers, "Displaced twin edges")
+    return failed + run_parallel(driver, make_batches("twins-upd", SIMILAR_TO_QUERY, upserts.to_dict('records')),
+                                 None, workers, "Changed twin edges")
+
+def refresh_twin_index(state, added_rids=None):
+    """Keeps the local twin index on the saved twin state; the graph edges stay authoritative."""
+    try:
+        index = sync_twin_index(state, added_rids)
+        print(f"[INFO] Twin index now holds {len(index)} patients.")
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Twin index not updated ({e}). Rebuild it with `python src/twin_index.py`.")
+
+def incremental_update(driver, rids, workers=WORKERS):
     """
-    # Query 1: Link patients who share the same extreme atrophy rates (>5%)
-    atrophy_query = """
-    MATCH (p1:Patient), (p2:Patient)
-    WHERE p1.rid < p2.rid 
-      AND toLower(p1.summary) CONTAINS 'atrophy' AND toLower(p2.summary) CONTAINS 'atrophy'
-    WITH p1, p2 LIMIT 150
-    MERGE (p1)-[r:SIMILAR_TO {reason: 'MCI_CONVERTER_COHORT'}]->(p2)
-    RETURN count(r) as EdgeCount
+    Places the patients in `rids` that the twin state does not have yet and
+    writes the resulting SIMILAR_TO changes. Returns failed batch ids; the
+    state is only saved once every batch succeeded, so a rerun redoes it.
     """
-    
-    print("[INFO] Building bridges between MCI-to-AD Converters...")
-    result = tx.run(atrophy_query)
-    for record in result:
-        print(f"[INFO] Created {record['EdgeCount']} SIMILAR_TO edges.")
+    new_state, upserts, removed = update_twins(rids)
+    if new_state is None:
+        print("[INFO] No new patients; SIMILAR_TO edges are up to date.")
+        return []
+    failed = update_p2p_edges(driver, upserts, removed, workers)
+    mark_twins_rebuilt()  # even a partial write changed edges some caches hold
+    if not failed:
+        added = new_state['added']
+        commit_twin_update(new_state)
+        refresh_twin_index(new_state, added)
+    return failed
+
+def main(k=K_TWINS, workers=WORKERS, mode='features', dtw_workers=DTW_WORKERS, incremental=False):
+    rids = graph_rids()
+    if incremental:
+        if rids is None:
+            print(f"[ERROR] Incremental updates need the graph patients in {TIMELINES_PATH}.")
+            sys.exit(1)
+        driver = GraphDatabase.driver(NEO4J_URI, auth=AUTH)
+        try:
+            failed = incremental_update(driver, rids, workers)
+        finally:
+            driver.close()
+        if failed:
+            print(f"[ERROR] {len(failed)} batches failed after retries. Rerun to retry the update.")
+            sys.exit(1)
+        print("[SUCCESS] Twin mesh updated for the new patients.")
+        return
+
+    scope = f" for the {len(rids)} graph patients..." if rids is not None else "..."
+    if mode == 'trajectory':
+        print(f"[INFO] Building exact top-{k} DTW trajectory twins from tadpole_clean" + scope)
+        edges = build_trajectory_twins(rids, k, dtw_workers)
+    else:
+        print(f"[INFO] Building exact top-{k} clinical twins from tadpole_clean" + scope)
+        edges = build_twins(rids, k)
 
-def main():
     driver = GraphDatabase.driver(NEO4J_URI, auth=AUTH)
-    with driver.session() as session:
-        session.execute_write(create_p2p_edges)
-    driver.close()
+    try:
+        failed = create_p2p_edges(driver, edges, workers, mode)
+    finally:
+        driver.close()
+    if mode == 'features':
+        mark_twins_rebuilt()  # twin caches drop their SIMILAR_TO answers
+    if failed:
+        print(f"[ERROR] {len(failed)} batches failed after retries. Rerun to rebuild the edges.")
+        sys.exit(1)
+    if mode == 'features':
+        refresh_twin_index(load_twin_state())
     print("[SUCCESS] Patient-to-Patient correspondence is now live.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build patient twin edges (SIMILAR_TO or TRAJECTORY_TWIN)")
+    parser.add_argument("--k", type=int, default=K_TWINS, help="Twins per patient")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent write transactions")
+    parser.add_argument("--mode", choices=sorted(TWIN_MODES), default='features',
+                        help="features: kNN on feature vectors; trajectory: DTW over visit sequences")
+    parser.add_argument("--dtw-workers", type=int, default=DTW_WORKERS, help="Processes for the DTW search")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only place graph patients missing from the saved twin state (features mode)")
+    args = parser.parse_args()
+    if args.incremental and args.mode != 'features':
+        parser.error("--incremental only supports --mode features")
+    main(args.k, args.workers, args.mode, args.dtw_workers, args.incremental)
@@ -4,26 +4,24 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from neo4j_client import kg_client
+from kg_queries import UI_PATIENTS, UI_ONTOLOGY_NODES, UI_PATIENT_EDGES, UI_ONTOLOGY_EDGES
+
+def fetch(query, limit):
+    rows = kg_client.execute_query(query, {'limit': limit})
+    if isinstance(rows, dict):
+        raise RuntimeError(f"Graph query failed: {rows['error']}")
+    return rows
 
 def run():
     print("Extracting graph data from MasterKG for Next.js UI...")
     
     # 1. Fetch Patients (Limit 200 for UI performance)
     print("Fetching Patients...")
-    patients_data = kg_client.execute_query("""
-        MATCH (p:Patient)
-        RETURN p.rid AS id, labels(p)[0] AS type, 'Patient ' + p.rid AS label, p AS properties
-        LIMIT 200
-    """)
+    patients_data = fetch(UI_PATIENTS, 200)
     
     # 2. Fetch Ontology Nodes
     print("Fetching Ontology Nodes...")
-    ontology_data = kg_client.execute_query("""
-        MATCH (n)
-        WHERE NOT 'Patient' IN labels(n)
-        RETURN elementId(n) AS id, labels(n)[0] AS type, n.name AS label, n AS properties
-        LIMIT 50
-    """)
+    ontology_data = fetch(UI_ONTOLOGY_NODES, 50)
     
     nodes = []
     
@@ -64,11 +62,7 @@ def run():
 
     # 3. Fetch SIMILAR_TO Edges
     print("Fetching Patient Edges...")
-    patient_edges_data = kg_client.execute_query("""
-        MATCH (p1:Patient)-[r:SIMILAR_TO]->(p2:Patient)
-        RETURN p1.rid AS source, p2.rid AS target, r.euclidean_distance AS weight, elementId(r) AS edge_id
-        LIMIT 300
-    """)
+    patient_edges_data = fetch(UI_PATIENT_EDGES, 300)
     
     edges = []
     for row in patient_edges_data:
@@ -86,12 +80,7 @@ def run():
             
     # 4. Fetch Ontology Edges
     print("Fetching Ontology Edges...")
-    onto_edges_data = kg_client.execute_query("""
-        MATCH (n1)-[r]->(n2)
-        WHERE NOT 'Patient' IN labels(n1) AND NOT 'Patient' IN labels(n2)
-        RETURN elementId(n1) AS source, elementId(n2) AS target, type(r) AS edge_type, elementId(r) AS edge_id
-        LIMIT 100
-    """)
+    onto_edges_data = fetch(UI_ONTOLOGY_EDGES, 100)
     
     for row in onto_edges_data:
         s = row['source']
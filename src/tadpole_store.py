@@ -0,0 +1,210 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # CSV fallback still works without pyarrow
+    pa = None
+    ds = None
+    pq = None
+
+# ==========================================
+# SHARED LOADER FOR tadpole_clean
+# ==========================================
+# 1_preprocess_data.py writes tadpole_clean.csv plus a columnar copy of it,
+# partitioned by RID bucket (rid_bucket = RID % N_BUCKETS). Every consumer
+# loads through load_tadpole() so it only reads the columns and row groups
+# it needs. If the Parquet dataset (or pyarrow) is missing we fall back to
+# the CSV with the same projection/filter semantics. Rows are ordered by
+# (RID, _row), so an incremental run can rewrite single buckets without
+# renumbering the others.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CLEAN_CSV_PATH = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_clean.csv")
+PARQUET_DIR = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_clean_parquet")
+
+N_BUCKETS = 16
+BUCKET_COLUMN = "rid_bucket"
+ROW_COLUMN = "_row"               # CSV row order within a RID
+META_FILE = "_dataset.json"       # '_' prefix keeps it out of dataset discovery
+
+_ARROW_TYPES = {'int64': 'int64', 'float64': 'float64', 'object': 'string', 'bool': 'bool_'}
+
+def _arrow_schema(df):
+    fields = []
+    for col, dtype in df.dtypes.items():
+        arrow_type = getattr(pa, _ARROW_TYPES.get(str(dtype), 'string'))()
+        fields.append(pa.field(col, arrow_type))
+    fields.append(pa.field(ROW_COLUMN, pa.int64()))
+    fields.append(pa.field(BUCKET_COLUMN, pa.int32()))
+    return pa.schema(fields)
+
+def write_parquet_dataset(chunks, out_dir=PARQUET_DIR, n_buckets=N_BUCKETS):
+    """
+    Writes an iterable of tadpole_clean DataFrames (in CSV order) as a hive
+    partitioned Parquet dataset. The schema is taken from the first chunk, so
+    chunked callers must pass consistent dtypes. Frames read back from the
+    CSV must use float_precision='round_trip', or floats drift by one ULP.
+    """
+    if pa is None:
+        print("⚠️ pyarrow not installed, skipping Parquet dataset.")
+        return
+
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return
+    schema = _arrow_schema(first)
+    columns = list(first.columns)
+
+    def batches():
+        offset = 0
+        for chunk in _chain(first, chunks):
+            chunk = chunk.copy()
+            chunk[ROW_COLUMN] = np.arange(offset, offset + len(chunk), dtype='int64')
+            chunk[BUCKET_COLUMN] = (chunk['RID'] % n_buckets).astype('int32')
+            offset += len(chunk)
+            yield pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    partitioning = ds.partitioning(pa.schema([pa.field(BUCKET_COLUMN, pa.int32())]), flavor="hive")
+    ds.write_dataset(batches(), out_dir, schema=schema, format="parquet",
+                     partitioning=partitioning, basename_template="part-{i}.parquet",
+                     preserve_order=True)
+
+    with open(os.path.join(out_dir, META_FILE), 'w') as f:
+        json.dump({"n_buckets": n_buckets, "columns": columns}, f, indent=2)
+    print(f"✅ PARQUET DATASET READY: {out_dir} ({n_buckets} RID buckets)")
+
+def replace_parquet_rids(df, rids, out_dir=PARQUET_DIR):
+    """
+    Replaces every row of the given RIDs with the rows in df (CSV order),
+    rewriting only the RID buckets they fall into. Returns the bucket ids.
+    """
+    meta = _read_meta(out_dir)
+    if meta is None:
+        return []
+    n_buckets = meta["n_buckets"]
+    rids = [int(r) for r in rids]
+    buckets = sorted({r % n_buckets for r in rids})
+
+    new = df.copy()
+    new[ROW_COLUMN] = np.arange(len(new), dtype='int64')
+    new[BUCKET_COLUMN] = (new['RID'] % n_buckets).astype('int32')
+    schema = _arrow_schema(df)
+    file_schema = schema.remove(schema.get_field_index(BUCKET_COLUMN))
+
+    for bucket in buckets:
+        part_dir = os.path.join(out_dir, f"{BUCKET_COLUMN}={bucket}")
+        tables = []
+        if os.path.isdir(part_dir):
+            old = ds.dataset(part_dir, format="parquet", schema=file_schema)
+            tables.append(old.to_table(filter=~ds.field('RID').isin(rids)))
+        rows = new[new[BUCKET_COLUMN] == bucket].drop(columns=[BUCKET_COLUMN])
+        tables.append(pa.Table.from_pandas(rows, schema=file_schema, preserve_index=False))
+        table = pa.concat_tables(tables).sort_by([('RID', 'ascending'), (ROW_COLUMN, 'ascending')])
+
+        # '.' prefix keeps the tmp file out of dataset discovery until the swap
+        os.makedirs(part_dir, exist_ok=True)
+        tmp_path = os.path.join(part_dir, ".part-0.parquet.tmp")
+        pq.write_table(table, tmp_path)
+        for name in os.listdir(part_dir):
+            if not name.startswith('.'):
+                os.remove(os.path.join(part_dir, name))
+        os.replace(tmp_path, os.path.join(part_dir, "part-0.parquet"))
+    return buckets
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+def _read_meta(out_dir=PARQUET_DIR):
+    path = os.path.join(out_dir, META_FILE)
+    if pa is None or not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def tadpole_available():
+    return _read_meta() is not None or os.path.exists(CLEAN_CSV_PATH)
+
+def tadpole_columns():
+    """Column names of tadpole_clean without loading any rows."""
+    meta = _read_meta()
+    if meta is not None:
+        return list(meta["columns"])
+    return list(pd.read_csv(CLEAN_CSV_PATH, nrows=0).columns)
+
+# --- Predicates -----------------------------------------------------------
+# Filters are a list of (column, op, value) tuples that are AND-ed together,
+# e.g. [("D2", "==", 1), ("Month", "<=", 12)] or [("RID", "in", rids)].
+
+_OPS = {
+    '==': lambda a, v: a == v,
+    '!=': lambda a, v: a != v,
+    '<': lambda a, v: a < v,
+    '<=': lambda a, v: a <= v,
+    '>': lambda a, v: a > v,
+    '>=': lambda a, v: a >= v,
+    'in': lambda a, v: a.isin(list(v)),
+    'not in': lambda a, v: ~a.isin(list(v)),
+}
+
+def _check_filters(filters):
+    for col, op, _ in filters:
+        if op not in _OPS:
+            raise ValueError(f"Unsupported filter op '{op}' on {col}")
+
+def _arrow_expression(filters, n_buckets):
+    expr = None
+    for col, op, value in filters:
+        term = _OPS[op](ds.field(col), value)
+        expr = term if expr is None else expr & term
+        # RID predicates prune whole partitions before any file is opened
+        if col == 'RID' and op in ('==', 'in'):
+            rids = [value] if op == '==' else list(value)
+            buckets = sorted({int(r) % n_buckets for r in rids})
+            expr = expr & ds.field(BUCKET_COLUMN).isin(buckets)
+    return expr
+
+def _load_parquet(meta, columns, filters):
+    dataset = ds.dataset(PARQUET_DIR, format="parquet", partitioning="hive")
+    wanted = list(columns) if columns is not None else list(meta["columns"])
+    order = [c for c in ('RID', ROW_COLUMN) if c not in wanted]
+    table = dataset.to_table(columns=wanted + order,
+                             filter=_arrow_expression(filters, meta["n_buckets"]))
+    table = table.sort_by([('RID', 'ascending'), (ROW_COLUMN, 'ascending')]).drop_columns(order)
+    df = table.to_pandas()
+    # Match read_csv: missing strings are NaN, not None
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+def _load_csv(columns, filters):
+    usecols = list(columns) if columns is not None else None
+    if usecols is not None:
+        usecols = usecols + [c for c, _, _ in filters if c not in usecols]
+    df = pd.read_csv(CLEAN_CSV_PATH, usecols=usecols, low_memory=False, float_precision='round_trip')
+    for col, op, value in filters:
+        df = df[_OPS[op](df[col], value)]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+def load_tadpole(columns=None, filters=None):
+    """
+    Loads tadpole_clean with column projection and predicate pushdown.
+    Rows come back in the same order as tadpole_clean.csv (RID, Month).
+    """
+    filters = list(filters or [])
+    _check_filters(filters)
+    meta = _read_meta()
+    if meta is not None:
+        return _load_parquet(meta, columns, filters)
+    return _load_csv(columns, filters)
@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import argparse
+import concurrent.futures
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tadpole_store import load_tadpole, tadpole_columns
+from clinical_twins import twin_pairs, K_TWINS
+
+# ==========================================
+# TRAJECTORY TWINS: DTW WITH LOWER-BOUND PRUNING
+# ==========================================
+# Two patients with the same endpoint but different decline speeds get
+# close feature vectors in clinical_twins.py; here they do not. Each patient
+# becomes a multichannel sequence (z-scored MMSE, ADAS13, ICV-normalized
+# Hippocampus), linearly resampled on a GRID_MONTHS grid from the first to
+# the last visit, so sequence length is follow-up time. Pairs are compared
+# with DTW over their shared follow-up (the first min(n, m) grid points)
+# inside a Sakoe-Chiba band of BAND steps, so timing can shift by at most
+# BAND * GRID_MONTHS months; the distance is sqrt(DTW / points compared).
+#
+# Per query patient, every candidate first gets the cheap lower bounds
+#   LB_Kim     first and last points are always aligned      O(1) per pair
+#   LB_Keogh   distance to the band envelope, both ways       O(n) per pair
+# (vectorized over the cohort); full DTW then runs in bound order, batched
+# over CHUNK candidates, and stops once the next bound exceeds the current
+# k-th best distance. The result is the exact DTW top-k; queries run in a
+# process pool.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAJECTORY_TWINS_PATH = os.path.join(SCRIPT_DIR, "../data/processed/trajectory_twins.csv")
+
+TRAJECTORY_MARKERS = ['MMSE', 'ADAS13', 'Hippocampus']
+ICV_NORMALIZED = ['Hippocampus']
+GRID_MONTHS = 6
+BAND = 2                 # warping window, in grid steps (12 months)
+MIN_POINTS = 3           # grid points needed to take part (>= 12 months of follow-up)
+CHUNK = 64               # candidates per LB_Keogh / DTW round
+WORKERS = os.cpu_count() or 1
+TRAJECTORY_REASON = "DTW_TRAJECTORY"
+
+def patient_sequences(df, grid_months=GRID_MONTHS):
+    """
+    (rids, seqs, lengths) from a tadpole_clean frame sorted by (RID, Month).
+    seqs is (patients, max_len, markers), NaN past each patient's length.
+    Markers never observed for a patient are 0 (the cohort mean).
+    """
+    df = df.copy()
+    markers = [c for c in TRAJECTORY_MARKERS if c in df]
+    if 'ICV' in df:
+        icv = df['ICV'].where(df['ICV'] > 0)
+        for col in [c for c in ICV_NORMALIZED if c in markers]:
+            df[col] = df[col] / icv
+    values = df[markers].to_numpy(dtype=float)
+    std = np.nanstd(values, axis=0)
+    values = (values - np.nanmean(values, axis=0)) / np.where(np.isnan(std) | (std < 1e-12), 1.0, std)
+    months = df['Month'].to_numpy(dtype=float)
+    observed = ~np.isnan(values).all(axis=1) & ~np.isnan(months)
+
+    rid_col = df['RID'].to_numpy()
+    rids, starts = np.unique(rid_col, return_index=True)
+    bounds = list(starts) + [len(df)]
+    seq_list = []
+    for i in range(len(rids)):
+        lo, hi = bounds[i], bounds[i + 1]
+        keep = observed[lo:hi]
+        m, v = months[lo:hi][keep], values[lo:hi][keep]
+        if len(m) == 0:
+            seq_list.append(np.zeros((0, len(markers))))
+            continue
+        grid = np.arange(0.0, m.max() - m.min() + 1e-9, grid_months) + m.min()
+        seq = np.zeros((len(grid), len(markers)))
+        for c in range(len(markers)):
+            ok = ~np.isnan(v[:, c])
+            if ok.any():
+                seq[:, c] = np.interp(grid, m[ok], v[ok, c])
+        seq_list.append(seq)
+
+    lengths = np.array([len(s) for s in seq_list], dtype=np.int64)
+    seqs = np.full((len(rids), max(lengths.max(initial=0), 1), len(markers)), np.nan)
+    for i, s in enumerate(seq_list):
+        seqs[i, :len(s)] = s
+    return rids, seqs, lengths
+
+def envelopes(seqs, band=BAND):
+    """(upper, lower) of every sequence over its +-band window (NaN past its length)."""
+    pad_hi = np.where(np.isnan(seqs), -np.inf, seqs)
+    pad_lo = np.where(np.isnan(seqs), np.inf, seqs)
+    upper, lower = pad_hi.copy(), pad_lo.copy()
+    for s in range(1, band + 1):
+        upper[:, s:] = np.maximum(upper[:, s:], pad_hi[:, :-s])
+        upper[:, :-s] = np.maximum(upper[:, :-s], pad_hi[:, s:])
+        lower[:, s:] = np.minimum(lower[:, s:], pad_lo[:, :-s])
+        lower[:, :-s] = np.minimum(lower[:, :-s], pad_lo[:, s:])
+    nan = np.isnan(seqs)
+    return np.where(nan, np.nan, upper), np.where(nan, np.nan, lower)
+
+def lb_keogh(x, upper, lower):
+    """
+    Squared distance from x to the envelope [lower, upper], broadcast
+    together to (B, n, markers) and summed per row. NaN steps (past either
+    sequence's end) contribute nothing.
+    """
+    gap = np.fmax(x - upper, 0.0) + np.fmax(lower - x, 0.0)
+    return (gap * gap).sum(axis=(1, 2))
+
+def dtw_batch(q, cands, points, band=BAND):
+    """
+    Banded DTW (sum of squared distances) between q[:p] and cands[b, :p] for
+    each candidate b and its p = points[b]; vectorized over candidates.
+    """
+    n = len(q)
+    cost = ((q[None, :, None, :] - cands[:, None, :n, :]) ** 2).sum(axis=3)   # (B, n, n)
+    cost = np.where(np.isnan(cost), np.inf, cost)
+    out = np.full(len(cands), np.inf)
+    prev = np.full((len(cands), n), np.inf)
+    for i in range(n):
+        cur = np.full((len(cands), n), np.inf)
+        for j in range(max(0, i - band), min(n, i + band + 1)):
+            if i == 0 and j == 0:
+                best = 0.0
+            else:
+                best = prev[:, j]
+                if j > 0:
+                    best = np.minimum(best, np.minimum(prev[:, j - 1], cur[:, j - 1]))
+            cur[:, j] = cost[:, i, j] + best
+        done = points == i + 1
+        out[done] = cur[done, i]
+        prev = cur
+    return out
+
+_STATE = {}
+
+def _init_worker(seqs, lengths, upper, lower, k, band):
+    _STATE.update(seqs=seqs, lengths=lengths, upper=upper, lower=lower, k=k, band=band)
+
+def _topk(qi):
+    """Exact DTW top-k of patient qi, plus (candidates, DTW runs) pair counts."""
+    seqs, lengths, k, band = _STATE['seqs'], _STATE['lengths'], _STATE['k'], _STATE['band']
+    upper, lower = _STATE['upper'], _STATE['lower']
+    n = int(lengths[qi])
+    q = seqs[qi, :n]
+    cands = np.flatnonzero(lengths >= MIN_POINTS)
+    cands = cands[cands != qi]
+    points = np.minimum(lengths[cands], n)
+    # Bounds are in the same units as the distance before the sqrt: DTW / points
+    ends = seqs[cands, points - 1]
+    kim = (((q[0] - seqs[cands, 0]) ** 2).sum(axis=1) + ((q[points - 1] - ends) ** 2).sum(axis=1)) / points
+
+    best_d, best_i = np.empty(0), np.empty(0, dtype=np.int64)
+    n_dtw = 0
+
+    def run(idx):
+        nonlocal best_d, best_i, n_dtw
+        n_dtw += len(idx)
+        d = dtw_batch(q, seqs[cands[idx], :n], points[idx], band) / points[idx]
+        best_d = np.concatenate([best_d, d])
+        best_i = np.concatenate([best_i, cands[idx]])
+        keep = np.lexsort((best_i, best_d))[:k]
+        best_d, best_i = best_d[keep], best_i[keep]
+
+    # Seed the k-th best with the LB_Kim front-runners, then LB_Keogh only
+    # for whatever LB_Kim cannot rule out
+    order = np.argsort(kim, kind='stable')
+    run(order[:k])
+    rest = order[k:]
+    rest = rest[kim[rest] <= (best_d[-1] if len(best_d) >= k else np.inf)]
+    c = cands[rest]
+    keogh = np.maximum(lb_keogh(q[None], upper[c, :n], lower[c, :n]),          # q vs their envelopes
+                       lb_keogh(seqs[c, :n], upper[qi, :n][None], lower[qi, :n][None]))   # them vs q's
+    bound = np.maximum(kim[rest], keogh / points[rest])
+    by_bound = np.argsort(bound, kind='stable')
+    for lo in range(0, len(by_bound), CHUNK):
+        sel = by_bound[lo:lo + CHUNK]
+        sel = sel[bound[sel] <= (best_d[-1] if len(best_d) >= k else np.inf)]
+        if len(sel) == 0:
+            break
+        run(rest[sel])
+    return qi, best_i, np.sqrt(best_d), (len(cands), n_dtw)
+
+def _topk_many(queries):
+    return [_topk(qi) for qi in queries]
+
+def trajectory_knn(seqs, lengths, k=K_TWINS, band=BAND, workers=WORKERS, queries=None):
+    """
+    Exact DTW top-k for every patient with MIN_POINTS or more grid points
+    (or only `queries`). Returns (indices, distances, stats) like
+    clinical_twins.knn, padded with -1/inf; stats is (candidate pairs,
+    pairs that needed the full DTW).
+    """
+    upper, lower = envelopes(seqs, band)
+    if queries is None:
+        queries = np.flatnonzero(lengths >= MIN_POINTS)
+    indices = np.full((len(seqs), k), -1, dtype=np.int64)
+    distances = np.full((len(seqs), k), np.inf)
+    stats = np.zeros(2, dtype=np.int64)
+    chunks = [queries[i:i + 32] for i in range(0, len(queries), 32)]
+    args = (seqs, lengths, upper, lower, k, band)
+    if workers <= 1:
+        _init_worker(*args)
+        results = map(_topk_many, chunks)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=args)
+        results = executor.map(_topk_many, chunks)
+    try:
+        for part in results:
+            for qi, idx, dist, counts in part:
+                indices[qi, :len(idx)] = idx
+                distances[qi, :len(dist)] = dist
+                stats += counts
+    finally:
+        if workers > 1:
+            executor.shutdown()
+    return indices, distances, stats
+
+def build_trajectory_twins(rids=None, k=K_TWINS, workers=WORKERS, out_path=TRAJECTORY_TWINS_PATH):
+    """
+    DTW twin edges for every patient in tadpole_clean (or only `rids`),
+    saved to trajectory_twins.csv. Returns the edge DataFrame.
+    """
+    available = tadpole_columns()
+    wanted = ['RID', 'Month', 'ICV'] + TRAJECTORY_MARKERS
+    df = load_tadpole(columns=[c for c in wanted if c in available])
+    if rids is not None:
+        df = df[df['RID'].isin(set(rids))]
+    start = time.perf_counter()
+    patient_rids, seqs, lengths = patient_sequences(df)
+    eligible = int((lengths >= MIN_POINTS).sum())
+    print(f"   - {len(patient_rids)} patients, {eligible} with >= {MIN_POINTS} grid points "
+          f"(max {lengths.max(initial=0)}) ({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    indices, distances, stats = trajectory_knn(seqs, lengths, k, workers=workers)
+    edges = twin_pairs(patient_rids, indices, distances).rename(columns={'euclidean_distance': 'dtw_distance'})
+    total, dtw = (int(s) for s in stats)
+    print(f"   - DTW top-{k} for {eligible} patients on {workers} processes: {len(edges)} twin pairs "
+          f"({time.perf_counter() - start:.1f}s)")
+    print(f"   - Lower bounds pruned {total - dtw} of {total} candidate pairs "
+          f"({100.0 * (1 - dtw / max(total, 1)):.1f}%), {dtw} full DTW")
+    if out_path:
+        edges.to_csv(out_path, index=False)
+        print(f"✅ TRAJECTORY TWINS SAVED: {out_path}")
+    return edges
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exact DTW trajectory twins with lower-bound pruning")
+    parser.add_argument("--k", type=int, default=K_TWINS, help="Twins per patient")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Processes for the DTW search")
+    args = parser.parse_args()
+    build_trajectory_twins(k=args.k, workers=args.workers)
@@ -0,0 +1,86 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# ==========================================
+# TWIN LOOKUP CACHE
+# ==========================================
+# retrieve_clinical_twins (model_c3_hybrid.py) is called once or more per
+# agent loop for every evaluated patient. TwinCache keeps the serialized
+# answer per RID with LRU + TTL eviction; it is warmed from one bulk
+# TWIN_EXPORT query at startup, so evaluation lookups are a dict hit.
+#
+# step1c_similarity_edges.py calls mark_twins_rebuilt() after it rewrites
+# SIMILAR_TO edges (full or incremental). That bumps the stamp file's
+# mtime, and every cache that sees a newer stamp drops its entries.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TWIN_STAMP_PATH = os.path.join(SCRIPT_DIR, "../data/processed/twin_edges.stamp")
+TWIN_CACHE_SIZE = 4096        # RIDs kept (the cohort is ~1.7k)
+TWIN_CACHE_TTL = 6 * 3600.0   # seconds an entry stays valid
+
+def mark_twins_rebuilt(path=TWIN_STAMP_PATH):
+    """Records that the twin edges changed; caches invalidate on their next lookup."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp, path)
+
+def _stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+class TwinCache:
+    """Thread-safe LRU + TTL map from RID to its serialized twin lookup."""
+
+    def __init__(self, maxsize=TWIN_CACHE_SIZE, ttl=TWIN_CACHE_TTL, stamp_path=TWIN_STAMP_PATH, clock=time.monotonic):
+        self.maxsize, self.ttl, self.stamp_path, self.clock = maxsize, ttl, stamp_path, clock
+        self._entries = OrderedDict()    # rid -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self._stamp = _stamp(stamp_path)
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_stamp(self):
+        stamp = _stamp(self.stamp_path)
+        if stamp != self._stamp:
+            self._entries.clear()
+            self._stamp = stamp
+
+    def get(self, rid):
+        """Cached value for `rid`, or None when missing, expired or invalidated."""
+        with self._lock:
+            self._check_stamp()
+            entry = self._entries.get(rid)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[rid]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(rid)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, rid, value):
+        with self._lock:
+            self._check_stamp()
+            self._entries[rid] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(rid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def warm(self, values):
+        """Bulk put of {rid: value}; returns how many entries the cache holds."""
+        for rid, value in values.items():
+            self.put(rid, value)
+        return len(self)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
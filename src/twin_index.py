@@ -0,0 +1,380 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from clinical_twins import load_patient_features, load_twin_state, feature_stats, standardize, knn, K_TWINS, TWIN_STATE_PATH
+
+# ==========================================
+# PERSISTENT LSH INDEX FOR CLINICAL TWINS
+# ==========================================
+# Approximate top-k twins over the standardized trajectory vectors of
+# clinical_twins.py, for cohorts where the exact O(n^2) kNN is too slow and
+# for per-patient lookups that have to answer in milliseconds.
+#
+# Each of N_TABLES hash tables draws n_bits random hyperplanes; a vector's
+# code is the sign pattern of its projections. A query probes, in every
+# table, its own bucket plus the buckets reached by flipping the bits whose
+# projection was closest to zero (multi-probe LSH), then re-ranks the union
+# of candidates by exact Euclidean distance. `tables` and `probes` trade
+# latency for recall; benchmark() reports recall@k against exact search.
+#
+#   twin_index/
+#     meta.json          dims, hash settings, feature names, segment list
+#     planes.npy         (tables, dim, n_bits) hyperplanes
+#     mean.npy, std.npy  standardization of the raw features
+#     vectors.npy        (n, dim) float32 base vectors
+#     rids.npy           (n,) RID per base row
+#     rid_order.npy      base rows sorted by RID (RID lookups)
+#     codes.npy          (tables, n) bucket codes, sorted per table
+#     order.npy          (tables, n) base rows in the same order as codes
+#     seg_0001/          vectors.npy, rids.npy, codes.npy (unsorted) of one add()
+#
+# Base arrays are opened with np.load(mmap_mode='r'). add() writes a small
+# segment instead of touching the base; a RID in a newer segment shadows its
+# older rows. compact() folds the segments back into a fresh base once they
+# pass COMPACT_FRACTION of it. Directories are written next to the target
+# and swapped in with os.replace, as graph_store.py does.
+#
+# The index mirrors the twin state of clinical_twins.py (same vectors and
+# standardization): step1c_similarity_edges.py calls sync_twin_index() after
+# a full build and after each incremental update. model_c3_hybrid.py answers
+# twin lookups from it when the graph cannot.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TWIN_INDEX_DIR = os.path.join(SCRIPT_DIR, "../data/processed/twin_index")
+META_FILE = "meta.json"
+INDEX_VERSION = 1
+
+N_TABLES = 12
+BUCKET_SIZE = 4           # target mean base rows per bucket (sets n_bits)
+MAX_BITS = 24
+DEFAULT_PROBES = 4        # buckets probed per table (own bucket + 3 flips)
+COMPACT_FRACTION = 0.1
+SEED = 13
+
+def choose_bits(n, bucket_size=BUCKET_SIZE):
+    return int(np.clip(np.floor(np.log2(max(n, 1) / bucket_size)), 1, MAX_BITS))
+
+def _hash(vectors, planes):
+    """(tables, n) uint32 codes and (tables, n, n_bits) projections."""
+    proj = np.einsum('nd,tdb->tnb', np.asarray(vectors, dtype=np.float32), planes)
+    weights = (1 << np.arange(planes.shape[2], dtype=np.uint32))
+    return ((proj > 0).astype(np.uint32) * weights).sum(axis=2, dtype=np.uint32), proj
+
+def _write_base(out_dir, meta, planes, stats, vectors, rids):
+    """Writes a complete index directory (no segments) and swaps it in."""
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".twin_index_", dir=parent)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rids = np.asarray(rids, dtype=np.int64)
+    codes = np.empty((planes.shape[0], len(rids)), dtype=np.uint32)
+    order = np.empty((planes.shape[0], len(rids)), dtype=np.int64)
+    for t in range(planes.shape[0]):
+        c, _ = _hash(vectors, planes[t:t + 1])
+        order[t] = np.argsort(c[0], kind='stable')
+        codes[t] = c[0][order[t]]
+    np.save(os.path.join(tmp_dir, "planes.npy"), planes)
+    np.save(os.path.join(tmp_dir, "mean.npy"), stats[0])
+    np.save(os.path.join(tmp_dir, "std.npy"), stats[1])
+    np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+    np.save(os.path.join(tmp_dir, "rids.npy"), rids)
+    np.save(os.path.join(tmp_dir, "rid_order.npy"), np.argsort(rids, kind='stable'))
+    np.save(os.path.join(tmp_dir, "codes.npy"), codes)
+    np.save(os.path.join(tmp_dir, "order.npy"), order)
+    meta = dict(meta, version=INDEX_VERSION, count=int(len(rids)), segments=[])
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    # Swap by renames so the index is only missing between two renames; the
+    # old directory is deleted last (a reader elsewhere may still map it).
+    old_dir = None
+    if os.path.exists(out_dir):
+        old_dir = tempfile.mkdtemp(prefix=".twin_index_old_", dir=parent)
+        os.rmdir(old_dir)
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+def build_index(rids, vectors, out_dir=TWIN_INDEX_DIR, stats=None, feature_names=None,
+                n_tables=N_TABLES, n_bits=None, seed=SEED):
+    """
+    Writes a new index over already-standardized `vectors` (one row per RID).
+    `stats` is the (mean, std) that produced them, kept so new patients can
+    be standardized the same way (TwinIndex.transform). Returns the TwinIndex.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    n_bits = choose_bits(len(vectors)) if n_bits is None else n_bits
+    planes = np.random.default_rng(seed).standard_normal((n_tables, dim, n_bits)).astype(np.float32)
+    if stats is None:
+        stats = (np.zeros(dim), np.ones(dim))
+    meta = {"dim": int(dim), "tables": int(n_tables), "n_bits": int(n_bits), "seed": int(seed),
+            "feature_names": list(feature_names) if feature_names is not None else None}
+    _write_base(out_dir, meta, planes, stats, vectors, rids)
+    return TwinIndex(out_dir)
+
+class TwinIndex:
+    """Memory-mapped LSH index over patient vectors; see the module header for the layout."""
+
+    def __init__(self, root=TWIN_INDEX_DIR):
+        self.root = root
+        with open(os.path.join(root, META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported twin index version {self.meta.get('version')} in {root}")
+        load = lambda name: np.load(os.path.join(root, name), mmap_mode='r')
+        self.planes = np.load(os.path.join(root, "planes.npy"))
+        self.stats = (np.load(os.path.join(root, "mean.npy")), np.load(os.path.join(root, "std.npy")))
+        self.vectors, self.rids, self.rid_order = load("vectors.npy"), load("rids.npy"), load("rid_order.npy")
+        self.codes, self.order = load("codes.npy"), load("order.npy")
+        self._load_segments()
+
+    def _load_segments(self):
+        """Segments are small and read fully; rows they shadow are tracked here."""
+        dim, tables = self.meta["dim"], self.meta["tables"]
+        vecs, rids, codes = [np.empty((0, dim), dtype=np.float32)], [np.empty(0, dtype=np.int64)], \
+            [np.empty((tables, 0), dtype=np.uint32)]
+        for name in self.meta["segments"]:
+            seg = os.path.join(self.root, name)
+            vecs.append(np.load(os.path.join(seg, "vectors.npy")))
+            rids.append(np.load(os.path.join(seg, "rids.npy")))
+            codes.append(np.load(os.path.join(seg, "codes.npy")))
+        self.seg_vectors, self.seg_rids = np.concatenate(vecs), np.concatenate(rids)
+        self.seg_codes = np.concatenate(codes, axis=1)
+        # A segment row is live if no later row has the same RID
+        last = len(self.seg_rids) - 1 - np.unique(self.seg_rids[::-1], return_index=True)[1]
+        self.seg_live = np.zeros(len(self.seg_rids), dtype=bool)
+        self.seg_live[last] = True
+        self.shadowed = np.sort(np.unique(self.seg_rids))
+
+    def __len__(self):
+        return int(len(self.rids) - np.isin(self.rids, self.shadowed).sum() + self.seg_live.sum())
+
+    def transform(self, X):
+        """Standardizes raw patient_features() rows with the index's stats."""
+        return standardize(np.atleast_2d(np.asarray(X, dtype=float)), self.stats).astype(np.float32)
+
+    def vector(self, rid):
+        """Current vector of `rid`, or None."""
+        hits = np.flatnonzero((self.seg_rids == rid) & self.seg_live)
+        if len(hits):
+            return np.asarray(self.seg_vectors[hits[0]])
+        pos = np.searchsorted(self.rids, rid, sorter=self.rid_order)
+        if pos < len(self.rids) and self.rids[self.rid_order[pos]] == rid:
+            return np.asarray(self.vectors[self.rid_order[pos]])
+        return None
+
+    def _probe_codes(self, proj, probes):
+        """Own bucket first, then single-bit flips by smallest |projection|."""
+        n_bits = proj.shape[1]
+        bits = (proj > 0).astype(np.uint32)
+        code = (bits << np.arange(n_bits, dtype=np.uint32)).sum(axis=1, dtype=np.uint32)
+        flips = np.argsort(np.abs(proj), axis=1)[:, :max(probes - 1, 0)].astype(np.uint32)
+        return np.concatenate([code[:, None], code[:, None] ^ (np.uint32(1) << flips)], axis=1)
+
+    def candidates(self, vector, tables=None, probes=DEFAULT_PROBES):
+        """(base rows, live segment rows) sharing a probed bucket with `vector`."""
+        tables = self.meta["tables"] if tables is None else min(tables, self.meta["tables"])
+        _, proj = _hash(np.asarray(vector, dtype=np.float32)[None, :], self.planes[:tables])
+        probe = self._probe_codes(proj[:, 0, :], probes)            # (tables, probes)
+        base = []
+        for t in range(tables):
+            codes = self.codes[t]
+            lo = np.searchsorted(codes, probe[t], side='left')
+            hi = np.searchsorted(codes, probe[t], side='right')
+            base += [self.order[t][a:b] for a, b in zip(lo, hi) if b > a]
+        base = np.unique(np.concatenate(base)) if base else np.empty(0, dtype=np.int64)
+        if len(self.shadowed):
+            base = base[~np.isin(self.rids[base], self.shadowed)]
+        seg = np.flatnonzero(self.seg_live & (self.seg_codes[:tables, :, None]
+                                              == probe[:, None, :]).any(axis=(0, 2)))
+        return base, seg
+
+    def query(self, vector, k=K_TWINS, tables=None, probes=DEFAULT_PROBES, exclude_rid=None):
+        """
+        Approximate k nearest patients to a standardized `vector`: (rids,
+        distances) sorted by distance, shorter than k if too few candidates.
+        More `tables`/`probes` means more candidates and higher recall.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        base, seg = self.candidates(vector, tables, probes)
+        rids = np.concatenate([self.rids[base], self.seg_rids[seg]])
+        vecs = np.concatenate([self.vectors[base], self.seg_vectors[seg]])
+        if exclude_rid is not None:
+            keep = rids != exclude_rid
+            rids, vecs = rids[keep], vecs[keep]
+        dist = np.sqrt(((vecs - vector) ** 2).sum(axis=1, dtype=np.float64))
+        top = np.lexsort((rids, dist))[:k]
+        return rids[top], dist[top]
+
+    def twins(self, rid, k=K_TWINS, tables=None, probes=DEFAULT_PROBES):
+        """Approximate clinical twins of an indexed patient (itself excluded)."""
+        vector = self.vector(rid)
+        if vector is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return self.query(vector, k, tables, probes, exclude_rid=rid)
+
+    def add(self, rids, vectors, compact_fraction=COMPACT_FRACTION):
+        """
+        Inserts (or replaces) standardized vectors as a new segment, then
+        compacts if the segments outgrow `compact_fraction` of the base.
+        """
+        rids = np.asarray(rids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(rids), self.meta["dim"])
+        name = f"seg_{len(self.meta['segments']) + 1:04d}"
+        tmp_dir = tempfile.mkdtemp(prefix=f".{name}_", dir=self.root)
+        codes, _ = _hash(vectors, self.planes)
+        np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+        np.save(os.path.join(tmp_dir, "rids.npy"), rids)
+        np.save(os.path.join(tmp_dir, "codes.npy"), codes)
+        os.replace(tmp_dir, os.path.join(self.root, name))
+        self.meta["segments"].append(name)
+        self._write_meta()
+        self._load_segments()
+        if len(self.seg_rids) > compact_fraction * max(len(self.rids), 1):
+            self.compact()
+
+    def _write_meta(self):
+        tmp = os.path.join(self.root, META_FILE + ".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.root, META_FILE))
+
+    def compact(self):
+        """Rebuilds the base from every live row (same hyperplanes) and reopens it."""
+        keep = ~np.isin(self.rids, self.shadowed)
+        live = self.seg_live
+        rids = np.concatenate([self.rids[keep], self.seg_rids[live]])
+        vectors = np.concatenate([self.vectors[keep], self.seg_vectors[live]])
+        meta = {k: v for k, v in self.meta.items() if k not in ("version", "count", "segments")}
+        planes = np.asarray(self.planes)
+        self.close()  # Windows cannot rename a directory with mapped files in it
+        _write_base(self.root, meta, planes, self.stats, vectors, rids)
+        self.__init__(self.root)
+
+    def close(self):
+        """Drops the memory maps of the base arrays."""
+        self.vectors = self.rids = self.rid_order = self.codes = self.order = None
+
+def open_twin_index(root=TWIN_INDEX_DIR):
+    return TwinIndex(root)
+
+def sync_twin_index(state, added_rids=None, root=TWIN_INDEX_DIR, n_tables=N_TABLES):
+    """
+    Brings the index in line with a twin state (clinical_twins.py). With
+    `added_rids` only those rows are inserted as a segment; the index is
+    rebuilt instead when it is missing, standardized differently, or would
+    not end up holding exactly the state's patients.
+    """
+    index = None
+    if added_rids is not None and os.path.exists(os.path.join(root, META_FILE)):
+        index = TwinIndex(root)
+        same_stats = np.array_equal(index.stats[0], state['mean']) and np.array_equal(index.stats[1], state['std'])
+        if same_stats and len(index) + len(np.setdiff1d(added_rids, index.rids)) == len(state['rids']):
+            rows = np.searchsorted(state['rids'], added_rids)
+            index.add(state['rids'][rows], state['Z'][rows])
+            return index
+        index.close()
+    return build_index(state['rids'], state['Z'], root, (state['mean'], state['std']),
+                       state['names'].tolist(), n_tables)
+
+def build_twin_index(rids=None, out_dir=TWIN_INDEX_DIR, n_tables=N_TABLES, state_path=TWIN_STATE_PATH):
+    """
+    Index over the saved twin state, so it shares step1c's standardization;
+    without one, over every patient in tadpole_clean (or only `rids`).
+    """
+    start = time.perf_counter()
+    if rids is None and os.path.exists(state_path):
+        state = load_twin_state(state_path)
+        index = sync_twin_index(state, None, out_dir, n_tables)
+    else:
+        patient_rids, names, X = load_patient_features(rids)
+        stats = feature_stats(X)
+        index = build_index(patient_rids, standardize(X, stats), out_dir, stats, names, n_tables)
+    print(f"✅ TWIN INDEX SAVED: {out_dir} ({len(index)} patients, {index.meta['tables']} tables x "
+          f"{index.meta['n_bits']} bits, {time.perf_counter() - start:.1f}s)")
+    return index
+
+def synthetic_vectors(n, dim=21, clusters=64, seed=SEED):
+    """Clustered standardized-looking vectors for benchmarking beyond the real cohort."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    Z = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim))
+    return np.arange(1, n + 1, dtype=np.int64), ((Z - Z.mean(0)) / Z.std(0)).astype(np.float32)
+
+def benchmark(n=None, k=K_TWINS, n_queries=200, settings=((1, 1), (4, 4), (8, 4), (12, 4), (12, 8), (12, 16))):
+    """
+    recall@k and per-query latency of the index against exact search, over
+    tadpole_clean patients (n=None) or n synthetic vectors.
+    """
+    if n is None:
+        rids, _, X = load_patient_features()
+        Z = standardize(X).astype(np.float32)
+    else:
+        rids, Z = synthetic_vectors(n)
+    n_queries = min(n_queries, len(rids))
+    queries = np.random.default_rng(SEED).choice(len(rids), n_queries, replace=False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "twin_index")
+        start = time.perf_counter()
+        index = build_index(rids, Z, root)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index = TwinIndex(root)
+        open_ms = (time.perf_counter() - start) * 1000
+        print(f"📦 {len(rids)} patients x {Z.shape[1]} dims | {index.meta['tables']} tables x "
+              f"{index.meta['n_bits']} bits | build {build_s:.2f}s | open {open_ms:.1f}ms")
+
+        start = time.perf_counter()
+        exact_idx, _ = knn(Z, k, rows=queries)
+        exact_ms = (time.perf_counter() - start) * 1000 / n_queries
+        truth = [set(rids[row[row >= 0]].tolist()) for row in exact_idx]
+        start = time.perf_counter()
+        for q in queries:
+            d2 = ((Z - Z[q]) ** 2).sum(axis=1)
+            np.argpartition(d2, min(k, len(Z) - 1))[:k + 1]
+        single_ms = (time.perf_counter() - start) * 1000 / n_queries
+        print(f"   exact, batched (blocked BLAS)     {exact_ms:8.3f} ms/query")
+        print(f"   exact, one query at a time        {single_ms:8.3f} ms/query")
+
+        for tables, probes in settings:
+            hits, cands, lat = 0, 0, []
+            for q, want in zip(queries, truth):
+                start = time.perf_counter()
+                got, _ = index.twins(int(rids[q]), k, tables, probes)
+                lat.append(time.perf_counter() - start)
+                hits += len(want & set(got.tolist()))
+                cands += sum(len(c) for c in index.candidates(index.vectors[q], tables, probes))
+            total = sum(len(w) for w in truth)
+            print(f"   tables={tables:<2} probes={probes:<3} recall@{k}={hits / max(total, 1):.3f}  "
+                  f"candidates={cands / n_queries:8.1f}  p50={np.median(lat) * 1000:6.3f} ms  "
+                  f"p95={np.percentile(lat, 95) * 1000:6.3f} ms")
+
+        batch = max(1, len(rids) // 100)
+        new_rids = rids.max() + 1 + np.arange(batch)
+        start = time.perf_counter()
+        index.add(new_rids, Z[:batch])
+        print(f"   add {batch} patients (segment)         {(time.perf_counter() - start) * 1000:8.1f} ms")
+        start = time.perf_counter()
+        index.compact()
+        print(f"   compact {len(index)} patients            {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent LSH index for clinical twin lookups")
+    parser.add_argument("--bench", action="store_true", help="Report recall@k and latency against exact search")
+    parser.add_argument("--synthetic", type=int, default=None, help="Benchmark on N synthetic patients")
+    parser.add_argument("--k", type=int, default=K_TWINS, help="Twins per query")
+    parser.add_argument("--tables", type=int, default=N_TABLES, help="Hash tables to build")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.synthetic, args.k)
+    else:
+        build_twin_index(n_tables=args.tables)
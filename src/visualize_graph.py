@@ -1,56 +1,53 @@
-import torch
 import networkx as nx
 import matplotlib.pyplot as plt
 import os
-from torch_geometric.data import HeteroData
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from graph_store import open_graph_store
+from concept_rules import CONCEPTS
 
 # PATHS
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-GRAPH_PATH = os.path.join(SCRIPT_DIR, "../data/processed/tadpole_graph.pt")
 OUTPUT_IMG_PATH = os.path.join(SCRIPT_DIR, "../data/processed/patient_timeline_bridge.png")
 
-CONCEPTS = {
-    0: "Atrophy",
-    1: "Cognitive Decline",
-    2: "Genetic Risk (APOE4)",
-    3: "Amyloid Positive"
-}
 
-def visualize_patient_timeline(patient_idx=0):
-    print(f"Inspect Graph for Patient #{patient_idx}...")
-    
-    # 1. Load the Graph
-    if not os.path.exists(GRAPH_PATH):
-        print("Graph file not found. Run 2_build_graph.py first.")
+def visualize_patient_timeline(patient_idx=0, rid=None):
+    # 1. Open the Graph (memory-mapped; only this patient's shard is touched)
+    store = open_graph_store()
+    if store is None:
+        print("Graph store not found. Run 2_build_graph.py first.")
         return
-    
-    # Fix for newer PyTorch versions
-    try:
-        data = torch.load(GRAPH_PATH, weights_only=False)
-    except TypeError:
-        data = torch.load(GRAPH_PATH)
+    index = store.index
+    edge_types = {tuple(et) for et in store.meta['edge_types']}
+    if rid is not None:
+        patient_idx = index.patient_index(rid)
+        if patient_idx is None:
+            print(f"RID {rid} is not in the graph.")
+            return
+    print(f"Inspect Graph for Patient #{patient_idx}...")
     
     # 2. Initialize Drawing Canvas
     G = nx.DiGraph() 
     
     # 3. Add the Patient Node (Center)
-    p_feat = data['patient'].x[patient_idx].tolist()
+    view = store.patient_view(patient_idx)
+    p_feat = view['x'].tolist()
     gender = "F" if p_feat[1] == 1.0 else "M"
     p_node_id = f"Patient_{patient_idx}"
     G.add_node(p_node_id, label=f"Patient {patient_idx}\n({gender})", color='red', shape='s')
     
     # 4. Find Connected Visits
-    src, dst = data['patient', 'has_visit', 'visit'].edge_index
-    visit_indices = dst[src == patient_idx].tolist()
+    visit_indices = view['visits'].tolist()
+    visit_labels = view['visit_y'].tolist()
     print(f"   - Found {len(visit_indices)} visits.")
     
     # 5. Add Visit Nodes & Edges
     previous_node = None
     visit_node_ids = []
 
-    for v_idx in visit_indices:
+    for v_idx, label in zip(visit_indices, visit_labels):
         # Get Diagnosis
-        label = data['visit'].y[v_idx].item()
         dx_map = {0: 'CN', 1: 'MCI', 2: 'AD'}
         dx_str = dx_map.get(label, '?')
         
@@ -71,10 +68,9 @@ def visualize_patient_timeline(patient_idx=0):
     print("   - Adding Bridge Connections...")
     
     # A. Patient -> Concept (Genetics)
-    if ('patient', 'has_risk', 'concept') in data.edge_types:
-        p_src, c_dst = data['patient', 'has_risk', 'concept'].edge_index
+    if ('patient', 'has_risk', 'concept') in edge_types:
         # Find concepts connected to THIS patient
-        patient_risks = c_dst[p_src == patient_idx].tolist()
+        patient_risks = view['risks'].tolist()
         
         for c_idx in patient_risks:
             c_name = CONCEPTS.get(c_idx, f"Concept {c_idx}")
@@ -84,14 +80,11 @@ def visualize_patient_timeline(patient_idx=0):
             G.add_edge(p_node_id, c_node_id, color='orange')
 
     # B. Visit -> Concept (Atrophy, Decline, Amyloid)
-    if ('visit', 'shows_signs_of', 'concept') in data.edge_types:
-        v_src, c_dst = data['visit', 'shows_signs_of', 'concept'].edge_index
-        
+    if ('visit', 'shows_signs_of', 'concept') in edge_types:
         # We only care about edges starting from OUR visits
         for v_idx in visit_node_ids:
-            # Find concepts for this specific visit
-            # Boolean mask for source node match
-            concepts_for_visit = c_dst[v_src == v_idx].tolist()
+            # Find concepts for this specific visit (CSR slice)
+            concepts_for_visit = index.visit_concepts(v_idx).tolist()
             
             for c_idx in concepts_for_visit:
                 c_name = CONCEPTS.get(c_idx, f"Concept {c_idx}")
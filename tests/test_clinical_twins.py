@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from clinical_twins import knn, add_patients
+
+
+def brute_force_knn(Z, k):
+    """Reference top-k: full sort on exact distances, ties to the lower index."""
+    n = len(Z)
+    indices = np.full((n, k), -1, dtype=np.int64)
+    distances = np.full((n, k), np.inf)
+    for i in range(n):
+        d = np.sqrt(((Z[i] - Z) ** 2).sum(axis=1))
+        d[i] = np.inf
+        order = np.lexsort((np.arange(n), d))[:min(k, n - 1)]
+        indices[i, :len(order)], distances[i, :len(order)] = order, d[order]
+    return indices, distances
+
+
+def tied_cohort(seed, n=200, dim=6):
+    """Rows drawn from a few distinct vectors, several all-zero (fully missing) patients."""
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(12, dim))
+    base[:4] = 0.0
+    return base[rng.integers(0, len(base), size=n)] * rng.choice([1.0, 100.0])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_knn_breaks_ties_by_index(seed):
+    Z = tied_cohort(seed)
+    indices, distances = knn(Z, k=5, block_cells=3000)
+    ref_indices, ref_distances = brute_force_knn(Z, 5)
+    np.testing.assert_array_equal(indices, ref_indices)
+    np.testing.assert_array_equal(distances, ref_distances)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_add_patients_matches_full_knn(seed):
+    rng = np.random.default_rng(seed)
+    Z = tied_cohort(seed)
+    rids = np.sort(rng.choice(1000, size=len(Z), replace=False))
+    old = rng.random(len(Z)) < 0.85
+    dim = Z.shape[1]
+    state = {'rids': rids[old], 'Z': Z[old], 'mean': np.zeros(dim), 'std': np.ones(dim)}
+    state['indices'], state['distances'] = knn(Z[old], k=5)
+
+    new_state, _ = add_patients(state, rids[~old], Z[~old], block_cells=3000)
+
+    full_indices, full_distances = knn(Z, k=5)
+    np.testing.assert_array_equal(new_state['rids'], rids)
+    np.testing.assert_array_equal(new_state['indices'], full_indices)
+    np.testing.assert_array_equal(new_state['distances'], full_distances)